@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# زیر ASGI مسیرهای پرخواندنی از viewهای async سرویس داده می‌شوند؛ ASYNC_READ_VIEWS=0 خاموشش می‌کند
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,7 +48,12 @@ INSTALLED_APPS += [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.CachedJWTAuthentication",
+    ],
+    # همان خروجی JSONRenderer، با orjson اگر نصب باشد (core/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
 }
 
@@ -63,8 +71,14 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.querybudget.QueryBudgetMiddleware",
+    "core.routers.ReplicaRoutingMiddleware",
 ]
 
+# بررسی query_budget viewها روی درخواست‌های واقعی (core/querybudget.py): off،
+# log برای هشدار در log یا raise برای شکست درخواست (مثلاً load_test روی staging)
+QUERY_BUDGET_CHECKS = os.environ.get("QUERY_BUDGET_CHECKS", "log" if DEBUG else "off")
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -86,13 +100,167 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 
 # Database
+#
+# پیش‌فرض SQLite در backend/db.sqlite3. با DB_ENGINE=postgresql از PostgreSQL
+# استفاده می‌شود (DB_NAME، DB_USER، DB_PASSWORD، DB_HOST، DB_PORT). اتصال‌ها
+# DB_CONN_MAX_AGE ثانیه باز می‌مانند؛ با DB_POOL_SIZE به جای آن pool اتصال
+# جنگو استفاده می‌شود که psycopg نسخه ۳ با pool لازم دارد (pip install
+# "psycopg[pool]")، نه psycopg2.
+#
+# DB_SQLITE_TUNED=1 حالت SQLite برای نصب‌های تک‌سروره با خرید و فروش همزمان
+# است: WAL (خواندن منتظر نوشتن نمی‌ماند)، synchronous=NORMAL (که در WAL
+# امن است)، صبر تا ۵ ثانیه برای قفل به جای خطای database is locked، و
+# mmap و کش صفحه بزرگ‌تر روی هر اتصال تازه. تراکنش‌ها (همه معاملات داخل
+# transaction.atomic هستند) با BEGIN IMMEDIATE شروع می‌شوند تا قفل نوشتن از
+# اول گرفته شود؛ ارتقای قفل خواندن به نوشتن در وسط تراکنش بدون صبر خطا می‌دهد.
+
+SQLITE_TUNED_OPTIONS = {
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA busy_timeout=5000;"
+        "PRAGMA mmap_size=268435456;"
+        "PRAGMA cache_size=-65536"
+    ),
+    "transaction_mode": "IMMEDIATE",
+}
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "0"))
+    PRIMARY_DATABASE = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("DB_NAME", "crypton"),
+        "USER": os.environ.get("DB_USER", "crypton"),
+        "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+        "HOST": os.environ.get("DB_HOST", "localhost"),
+        "PORT": os.environ.get("DB_PORT", "5432"),
+        # pool جنگو خودش اتصال‌ها را نگه می‌دارد و با CONN_MAX_AGE جمع نمی‌شود
+        "CONN_MAX_AGE": 0 if DB_POOL_SIZE else int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
-}
+    if DB_POOL_SIZE:
+        PRIMARY_DATABASE["OPTIONS"]["pool"] = {
+            "min_size": min(2, DB_POOL_SIZE),
+            "max_size": DB_POOL_SIZE,
+            "timeout": 10,
+        }
+elif DB_ENGINE == "sqlite":
+    PRIMARY_DATABASE = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+        "OPTIONS": dict(SQLITE_TUNED_OPTIONS) if os.environ.get("DB_SQLITE_TUNED") == "1" else {},
+    }
+else:
+    raise ImproperlyConfigured(f"Unsupported DB_ENGINE {DB_ENGINE!r} (sqlite or postgresql)")
+
+DATABASES = {"default": PRIMARY_DATABASE}
+
+# replica فقط‌خواندنی برای لیست‌های پرخواندنی (read_replica در viewها) با
+# DB_REPLICA_HOST (و DB_REPLICA_PORT و DB_REPLICA_NAME)؛ برای SQLite با
+# DB_REPLICA_NAME، مثلاً برای آزمایش با دو دیتابیس محلی (check_replica_routing).
+# بقیه تنظیمات همان دیتابیس اصلی است. کاربری که چیزی نوشته تا
+# REPLICA_PIN_SECONDS ثانیه از دیتابیس اصلی می‌خواند (core/routers.py)؛ این
+# سنجاق در cache نگه داشته می‌شود و replica بدون CACHE_URL (پایین) راه نمی‌افتد
+if os.environ.get("DB_REPLICA_HOST") or os.environ.get("DB_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        **PRIMARY_DATABASE,
+        "OPTIONS": dict(PRIMARY_DATABASE.get("OPTIONS", {})),
+        **{
+            key: os.environ[f"DB_REPLICA_{key}"]
+            for key in ("NAME", "HOST", "PORT")
+            if os.environ.get(f"DB_REPLICA_{key}")
+        },
+    }
+    DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", "10"))
+
+
+# Cache
+#
+# پیش‌فرض LocMemCache است که هر process جدا دارد. با CACHE_URL یک cache مشترک
+# بین processها تنظیم می‌شود: redis://host:6379/0 برای RedisCache جنگو (pip
+# install redis) یا file:///var/tmp/crypton-cache برای چند process روی یک سرور.
+# برای replica (سنجاق کاربر به دیتابیس اصلی) لازم است.
+
+CACHE_URL = os.environ.get("CACHE_URL", "")
+
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith("file://"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_URL.removeprefix("file://"),
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+elif not CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unsupported CACHE_URL {CACHE_URL!r} (redis:// or file://)")
+
+PORTFOLIO_CACHE_TTL = 60
+
+# نسخه کاتالوگ، قیمت‌ها و پرتفوی‌ها در دیتابیس است (core.cache.VersionStore)؛ هر
+# process نسخه خوانده‌شده را این مدت نگه می‌دارد و تغییر processهای دیگر (فید قیمت،
+# import_coins، موتور تطبیق) حداکثر با همین تاخیر دیده می‌شود
+VERSION_POLL_SECONDS = 1
+
+# ثانیه‌هایی که کاربر احراز هویت شده در حافظه هر process کش می‌شود (0 یعنی خاموش).
+# حداکثر تاخیر دیده شدن غیرفعال شدن یا تغییر نقش کاربر در processهای دیگر (بدون
+# CACHE_URL) و برای QuerySet.update که signal ندارد؛ core/authentication.py را ببینید
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", "5"))
+
+# تغییر موجودی کیف پول به صورت دفتر append-only به جای UPDATE ردیف Wallet
+# (core/ledger.py). پیش از خاموش کردن، manage.py compact_wallets اجرا شود.
+# روی SQLite فقط همراه DB_SQLITE_TUNED=1: برداشت با تراکنش DEFERRED خطای
+# database is locked می‌گیرد. SQLite یک نویسنده دارد و دفتر آنجا کندتر از
+# UPDATE ردیف است (bench_trades --wallet-mode compare)؛ فایده‌اش روی PostgreSQL است
+WALLET_LEDGER = False
+
+# مبلغ‌ها و مقدارها (موجودی، دارایی، ارزش تراکنش، سفارش محدود) به صورت BIGINT
+# واحدهای کوچک به جای decimal (core/fields.py). فایده‌اش جمع دقیق روی SQLite است،
+# نه سرعت (bench_amounts). بعد از تغییر، به جای makemigrations دستور
+# make_fixed_point_migration و بعد migrate اجرا شود تا ردیف‌های موجود هم تبدیل شوند
+FIXED_POINT_AMOUNTS = False
+
+# نسخه async viewهای پرخواندنی (core/async_views.py) به جای viewهای DRF؛
+# config/asgi.py به طور پیش‌فرض روشنش می‌کند و WSGI همان viewهای همزمان را دارد
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS", "0") == "1"
+
+# پخش قیمت با SSE (core/pricestream.py): فاصله بررسی تغییر قیمت‌ها و حداکثر
+# ثانیه‌هایی که مشترک کند می‌تواند پیام نخوانده داشته باشد تا قطع شود
+PRICE_STREAM_INTERVAL = 1.0
+PRICE_STREAM_MAX_LAG = 30.0
+
+# لیست‌های ادمین (کاربران، کیف پول‌ها، دارایی‌ها و پیام‌ها): اندازه پیش‌فرض
+# صفحه و سقف ?page_size=
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 500
+
+# آمار پنل ادمین (core/adminstats.py): ثانیه‌هایی که هر عدد تازه حساب می‌شود و
+# ثانیه‌های بعد از آن که مقدار کهنه برگردانده و در پس‌زمینه دوباره حساب می‌شود
+ADMIN_STATS_TTL = 60
+ADMIN_STATS_STALE_TTL = 3600
+ADMIN_STATS_VOLUME_DAYS = 30
+
+# تاریخچه قیمت (core/pricehistory.py): چند روز tickهای خام و هر سطح کندل
+# نگه داشته می‌شود؛ None یعنی همیشه
+PRICE_HISTORY_RETENTION_DAYS = {"tick": 1, "1m": 7, "1h": 365, "1d": None}
 
 
 # Password validation
@@ -3,19 +3,24 @@ from django.contrib import admin
 from .models import (
     CustomUser,
     Wallet,
+    WalletLedgerEntry,
     Coin,
+    PriceCandle,
+    LimitOrder,
     Asset,
     Announcement,
     ContactMessage,
     Transaction,
 )
 
-
 admin.site.register(CustomUser)
 admin.site.register(Coin)
+admin.site.register(PriceCandle)
 admin.site.register(Wallet)
+admin.site.register(WalletLedgerEntry)
 admin.site.register(Asset)
 admin.site.register(Transaction)
+admin.site.register(LimitOrder)
 
 admin.site.register(Announcement)
 admin.site.register(ContactMessage)
@@ -0,0 +1,162 @@
+"""
+آمار پنل ادمین (GET /api/admin/stats/).
+
+هر عدد با یک کوئری aggregate در خود دیتابیس حساب می‌شود و جدا در cache
+جنگو می‌ماند. تا ADMIN_STATS_TTL ثانیه همان مقدار برگردانده می‌شود؛ بعد از
+آن تا ADMIN_STATS_STALE_TTL ثانیه دیگر هم مقدار کهنه بلافاصله برمی‌گردد و
+یک thread پس‌زمینه آن را دوباره حساب می‌کند (stale-while-revalidate). فقط
+اگر مقداری در cache نباشد درخواست منتظر کوئری می‌ماند. قفل محاسبه دوباره با
+cache.add گرفته می‌شود تا اگر CACHES مشترک باشد فقط یک process حساب کند.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Asset, ContactMessage, CustomUser, Transaction
+from .portfolio import asset_value_expression
+
+STATS_CACHE_KEY = "admin-stats:{name}"
+
+STATS_REFRESH_KEY = "admin-stats-refresh:{name}"
+
+# حداکثر ثانیه‌هایی که قفل محاسبه دوباره نگه داشته می‌شود
+REFRESH_TIMEOUT = 60
+
+
+def user_counts():
+    genders = [value for value, _ in CustomUser.GENDER_CHOICES]
+    counts = CustomUser.objects.aggregate(
+        total=Count("pk"),
+        active=Count("pk", filter=Q(is_active=True)),
+        **{gender: Count("pk", filter=Q(gender=gender)) for gender in genders},
+    )
+    by_gender = {gender: counts[gender] for gender in genders}
+    by_gender["unspecified"] = counts["total"] - sum(by_gender.values())
+    return {
+        "total": counts["total"],
+        "active": counts["active"],
+        "inactive": counts["total"] - counts["active"],
+        "by_gender": by_gender,
+    }
+
+
+def trade_volume():
+    """حجم معاملات هر رمزارز در هر روز (UTC) برای ADMIN_STATS_VOLUME_DAYS روز اخیر."""
+    days = getattr(settings, "ADMIN_STATS_VOLUME_DAYS", 30)
+    since = timezone.now().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) - timedelta(days=days - 1)
+    return list(
+        Transaction.objects.filter(timestamp__gte=since)
+        .values(day=TruncDate("timestamp"), coin_symbol=F("coin__symbol"))
+        .annotate(trades=Count("pk"), volume=Sum("total_value"))
+        .order_by("day", "coin_symbol")
+    )
+
+
+def buy_sell_split():
+    totals = Transaction.objects.aggregate(
+        **{
+            f"{side}_{name}": function
+            for side, _ in Transaction.TRANSACTION_TYPES
+            for name, function in (
+                ("count", Count("pk", filter=Q(transaction_type=side))),
+                ("value", Sum("total_value", filter=Q(transaction_type=side))),
+            )
+        }
+    )
+    return {
+        side: {
+            "count": totals[f"{side}_count"],
+            "value": totals[f"{side}_value"] or Decimal("0"),
+        }
+        for side, _ in Transaction.TRANSACTION_TYPES
+    }
+
+
+def assets_under_management():
+    """ارزش همه دارایی‌ها با قیمت فعلی رمزارزها."""
+    totals = Asset.objects.filter(amount__gt=0).aggregate(
+        value=Sum(asset_value_expression()),
+        holders=Count("user", distinct=True),
+    )
+    return {"value": totals["value"] or Decimal("0"), "holders": totals["holders"]}
+
+
+def contact_ratings():
+    totals = ContactMessage.objects.aggregate(count=Count("pk"), average=Avg("stars"))
+    average = totals["average"]
+    return {
+        "count": totals["count"],
+        "average_stars": None if average is None else round(average, 2),
+    }
+
+
+FIGURES = {
+    "users": user_counts,
+    "trade_volume": trade_volume,
+    "buy_sell": buy_sell_split,
+    "assets_under_management": assets_under_management,
+    "contact_messages": contact_ratings,
+}
+
+
+def _ttl():
+    return getattr(settings, "ADMIN_STATS_TTL", 60)
+
+
+def compute_figure(name):
+    """یک عدد را حساب و در cache ذخیره می‌کند."""
+    entry = {"data": FIGURES[name](), "computed_at": time.time()}
+    cache.set(
+        STATS_CACHE_KEY.format(name=name),
+        entry,
+        timeout=_ttl() + getattr(settings, "ADMIN_STATS_STALE_TTL", 3600),
+    )
+    return entry
+
+
+def _refresh(names):
+    try:
+        for name in names:
+            try:
+                compute_figure(name)
+            finally:
+                cache.delete(STATS_REFRESH_KEY.format(name=name))
+    finally:
+        # اتصال دیتابیس این thread باز نماند
+        connection.close()
+
+
+def get_admin_stats():
+    entries = cache.get_many([STATS_CACHE_KEY.format(name=name) for name in FIGURES])
+    now = time.time()
+    stats, stale = {}, []
+    for name in FIGURES:
+        entry = entries.get(STATS_CACHE_KEY.format(name=name))
+        if entry is None:
+            entry = compute_figure(name)
+        elif now - entry["computed_at"] >= _ttl() and cache.add(
+            STATS_REFRESH_KEY.format(name=name), True, timeout=REFRESH_TIMEOUT
+        ):
+            stale.append(name)
+        stats[name] = entry
+
+    if stale:
+        threading.Thread(target=_refresh, args=(stale,), daemon=True).start()
+
+    data = {name: entry["data"] for name, entry in stats.items()}
+    # زمان قدیمی‌ترین عدد پاسخ
+    data["updated_at"] = datetime.fromtimestamp(
+        min(entry["computed_at"] for entry in stats.values()), tz=dt_timezone.utc
+    )
+    return data
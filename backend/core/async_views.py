@@ -0,0 +1,242 @@
+"""
+نسخه async viewهای پرخواندنی برای اجرا زیر ASGI (تنظیم ASYNC_READ_VIEWS).
+
+viewهای DRF همزمان (sync) هستند و زیر ASGI هر درخواست از پل sync_to_async
+رد می‌شود. این viewها Django async خالص‌اند: ORM async (aget، async for)،
+احراز هویت JWT با CachedJWTAuthentication.aauthenticate و خروجی با همان
+FastJSONRenderer، پس بدنه پاسخ بایت به بایت با نسخه DRF یکی است.
+
+فقط GET و HEAD اینجا اجرا می‌شوند؛ متدهای دیگر (مثلاً ویرایش رمزارز توسط
+ادمین) به همان view DRF سپرده می‌شوند. هیچ serializerی نباید رابطه‌ای را
+lazy بخواند، چون کوئری همزمان داخل event loop خطای SynchronousOnlyOperation
+می‌دهد؛ برای همین رابطه‌ها از قبل select_related یا دستی پر می‌شوند.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import path, re_path
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+from rest_framework.views import exception_handler
+
+from .authentication import CachedJWTAuthentication
+from .cache import aget_catalog_version, coin_catalog, etag_matches
+from .ledger import ledger_enabled
+from .models import Asset, Wallet
+from .pricestream import stream_events
+from .renderers import FastJSONRenderer
+from .routers import reads_from_replica
+from .search import parse_coin_query
+from .serializers import (
+    AnnouncementSerializer,
+    CoinSerializer,
+    UserSerializer,
+    WalletSerializer,
+    asset_rows,
+    coin_rows,
+)
+from .views import (
+    AnnouncementViewSet,
+    CoinViewSet,
+    CurrentUserView,
+    MyAssetView,
+    WalletDetailAPIView,
+)
+
+renderer = FastJSONRenderer()
+authentication = CachedJWTAuthentication()
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        renderer.render(data),
+        status=status_code,
+        headers=headers,
+        content_type=renderer.media_type,
+    )
+
+
+def error_response(request, exc):
+    """همان پاسخ خطای APIView.handle_exception."""
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        exc.auth_header = authentication.authenticate_header(request)
+    response = exception_handler(exc, {})
+    headers = {
+        name: response[name]
+        for name in ("WWW-Authenticate", "Retry-After")
+        if response.has_header(name)
+    }
+    return render(response.data, response.status_code, headers)
+
+
+async def aget_object(queryset, **filters):
+    """مثل rest_framework.generics.get_object_or_404 برای ORM async."""
+    try:
+        return await queryset.aget(**filters)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    except (TypeError, ValueError, ValidationError):
+        raise Http404
+
+
+def read_view(sync_view, authenticated=True):
+    """
+    handler async برای GET و HEAD؛ بقیه متدها به sync_view (view DRF همان
+    مسیر) می‌روند.
+    """
+
+    def decorator(handler):
+        @csrf_exempt
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            try:
+                result = await authentication.aauthenticate(request)
+                request.user, request.auth = result or (AnonymousUser(), None)
+                if authenticated and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                return await handler(request, *args, **kwargs)
+            except (exceptions.APIException, Http404) as exc:
+                return error_response(request, exc)
+
+        # همان read_replica view DRF این مسیر برای GET
+        view.read_replica = reads_from_replica(sync_view, "get")
+        view.sync_view = sync_view
+        return view
+
+    return decorator
+
+
+@read_view(CoinViewSet.as_view({"get": "list", "post": "create"}), authenticated=False)
+async def coin_list(request):
+    query = parse_coin_query(request.GET)
+    version = await aget_catalog_version()
+
+    async def build():
+        return coin_rows.serialize(
+            [row async for row in coin_rows.values(CoinViewSet.queryset.all())]
+        )
+
+    etag = await coin_catalog.alist_etag(version, build, str(query or ""))
+    if etag_matches(request, etag):
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    if query is None:
+        data = await coin_catalog.aget_list(version, build)
+    else:
+        data = (await coin_catalog.aget_index(version, build)).query(**query)
+    return render(data, headers={"ETag": etag})
+
+
+@read_view(
+    CoinViewSet.as_view(
+        {
+            "get": "retrieve",
+            "put": "update",
+            "patch": "partial_update",
+            "delete": "destroy",
+        }
+    ),
+    authenticated=False,
+)
+async def coin_detail(request, symbol):
+    version = await aget_catalog_version()
+
+    async def build():
+        coin = await aget_object(CoinViewSet.queryset.all(), symbol=symbol)
+        return dict(CoinSerializer(coin).data)
+
+    etag = await coin_catalog.adetail_etag(version, symbol, build)
+    if etag_matches(request, etag):
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    data = await coin_catalog.aget_detail(version, symbol, build)
+    return render(data, headers={"ETag": etag})
+
+
+@read_view(AnnouncementViewSet.as_view({"get": "list", "post": "create"}))
+async def announcement_list(request):
+    announcements = [
+        announcement async for announcement in AnnouncementViewSet.queryset.all()
+    ]
+    return render(AnnouncementSerializer(announcements, many=True).data)
+
+
+@read_view(
+    AnnouncementViewSet.as_view(
+        {
+            "get": "retrieve",
+            "put": "update",
+            "patch": "partial_update",
+            "delete": "destroy",
+        }
+    )
+)
+async def announcement_detail(request, pk):
+    announcement = await aget_object(AnnouncementViewSet.queryset.all(), pk=pk)
+    return render(AnnouncementSerializer(announcement).data)
+
+
+@read_view(CurrentUserView.as_view())
+async def current_user(request):
+    return render(UserSerializer(request.user).data)
+
+
+@read_view(WalletDetailAPIView.as_view())
+async def wallet_detail(request):
+    wallets = Wallet.objects.all()
+    if ledger_enabled():
+        wallets = wallets.with_current_balance()
+    wallet = await wallets.aget(user=request.user)
+    # username از همین کاربر خوانده می‌شود، نه با کوئری lazy
+    wallet.user = request.user
+    return render(WalletSerializer(wallet).data)
+
+
+@read_view(MyAssetView.as_view())
+async def my_assets(request):
+    assets = asset_rows.values(Asset.objects.filter(user=request.user))
+    return render(asset_rows.serialize([row async for row in assets]))
+
+
+@require_GET
+async def price_stream(request):
+    """
+    تغییر قیمت‌ها به صورت Server-Sent Events؛ ?symbols=btc,eth فقط همان‌ها را
+    می‌فرستد. اولین پیام‌ها وضعیت کامل و بعدی‌ها فقط فیلدهای تغییرکرده‌اند.
+    """
+    symbols = {
+        symbol.strip()
+        for symbol in request.GET.get("symbols", "").split(",")
+        if symbol.strip()
+    }
+    response = StreamingHttpResponse(
+        stream_events(symbols or None), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # nginx نباید پاسخ را بافر کند
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# در core/urls.py با همان نام‌ها و الگوهای router ثبت می‌شوند
+urlpatterns = [
+    path("prices/stream/", price_stream, name="price-stream"),
+    re_path(r"^coins/$", coin_list, name="coins-list"),
+    re_path(r"^coins/(?P<symbol>[^/.]+)/$", coin_detail, name="coins-detail"),
+    re_path(r"^announcements/$", announcement_list, name="announcements-list"),
+    re_path(
+        r"^announcements/(?P<pk>[^/.]+)/$",
+        announcement_detail,
+        name="announcements-detail",
+    ),
+    path("user/", current_user, name="user-me"),
+    path("wallet/", wallet_detail, name="wallet-me"),
+    path("asset/", my_assets, name="my-assets"),
+]
@@ -0,0 +1,180 @@
+"""
+احراز هویت JWT با کش کاربر در حافظه process.
+
+JWTAuthentication برای هر درخواست یک SELECT روی CustomUser می‌زند. اینجا
+کاربر (به همراه id کیف پولش) برای AUTH_USER_CACHE_TTL ثانیه بر اساس user id
+توکن نگه داشته می‌شود. با ذخیره یا حذف کاربر، ورودی همان لحظه در این process
+پاک و نسخه کاربر در cache جنگو بالا می‌رود تا اگر cache مشترک باشد (CACHE_URL
+در config/settings.py) بقیه processها هم نسخه کهنه را استفاده نکنند.
+
+این کش عمداً تا AUTH_USER_CACHE_TTL ثانیه کهنگی را می‌پذیرد: با LocMemCache
+(بدون CACHE_URL) بقیه processها، و در هر حالت تغییرهایی که signal ندارند
+(QuerySet.update مثل غیرفعال کردن گروهی کاربران، یا تغییر مستقیم دیتابیس)،
+کاربر غیرفعال‌شده یا نقش قبلی را تا پایان TTL می‌بینند. چک کردن نسخه در
+دیتابیس برای هر درخواست همان کوئری‌ای است که این کش حذف می‌کند؛ جایی که این
+تاخیر قابل قبول نیست AUTH_USER_CACHE_TTL=0 کش را خاموش می‌کند.
+"""
+
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+USER_VERSION_KEY = "auth-user-version:{user_id}"
+
+
+def get_user_version(user_id):
+    return cache.get(USER_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_user_version(user_id):
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+        return cache.get(key)
+
+
+class UserCache:
+    def __init__(self, max_entries=10000):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, "AUTH_USER_CACHE_TTL", 5)
+
+    def get(self, user_id):
+        """
+        کپی کاربر کش‌شده یا None. هر درخواست کپی خودش را می‌گیرد تا تغییر
+        request.user در یک درخواست به بقیه نرسد.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None:
+            expires, version, user = entry
+            if expires > time.monotonic() and version == get_user_version(user_id):
+                with self._lock:
+                    self.hits += 1
+                return copy.copy(user)
+            self.invalidate(user_id)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, user_id, user, version):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = (
+                time.monotonic() + self.ttl,
+                version,
+                copy.copy(user),
+            )
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    همان JWTAuthentication با کش کاربر. کاربر برگشتی ویژگی cached_wallet_id
+    هم دارد تا معاملات برای پیدا کردن کیف پول کوئری جدا نزنند.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            # نسخه قبل از کوئری خوانده می‌شود تا ذخیره همزمان باعث کش شدن داده کهنه نشود
+            version = get_user_version(user_id)
+            try:
+                user = self.get_user_queryset().get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user, version)
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """نسخه async از authenticate برای viewهای async (core.async_views)."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            version = get_user_version(user_id)
+            try:
+                user = await self.get_user_queryset().aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user, version)
+        return self.check_user(user, validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def get_user_queryset(self):
+        return self.user_model.objects.annotate(cached_wallet_id=F("wallet__id"))
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,58 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connections
+from django.urls import URLPattern, URLResolver
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def route_names(patterns):
+    """نام همه routeهای نام‌دار در یک لیست urlpatterns (با includeها)."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+@contextmanager
+def isolated_database(alias="default", keep=False):
+    """
+    یک دیتابیس موقت با همان تنظیمات (مثل دیتابیس تست) می‌سازد، migrate می‌کند و
+    در پایان حذفش می‌کند تا بنچمارک‌ها به دیتابیس اصلی دست نزنند.
+
+    برای SQLite به جای دیتابیس حافظه‌ای از یک فایل موقت استفاده می‌شود تا
+    چند thread بتوانند مثل محیط واقعی به آن وصل شوند.
+    """
+    connection = connections[alias]
+    old_name = connection.settings_dict["NAME"]
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    old_test_name = test_settings.get("NAME")
+
+    if connection.vendor == "sqlite" and not old_test_name:
+        handle, path = tempfile.mkstemp(prefix="crypton-bench-", suffix=".sqlite3")
+        os.close(handle)
+        test_settings["NAME"] = path
+
+    try:
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=keep
+        )
+    except BaseException:
+        test_settings["NAME"] = old_test_name
+        raise
+
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keep)
+        test_settings["NAME"] = old_test_name
@@ -0,0 +1,335 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.http import parse_etags, quote_etag
+
+from .models import CacheVersion
+from .search import CoinSearchIndex
+
+
+CATALOG_VERSION = "coin-catalog"
+
+# هر تغییر قیمت (فید قیمت، ath/atl تاریخچه)؛ جدا از CATALOG_VERSION تا تیک‌های
+# قیمت کش پرتفوی همه کاربران را بی‌اعتبار نکنند
+PRICE_LIST_VERSION = "coin-price:list"
+
+PRICE_VERSION_ALL = "coin-price:all"
+
+PORTFOLIO_VERSION = "portfolio:{user_id}"
+
+
+def price_version_name(coin_id):
+    return f"coin-price:{coin_id}"
+
+
+class VersionStore:
+    """
+    شمارنده‌های نسخه در جدول CacheVersion، تا بالا رفتن نسخه در هر process
+    (وب، run_price_feed، import_coins، موتور تطبیق) به همه processها برسد؛
+    LocMemCache جنگو مال همان process است.
+
+    هر process نسخه خوانده‌شده را VERSION_POLL_SECONDS ثانیه نگه می‌دارد، مثل
+    poll در core.pricestream: تغییر process دیگر حداکثر با همین تاخیر دیده
+    می‌شود و process خودِ تغییر، بعد از commit، بلافاصله.
+    """
+
+    def __init__(self, max_entries=10000):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.max_entries = max_entries
+
+    @property
+    def ttl(self):
+        return getattr(settings, "VERSION_POLL_SECONDS", 1)
+
+    def _lookup(self, names):
+        now = time.monotonic()
+        versions, missing = {}, []
+        with self._lock:
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is not None and entry[0] > now:
+                    versions[name] = entry[1]
+                else:
+                    missing.append(name)
+        return versions, missing
+
+    def _remember(self, versions, missing, rows):
+        fetched = dict(rows)
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if len(self._entries) + len(missing) > self.max_entries:
+                self._entries.clear()
+            for name in missing:
+                # نامی که هنوز ردیف ندارد None است و همین هم نگه داشته می‌شود
+                versions[name] = fetched.get(name)
+                self._entries[name] = (expires, versions[name])
+        return versions
+
+    def get_many(self, names, fresh=False):
+        """{name: version}؛ None برای نامی که هنوز هیچ وقت بالا نرفته است."""
+        if fresh:
+            versions, missing = {}, list(names)
+        else:
+            versions, missing = self._lookup(names)
+        if missing:
+            rows = CacheVersion.objects.filter(name__in=missing).values_list(
+                "name", "version"
+            )
+            versions = self._remember(versions, missing, rows)
+        return versions
+
+    async def aget_many(self, names):
+        versions, missing = self._lookup(names)
+        if missing:
+            rows = CacheVersion.objects.filter(name__in=missing).values_list(
+                "name", "version"
+            )
+            versions = self._remember(versions, missing, [row async for row in rows])
+        return versions
+
+    def bump(self, names):
+        """
+        نسخه همه names را یکی بالا می‌برد. ردیف نبود با مقدار اولیه بر اساس
+        زمان ساخته می‌شود تا بعد از ساخت دوباره دیتابیس با ETagهای قبلی یکی نشود.
+        """
+        names = list(names)
+        updated = CacheVersion.objects.filter(name__in=names).update(
+            version=F("version") + 1
+        )
+        if updated < len(names):
+            CacheVersion.objects.bulk_create(
+                [CacheVersion(name=name, version=time.time_ns()) for name in names],
+                ignore_conflicts=True,
+            )
+        # داخل تراکنش، نسخه جدید تا commit برای بقیه دیده نمی‌شود
+        transaction.on_commit(lambda: self.forget(names))
+
+    def forget(self, names):
+        with self._lock:
+            for name in names:
+                self._entries.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+versions = VersionStore()
+
+
+def get_catalog_version():
+    """
+    نسخه فعلی لیست و جزئیات رمزارزها: نسخه کاتالوگ و نسخه قیمت‌ها با هم.
+    فقط کلید کش همین process است؛ ETag از خود محتوا ساخته می‌شود (CatalogCache).
+    """
+    found = versions.get_many([CATALOG_VERSION, PRICE_LIST_VERSION])
+    return found[CATALOG_VERSION], found[PRICE_LIST_VERSION]
+
+
+async def aget_catalog_version():
+    """get_catalog_version برای viewهای async."""
+    found = await versions.aget_many([CATALOG_VERSION, PRICE_LIST_VERSION])
+    return found[CATALOG_VERSION], found[PRICE_LIST_VERSION]
+
+
+def bump_catalog_version(coin_ids=None):
+    """
+    برای تغییر خود کاتالوگ (ادمین، import_coins): نسخه کاتالوگ و قیمت را بالا
+    می‌برد. اگر coin_ids داده شود فقط نسخه قیمت همان رمزارزها عوض می‌شود، وگرنه
+    تغییر برای همه رمزارزها در نظر گرفته می‌شود.
+    """
+    if coin_ids is None:
+        names = [PRICE_VERSION_ALL]
+    else:
+        names = [price_version_name(pk) for pk in coin_ids]
+    versions.bump([CATALOG_VERSION, *names])
+
+
+def bump_price_versions(coin_ids):
+    """برای تغییر فقط قیمت‌ها (فید قیمت)؛ نسخه کاتالوگ عوض نمی‌شود."""
+    versions.bump([PRICE_LIST_VERSION, *(price_version_name(pk) for pk in coin_ids)])
+
+
+def price_version_names(coin_ids):
+    return [PRICE_VERSION_ALL] + [price_version_name(pk) for pk in coin_ids]
+
+
+def bump_portfolio_version(user_id):
+    bump_portfolio_versions([user_id])
+
+
+def bump_portfolio_versions(user_ids):
+    names = [PORTFOLIO_VERSION.format(user_id=user_id) for user_id in user_ids]
+    if names:
+        versions.bump(names)
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return "*" in etags or etag in etags or f"W/{etag}" in etags
+
+
+def content_digest(data):
+    """hash خود داده برای ETag؛ تا محتوا عوض نشده، با تغییر نسخه هم 304 می‌ماند."""
+    content = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+class CatalogCache:
+    """
+    خروجی serialize شده لیست و جزئیات رمزارزها (همراه ETag هر کدام) را در
+    حافظه همین process نگه می‌دارد و با تغییر نسخه کاتالوگ یا قیمت‌ها کل آن را
+    دور می‌ریزد.
+
+    ETag از محتوا است: جزئیات رمزارزی که قیمتش در flush فید عوض نشده همان ETag
+    را دارد و 304 می‌گیرد. لیست کامل اما با هر تغییر قیمتی واقعاً عوض می‌شود،
+    پس تا وقتی فید قیمت فعال است 304 لیست فقط بین دو flush ممکن است.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (داده، content_digest آن)
+        self._list = None
+        self._details = {}
+        self._index = None
+        # index نسخه قبلی؛ اگر symbolها و nameها عوض نشده باشند بخش متنی‌اش
+        # دوباره استفاده می‌شود
+        self._previous_index = None
+
+    def _sync(self, version):
+        if self._version != version:
+            self._version = version
+            self._list = None
+            self._details = {}
+            if self._index is not None:
+                self._previous_index = self._index
+            self._index = None
+
+    def _list_entry(self, version, build):
+        with self._lock:
+            self._sync(version)
+            entry = self._list
+        if entry is None:
+            data = build()
+            entry = (data, content_digest(data))
+            with self._lock:
+                if self._version == version:
+                    self._list = entry
+        return entry
+
+    async def _alist_entry(self, version, build):
+        with self._lock:
+            self._sync(version)
+            entry = self._list
+        if entry is None:
+            data = await build()
+            entry = (data, content_digest(data))
+            with self._lock:
+                if self._version == version:
+                    self._list = entry
+        return entry
+
+    def _detail_entry(self, version, symbol, build):
+        with self._lock:
+            self._sync(version)
+            entry = self._details.get(symbol)
+        if entry is None:
+            data = build()
+            entry = (data, content_digest(data))
+            with self._lock:
+                if self._version == version:
+                    self._details[symbol] = entry
+        return entry
+
+    async def _adetail_entry(self, version, symbol, build):
+        with self._lock:
+            self._sync(version)
+            entry = self._details.get(symbol)
+        if entry is None:
+            data = await build()
+            entry = (data, content_digest(data))
+            with self._lock:
+                if self._version == version:
+                    self._details[symbol] = entry
+        return entry
+
+    def list_etag(self, version, build, query=""):
+        return self._list_etag(self._list_entry(version, build)[1], query)
+
+    async def alist_etag(self, version, build, query=""):
+        return self._list_etag((await self._alist_entry(version, build))[1], query)
+
+    def _list_etag(self, digest, query):
+        if query:
+            # هر ترکیب پارامترهای جستجو پاسخ جدا و ETag جدا دارد
+            return quote_etag(
+                f"coins-{digest}-{hashlib.md5(query.encode()).hexdigest()}"
+            )
+        return quote_etag(f"coins-{digest}")
+
+    def detail_etag(self, version, symbol, build):
+        digest = self._detail_entry(version, symbol, build)[1]
+        return quote_etag(f"coin-{symbol}-{digest}")
+
+    async def adetail_etag(self, version, symbol, build):
+        digest = (await self._adetail_entry(version, symbol, build))[1]
+        return quote_etag(f"coin-{symbol}-{digest}")
+
+    def get_list(self, version, build):
+        return self._list_entry(version, build)[0]
+
+    def get_detail(self, version, symbol, build):
+        return self._detail_entry(version, symbol, build)[0]
+
+    async def aget_list(self, version, build):
+        """مثل get_list؛ build یک coroutine function است (viewهای async)."""
+        return (await self._alist_entry(version, build))[0]
+
+    async def aget_detail(self, version, symbol, build):
+        return (await self._adetail_entry(version, symbol, build))[0]
+
+    def get_index(self, version, build):
+        """
+        CoinSearchIndex روی لیست همین نسخه؛ build همان تابع get_list است.
+        """
+        with self._lock:
+            self._sync(version)
+            index, previous = self._index, self._previous_index
+        if index is None:
+            index = CoinSearchIndex(self.get_list(version, build), previous)
+            with self._lock:
+                if self._version == version:
+                    self._index = index
+        return index
+
+    async def aget_index(self, version, build):
+        with self._lock:
+            self._sync(version)
+            index, previous = self._index, self._previous_index
+        if index is None:
+            index = CoinSearchIndex(await self.aget_list(version, build), previous)
+            with self._lock:
+                if self._version == version:
+                    self._index = index
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._list = None
+            self._details = {}
+            self._index = None
+            self._previous_index = None
+
+
+coin_catalog = CatalogCache()
@@ -0,0 +1,151 @@
+"""
+serialize سریع لیست‌های پرخواندنی از ردیف‌های .values() به جای نمونه مدل.
+
+ModelSerializer برای هر ردیف هر فیلد را با get_attribute و to_representation
+جدا رد می‌کند و برای هر Decimal یک context تازه می‌سازد. ValuesSerializer
+یک بار از روی همان serializer اصلی ستون values() و تبدیل هر فیلد را آماده
+می‌کند و بعد هر ردیف فقط یک حلقه ساده روی همین لیست است؛ پس خروجی (نام، ترتیب
+فیلدها و قالب Decimal و تاریخ) همان خروجی serializer اصلی است و با تغییر آن
+خودش عوض می‌شود.
+
+فقط فیلدهایی که source آن‌ها ستون مدل است پشتیبانی می‌شوند (CharField،
+IntegerField، DecimalField، DateTimeField، serializer تو در تو و ...)؛
+فیلدهای متدی مثل SerializerMethodField هنگام ساخت ImproperlyConfigured می‌دهند.
+"""
+
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# فیلدهایی که مقدار ستون دیتابیس همان خروجی to_representation آن‌هاست
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def decimal_converter(field):
+    """همان DecimalField.to_representation با context و توان از قبل ساخته‌شده."""
+    coerce_to_string = getattr(
+        field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+    )
+    if not coerce_to_string or field.localize or field.decimal_places is None:
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+    rounding = field.rounding
+    normalize = field.normalize_output
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        value = value.quantize(exponent, rounding=rounding, context=context)
+        if normalize:
+            value = value.normalize()
+        return f"{value:f}"
+
+    return convert
+
+
+def datetime_converter(field):
+    """همان DateTimeField.to_representation برای قالب ISO 8601."""
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    enforce_timezone = field.enforce_timezone
+
+    def convert(value):
+        value = enforce_timezone(value).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def field_converter(field):
+    """تبدیل مقدار ستون به خروجی فیلد؛ None یعنی همان مقدار."""
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, serializers.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_converter(field)
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    نسخه سریع یک serializer فقط‌خواندنی روی ردیف‌های .values():
+
+        transactions = ValuesSerializer(TransactionSerializer)
+        data = transactions.serialize(transactions.values(queryset))
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.columns = []
+        self._fields = self._compile(serializer_class(), "")
+
+    def _compile(self, serializer, prefix):
+        fields = []
+        model = serializer.Meta.model
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*" or isinstance(field, serializers.ManyRelatedField):
+                raise ImproperlyConfigured(
+                    f"{type(serializer).__name__}.{name} is not a column and cannot "
+                    f"be read from .values()"
+                )
+            column = prefix + "__".join(field.source_attrs)
+            if isinstance(field, serializers.BaseSerializer):
+                # اگر رابطه null باشد کل serializer تو در تو None است
+                pk_column = f"{column}__{field.Meta.model._meta.pk.name}"
+                self._add_column(pk_column)
+                fields.append(
+                    (name, pk_column, None, self._compile(field, column + "__"))
+                )
+                continue
+            try:
+                model._meta.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    f"{type(serializer).__name__}.{name} has source "
+                    f"{field.source!r}, which is not a model column"
+                )
+            self._add_column(column)
+            fields.append((name, column, field_converter(field), None))
+        return fields
+
+    def _add_column(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, row, fields=None):
+        data = {}
+        for name, column, convert, nested in fields or self._fields:
+            value = row[column]
+            if nested is not None:
+                data[name] = (
+                    None if value is None else self.to_representation(row, nested)
+                )
+            elif convert is None or value is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
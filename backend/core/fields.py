@@ -0,0 +1,220 @@
+"""
+مقدارهای پولی و مقدار رمزارز به صورت عدد صحیح ۶۴ بیتی با ممیز ثابت.
+
+FixedPointDecimalField در پایتون Decimal است ولی در دیتابیس BIGINT واحدهای
+کوچک (مقدار × 10^decimal_places) را نگه می‌دارد؛ پس مقایسه و SUM در خود
+دیتابیس روی عدد صحیح و دقیق اجرا می‌شوند (SQLite ستون decimal را REAL ذخیره
+می‌کند). تبدیل در هر دو جهت دقیق است: مقدار با ارقام اعشار بیشتر با
+ROUND_HALF_EVEN گرد می‌شود (مثل trading.quantize) و مقدار خارج از بازه BIGINT
+خطا می‌دهد.
+
+فیلد اختیاری است: amount_field با FIXED_POINT_AMOUNTS یک FixedPointDecimalField
+و گرنه همان DecimalField می‌سازد. کدی که باید با هر دو حالت کار کند:
+
+- مقدار پایتونی را در عبارت‌های F() با fixed_value و همراه فیلدش می‌فرستد:
+  F("amount") + fixed_value(Asset, "amount", amount). Value بدون output_field
+  مقیاس ستون را نمی‌داند و Decimal را خام به واحدها اضافه می‌کند.
+- برای ضرب یا جمع ستون با ستون‌های دیگر (مثلاً amount * قیمت) از
+  decimal_expression استفاده می‌کند.
+- Sum و Min و Max و فیلترها (amount__gte=...) خودشان درست‌اند؛ Avg و
+  annotate عبارت‌های ترکیبی بدون output_field واحد کوچک برمی‌گردانند.
+  SUM در SQLite روی عدد صحیح اگر از بازه BIGINT بگذرد (با ۸ رقم اعشار حدود
+  ۹۲ میلیارد) خطای integer overflow می‌دهد؛ PostgreSQL نتیجه را numeric می‌کند.
+
+این حالت برای دقت است، نه سرعت: bench_amounts روی SQLite جمع‌های دقیق ولی
+کمی کندتر از decimal نشان می‌دهد. پیش‌فرض خاموش است.
+
+تغییر FIXED_POINT_AMOUNTS نوع ستون را عوض می‌کند. دستور
+make_fixed_point_migration برای این ستون‌ها migration با ConvertFixedPoint
+می‌نویسد که ردیف‌های موجود را هم در 10^decimal_places ضرب (یا بر آن تقسیم)
+می‌کند. makemigrations معمولی AlterField می‌نویسد که مقدارها را بدون مقیاس و
+گردشده به عدد صحیح تبدیل می‌کند، پس بعد از تغییر این تنظیم نباید اجرا شود.
+"""
+
+import decimal
+from decimal import ROUND_HALF_EVEN, Decimal
+
+from django import forms
+from django.conf import settings
+from django.core import checks, validators
+from django.core.exceptions import ValidationError
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, Value
+from django.utils.functional import cached_property
+
+# Decimal تا ۱۹ رقم صحیح و ۱۸ رقم اعشار بدون گرد شدن ناخواسته
+CONTEXT = decimal.Context(prec=40)
+
+
+class FixedPointDecimalField(models.BigIntegerField):
+    description = "Decimal number stored as a scaled 64-bit integer"
+
+    def __init__(self, *args, max_digits=None, decimal_places=None, **kwargs):
+        self.max_digits = max_digits
+        self.decimal_places = decimal_places
+        super().__init__(*args, **kwargs)
+
+    def check(self, **kwargs):
+        errors = super().check(**kwargs)
+        if not isinstance(self.decimal_places, int) or self.decimal_places < 0:
+            errors.append(
+                checks.Error(
+                    "FixedPointDecimalField requires a non-negative integer "
+                    "'decimal_places'.",
+                    obj=self,
+                    id="core.E001",
+                )
+            )
+        return errors
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_digits is not None:
+            kwargs["max_digits"] = self.max_digits
+        kwargs["decimal_places"] = self.decimal_places
+        return name, path, args, kwargs
+
+    @cached_property
+    def exponent(self):
+        """ارزش یک واحد کوچک، مثلاً Decimal("1E-8")."""
+        return Decimal(1).scaleb(-self.decimal_places)
+
+    @cached_property
+    def validators(self):
+        # بازه BIGINT بر حسب Decimal به جای بازه عدد صحیح BigIntegerField
+        limit = Decimal(self.MAX_BIGINT).scaleb(-self.decimal_places)
+        return [
+            *self.default_validators,
+            *self._validators,
+            validators.MinValueValidator(-limit),
+            validators.MaxValueValidator(limit),
+        ]
+
+    def units(self, value):
+        """Decimal (یا هر مقدار قابل تبدیل) -> تعداد واحدهای کوچک."""
+        value = self.to_python(value)
+        if value is None:
+            return None
+        units = int(
+            value.quantize(self.exponent, ROUND_HALF_EVEN, context=CONTEXT).scaleb(
+                self.decimal_places, context=CONTEXT
+            )
+        )
+        if not -self.MAX_BIGINT - 1 <= units <= self.MAX_BIGINT:
+            raise ValueError(f"{value} is out of range for {self.name}")
+        return units
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            # repr کوتاه‌ترین نمایش float است (0.1 و نه 0.1000000000000000055...)
+            value = Decimal(repr(value) if isinstance(value, float) else value)
+        except (decimal.InvalidOperation, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages["invalid"], code="invalid", params={"value": value}
+            )
+        if not value.is_finite():
+            raise ValidationError(
+                self.error_messages["invalid"], code="invalid", params={"value": value}
+            )
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(int(value)).scaleb(-self.decimal_places)
+
+    def get_prep_value(self, value):
+        return self.units(models.Field.get_prep_value(self, value))
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(
+            self,
+            **{
+                "form_class": forms.DecimalField,
+                "max_digits": self.max_digits,
+                "decimal_places": self.decimal_places,
+                **kwargs,
+            },
+        )
+
+
+def amount_field(max_digits, decimal_places, **kwargs):
+    """فیلد موجودی یا مقدار؛ با FIXED_POINT_AMOUNTS ممیز ثابت، وگرنه DecimalField."""
+    if getattr(settings, "FIXED_POINT_AMOUNTS", False):
+        field_class = FixedPointDecimalField
+    else:
+        field_class = models.DecimalField
+    return field_class(max_digits=max_digits, decimal_places=decimal_places, **kwargs)
+
+
+def fixed_value(model, field_name, value):
+    """value با مقیاس ستون field_name، برای عبارت‌هایی مثل F(field_name) + ..."""
+    return Value(value, output_field=model._meta.get_field(field_name))
+
+
+def decimal_expression(model, field_name, path=None):
+    """
+    ستون field_name از model (یا همان ستون از مسیر path، مثلاً
+    "asset__amount") به صورت Decimal در SQL، برای ضرب و جمع با ستون‌های دیگر.
+    """
+    field = model._meta.get_field(field_name)
+    column = F(path or field_name)
+    if not isinstance(field, FixedPointDecimalField):
+        return column
+    output = models.DecimalField(
+        max_digits=field.max_digits, decimal_places=field.decimal_places
+    )
+    return ExpressionWrapper(
+        column * Value(field.exponent, output_field=output), output_field=output
+    )
+
+
+class ConvertFixedPoint(migrations.AlterField):
+    """
+    AlterField که اگر ستون بین DecimalField و FixedPointDecimalField عوض شود
+    مقدار ردیف‌ها را هم تبدیل می‌کند: ستون اول به یک decimal پهن‌تر تغییر
+    می‌کند، مقدارها در دیتابیس ضرب (یا تقسیم) و گرد می‌شوند و بعد ستون به نوع
+    نهایی می‌رسد. در بقیه تغییرها همان AlterField است.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        from_model = from_state.apps.get_model(app_label, self.model_name)
+        to_model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, to_model):
+            return
+        old = from_model._meta.get_field(self.name)
+        new = to_model._meta.get_field(self.name)
+        to_fixed = isinstance(new, FixedPointDecimalField)
+        if to_fixed == isinstance(old, FixedPointDecimalField):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+            return
+
+        fixed = new if to_fixed else old
+        # برای ضرب در 10^decimal_places جا داشته باشد
+        wide = models.DecimalField(
+            max_digits=(old.max_digits or 19) + fixed.decimal_places,
+            decimal_places=old.decimal_places,
+            null=old.null,
+        )
+        wide.set_attributes_from_name(old.name)
+        wide.model = from_model
+
+        quote = schema_editor.quote_name
+        table, column = quote(from_model._meta.db_table), quote(old.column)
+        if to_fixed:
+            sql = f"UPDATE {table} SET {column} = ROUND({column} * %s)"
+            factor = 10**fixed.decimal_places
+        else:
+            sql = f"UPDATE {table} SET {column} = {column} * %s"
+            factor = fixed.exponent
+
+        schema_editor.alter_field(from_model, old, wide)
+        schema_editor.execute(sql, [factor])
+        schema_editor.alter_field(from_model, wide, new)
+
+    def describe(self):
+        return (
+            f"Alter field {self.name} on {self.model_name} and convert fixed-point rows"
+        )
@@ -0,0 +1,117 @@
+"""
+?fields=id,username,is_active برای viewsetها (sparse fieldset).
+
+فیلدهای دیگر از خروجی serializer حذف می‌شوند و کوئری هم با only() فقط
+ستون‌های لازم همان فیلدها را می‌خواند؛ رابطه‌هایی که لازم نیستند از
+select_related کنار گذاشته می‌شوند. ستون هر فیلد از source آن پیدا می‌شود
+(user.username -> user__username، و برای serializer تو در تو ستون همه
+فیلدهای آن). فیلدهایی که source آن‌ها ستون مدل نیست باید در sparse_columns
+view آمده باشند، وگرنه خروجی کوتاه می‌شود ولی کوئری همه ستون‌ها را می‌خواند.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer
+
+
+def resolve_column(model, path):
+    """مدل آخر مسیر user__username، یا None اگر مسیر ستون مدل نباشد."""
+    for part in path.split("__"):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+        if field.is_relation:
+            model = field.related_model
+    return model
+
+
+def sparse_columns(serializer, names, extra=None):
+    """
+    ستون‌های only() برای فیلدهای names از serializer، یا None اگر یکی از
+    آن‌ها قابل تبدیل به ستون نباشد.
+    """
+    extra = extra or {}
+    columns = {serializer.Meta.model._meta.pk.name}
+    for name in names:
+        if name in extra:
+            columns.update(extra[name])
+            continue
+        field = serializer.fields[name]
+        prefix = "__".join(field.source_attrs)
+        if isinstance(field, BaseSerializer):
+            columns.add(f"{prefix}__{field.Meta.model._meta.pk.name}")
+            for child in field.fields.values():
+                columns.add(f"{prefix}__{'__'.join(child.source_attrs)}")
+        else:
+            columns.add(prefix)
+
+    model = serializer.Meta.model
+    if any(resolve_column(model, column) is None for column in columns):
+        return None
+    return columns
+
+
+class SparseFieldsetMixin:
+    fields_query_param = "fields"
+    # فیلد serializer -> ستون‌هایی که لازم دارد، برای فیلدهایی که source آن‌ها
+    # ستون مدل نیست (مثلاً متد)
+    sparse_columns = {}
+
+    def get_sparse_fields(self):
+        """فیلدهای خواسته‌شده به ترتیب serializer، یا None برای همه."""
+        if hasattr(self, "_sparse_fields"):
+            return self._sparse_fields
+        self._sparse_fields = None
+        raw = self.request.query_params.get(self.fields_query_param)
+        if self.request.method not in SAFE_METHODS or not raw:
+            return None
+
+        names = {name.strip() for name in raw.split(",") if name.strip()}
+        available = {
+            name: field
+            for name, field in self.get_serializer_class()().fields.items()
+            if not field.write_only
+        }
+        unknown = sorted(names - set(available))
+        if unknown:
+            raise ValidationError(
+                {
+                    self.fields_query_param: [
+                        f"فیلد نامعتبر: {', '.join(unknown)}. فیلدهای مجاز: "
+                        f"{', '.join(available)}"
+                    ]
+                }
+            )
+        self._sparse_fields = [name for name in available if name in names]
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        names = self.get_sparse_fields()
+        if names:
+            target = getattr(serializer, "child", serializer)
+            for name in list(target.fields):
+                if name not in names:
+                    target.fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        names = self.get_sparse_fields()
+        if not names:
+            return queryset
+        columns = sparse_columns(
+            self.get_serializer_class()(), names, self.sparse_columns
+        )
+        if columns is None:
+            return queryset
+        relations = {column.rsplit("__", 1)[0] for column in columns if "__" in column}
+        queryset = queryset.select_related(None)
+        if relations:
+            # select_related() بدون آرگومان همه رابطه‌ها را دنبال می‌کند
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
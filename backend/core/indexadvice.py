@@ -0,0 +1,179 @@
+"""
+پیشنهاد index از روی plan کوئری‌ها (دستور index_advice).
+
+برای هر queryset خروجی EXPLAIN (روی SQLite همان EXPLAIN QUERY PLAN) گرفته
+می‌شود و دو الگو علامت می‌خورد:
+
+- اسکن کامل جدول: `SCAN <table>` در SQLite و `Seq Scan on <table>` در PostgreSQL
+- مرتب‌سازی جدا از index: `USE TEMP B-TREE` در SQLite و گره `Sort` در PostgreSQL
+
+پیشنهاد index از خود queryset ساخته می‌شود: اول ستون‌های شرط تساوی جدول
+اصلی، بعد ستون‌های ORDER BY (یا اگر مرتب‌سازی نبود، ستون‌های شرط بازه‌ای).
+شرط تساوی روی فیلد boolean شرط index جزئی (condition) می‌شود؛ جنگو
+`is_active=True` را به `WHERE "is_active"` ترجمه می‌کند که SQLite برای آن از
+ستون index استفاده نمی‌کند.
+"""
+
+import re
+import statistics
+import time
+
+from django.db import connections
+from django.db.models import BooleanField, Index, Q
+from django.db.models.expressions import Col
+from django.db.models.lookups import Lookup
+from django.db.models.sql.where import AND
+
+EQUALITY_LOOKUPS = {"exact", "iexact", "isnull", "in"}
+RANGE_LOOKUPS = {"lt", "lte", "gt", "gte", "range"}
+
+PLAN_PATTERNS = {
+    "sqlite": [
+        (re.compile(r"\bSCAN (\w+)$", re.M), "full scan of {0}"),
+        (re.compile(r"\bUSE TEMP B-TREE FOR (\w+(?: BY)?)"), "temp b-tree for {0}"),
+    ],
+    "postgresql": [
+        (re.compile(r"\bSeq Scan on (\w+)"), "full scan of {0}"),
+        (re.compile(r"^\s*(?:->\s*)?((?:Incremental )?Sort)\b", re.M), "{0} node"),
+    ],
+}
+
+
+def explain(queryset, analyze=False):
+    options = {}
+    if analyze and connections[queryset.db].vendor == "postgresql":
+        options["analyze"] = True
+    return queryset.explain(**options)
+
+
+def plan_problems(plan, vendor):
+    """مشکلات plan به صورت متن کوتاه؛ روی دیتابیس‌های دیگر لیست خالی."""
+    problems = []
+    for pattern, message in PLAN_PATTERNS.get(vendor, []):
+        for match in pattern.finditer(plan):
+            problems.append(message.format(*match.groups()))
+    return problems
+
+
+def _base_lookups(query):
+    """شرط‌های AND روی ستون‌های جدول اصلی (بدون join) به صورت (lookup، فیلد، مقدار)."""
+    base_alias = query.get_initial_alias()
+    pending = [query.where]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, Lookup):
+            if isinstance(node.lhs, Col) and node.lhs.alias == base_alias:
+                yield node.lookup_name, node.lhs.target, node.rhs
+        elif getattr(node, "connector", None) == AND and not node.negated:
+            pending.extend(node.children)
+
+
+def _ordering(query):
+    model = query.model
+    ordering = query.order_by or (
+        model._meta.ordering if query.default_ordering else ()
+    )
+    fields = []
+    for item in ordering:
+        # عبارت‌ها، annotateها و فیلدهای جدول‌های دیگر را index این جدول پوشش نمی‌دهد
+        if not isinstance(item, str) or "__" in item:
+            break
+        name = item.lstrip("-")
+        if name == "pk":
+            name = model._meta.pk.name
+        try:
+            model._meta.get_field(name)
+        except Exception:
+            break
+        fields.append(f"-{name}" if item.startswith("-") else name)
+    return fields
+
+
+def existing_indexes(model, using="default"):
+    """
+    ستون‌های indexهایی که واقعاً در دیتابیس هستند (از جمله unique و کلید
+    اصلی)؛ نه Meta.indexes، چون migration ممکن است اجرا نشده باشد.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return [
+        tuple(constraint["columns"])
+        for constraint in constraints.values()
+        if constraint["columns"]
+        and (constraint["index"] or constraint["unique"] or constraint["primary_key"])
+    ]
+
+
+def index_name(model, fields):
+    name = "_".join(
+        [model._meta.model_name] + [field.lstrip("-") for field in fields] + ["idx"]
+    )
+    if len(name) > Index.max_name_length:
+        name = name[: Index.max_name_length - 4].rstrip("_") + "_idx"
+    return name
+
+
+def suggest_index(queryset):
+    """
+    Index پیشنهادی برای queryset یا None اگر index موجود کافی است یا ستونی
+    برای index کردن نیست.
+    """
+    query = queryset.query
+    model = query.model
+    equal, ranges, condition = [], [], {}
+    for lookup_name, field, value in _base_lookups(query):
+        if isinstance(field, BooleanField) and lookup_name == "exact":
+            condition[field.name] = value
+        elif lookup_name in EQUALITY_LOOKUPS and field.name not in equal:
+            equal.append(field.name)
+        elif lookup_name in RANGE_LOOKUPS and field.name not in ranges:
+            ranges.append(field.name)
+
+    fields = list(equal)
+    order = [field for field in _ordering(query) if field.lstrip("-") not in equal]
+    if order:
+        fields += order
+    else:
+        fields += [field for field in ranges if field not in equal][:1]
+    if not fields:
+        return None
+
+    columns = tuple(model._meta.get_field(field.lstrip("-")).column for field in fields)
+    for existing in existing_indexes(model, queryset.db):
+        if existing[: len(columns)] == columns:
+            return None
+    return Index(
+        fields=fields,
+        condition=Q(**condition) if condition else None,
+        name=index_name(model, fields),
+    )
+
+
+def format_index(index):
+    fields = ", ".join(f'"{field}"' for field in index.fields)
+    condition = ""
+    if index.condition is not None:
+        lookups = ", ".join(
+            f"{name}={value!r}" for name, value in index.condition.children
+        )
+        condition = f", condition=Q({lookups})"
+    return f'models.Index(fields=[{fields}]{condition}, name="{index.name}")'
+
+
+def time_queryset(queryset, repeat=5, first_row=False):
+    """
+    میانه زمان اجرا به میلی‌ثانیه. با first_row فقط اولین ردیف خوانده می‌شود
+    (مثل خروجی‌های جریانی که زمان رسیدن اولین بایت مهم است).
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if first_row:
+            next(iter(queryset.iterator(chunk_size=1000)), None)
+        else:
+            list(queryset.all())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,162 @@
+"""
+موجودی کیف پول به صورت دفتر append-only (تنظیم WALLET_LEDGER).
+
+در حالت عادی هر خرید و فروش ردیف Wallet را UPDATE می‌کند و همه سفارش‌های
+یک حساب پشت قفل همان ردیف صف می‌کشند. در حالت دفتر هر تغییر موجودی یک
+WalletLedgerEntry جدید است و موجودی واقعی برابر است با:
+
+    Wallet.balance (snapshot) + SUM(ورودی‌های با id بزرگ‌تر از ledger_offset)
+
+- واریز (فروش) فقط INSERT است و به ردیف Wallet دست نمی‌زند.
+- برداشت (خرید) ردیف Wallet را با FOR NO KEY UPDATE قفل می‌کند تا دو برداشت
+  همزمان موجودی را منفی نکنند؛ این قفل جلوی INSERT ورودی‌های واریز را
+  نمی‌گیرد.
+- compact_wallets ورودی‌ها را در snapshot جمع می‌کند.
+
+پیش از خاموش کردن WALLET_LEDGER باید `manage.py compact_wallets` اجرا شود.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Max, Sum
+
+from .fields import fixed_value
+from .models import Wallet, WalletLedgerEntry
+
+
+def ledger_enabled():
+    return getattr(settings, "WALLET_LEDGER", False)
+
+
+def pending_total(wallet):
+    total = (
+        WalletLedgerEntry.objects.filter(wallet=wallet, id__gt=wallet.ledger_offset)
+        .aggregate(total=Sum("amount"))
+        .get("total")
+    )
+    return total or Decimal("0")
+
+
+def current_balance(wallet):
+    return wallet.balance + pending_total(wallet)
+
+
+def wallet_id_for(user):
+    """
+    id کیف پول کاربر. پیش از شروع تراکنش معامله خوانده می‌شود تا اولین دستور
+    تراکنش INSERT باشد؛ روی SQLite تراکنشی که اول می‌خواند و بعد می‌نویسد به
+    جای صبر کردن برای قفل، فوراً با database is locked شکست می‌خورد.
+    """
+    # CachedJWTAuthentication id کیف پول را همراه کاربر کش می‌کند
+    wallet_id = getattr(user, "cached_wallet_id", None)
+    if wallet_id is not None:
+        return wallet_id
+    return Wallet.objects.filter(user=user).values_list("id", flat=True).get()
+
+
+def lock_wallet(wallet_id):
+    """
+    ردیف کیف پول را برای برداشت قفل می‌کند. روی PostgreSQL از FOR NO KEY UPDATE
+    استفاده می‌شود که با قفل FOR KEY SHARE ناشی از INSERT ورودی‌های دفتر تداخل
+    ندارد؛ پس واریزهای همزمان منتظر برداشت نمی‌مانند.
+    """
+    queryset = Wallet.objects.filter(pk=wallet_id).only(
+        "id", "balance", "ledger_offset"
+    )
+    features = connections[queryset.db].features
+    if features.has_select_for_update:
+        queryset = queryset.select_for_update(
+            no_key=features.has_select_for_no_key_update
+        )
+    return queryset.get()
+
+
+def append(wallet_id, amount):
+    WalletLedgerEntry.objects.create(wallet_id=wallet_id, amount=amount)
+
+
+def append_many(amounts):
+    """یک ورودی برای هر کیف پول (wallet_id -> مبلغ) با یک bulk INSERT."""
+    WalletLedgerEntry.objects.bulk_create(
+        [
+            WalletLedgerEntry(wallet_id=wallet_id, amount=amount)
+            for wallet_id, amount in amounts.items()
+        ],
+        batch_size=500,
+    )
+
+
+def credit(wallet_id, amount):
+    """amount را بدون قفل به دفتر اضافه می‌کند."""
+    append(wallet_id, amount)
+
+
+def debit(wallet_id, amount):
+    """
+    amount را برمی‌دارد و اگر موجودی منفی شود False برمی‌گرداند؛ در این صورت
+    فراخوان باید تراکنش را rollback کند. باید داخل transaction.atomic صدا زده
+    شود تا قفل کیف پول تا پایان تراکنش بماند.
+    """
+    append(wallet_id, -amount)
+    # برداشت‌های همزمان پشت این قفل صف می‌کشند و ورودی commit شده هم را می‌بینند
+    wallet = lock_wallet(wallet_id)
+    return current_balance(wallet) >= 0
+
+
+def compact_wallet(wallet_id):
+    """
+    ورودی‌های دفتر یک کیف پول را در snapshot جمع می‌کند و تعداد ورودی‌های
+    جمع‌شده را برمی‌گرداند.
+
+    قفل کامل FOR UPDATE (نه NO KEY) با قفل INSERTهای در حال اجرا تداخل دارد؛
+    پس ورودی‌ای که id کوچک‌تر گرفته ولی هنوز commit نشده جا نمی‌ماند.
+    """
+    with transaction.atomic():
+        queryset = Wallet.objects.filter(pk=wallet_id).only("id", "ledger_offset")
+        if connections[queryset.db].features.has_select_for_update:
+            queryset = queryset.select_for_update()
+        wallet = queryset.first()
+        if wallet is None:
+            return 0
+
+        folded = WalletLedgerEntry.objects.filter(
+            wallet_id=wallet_id, id__gt=wallet.ledger_offset
+        ).aggregate(last_id=Max("id"), total=Sum("amount"), count=Count("id"))
+        if not folded["last_id"]:
+            return 0
+
+        Wallet.objects.filter(pk=wallet_id).update(
+            balance=F("balance") + fixed_value(Wallet, "balance", folded["total"]),
+            ledger_offset=folded["last_id"],
+        )
+        return folded["count"]
+
+
+def compact(min_entries=1, prune=False):
+    """
+    همه کیف پول‌هایی را که حداقل min_entries ورودی فشرده‌نشده دارند فشرده
+    می‌کند. با prune ورودی‌های جمع‌شده حذف می‌شوند.
+    """
+    candidates = (
+        WalletLedgerEntry.objects.filter(id__gt=F("wallet__ledger_offset"))
+        .values("wallet_id")
+        .annotate(entries=Count("id"))
+        .filter(entries__gte=min_entries)
+        .values_list("wallet_id", flat=True)
+    )
+
+    wallets = entries = 0
+    for wallet_id in list(candidates):
+        folded = compact_wallet(wallet_id)
+        if folded:
+            wallets += 1
+            entries += folded
+
+    pruned = 0
+    if prune:
+        pruned, _ = WalletLedgerEntry.objects.filter(
+            id__lte=F("wallet__ledger_offset")
+        ).delete()
+    return {"wallets": wallets, "entries": entries, "pruned": pruned}
@@ -0,0 +1,392 @@
+import io
+import itertools
+import json
+import platform
+import statistics
+import time
+from decimal import Decimal
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import urls as core_urls
+from core.benchmarking import isolated_database, percentile, route_names
+from core.models import (
+    Announcement,
+    Asset,
+    Coin,
+    ContactMessage,
+    CustomUser,
+    Wallet,
+)
+
+PASSWORD = "bench-pass"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and measure latency, queries and response "
+        "size of every API route in-process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=200, help="Seeded users (default: 200)"
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=200,
+            help="Seeded transactions per user (default: 200)",
+        )
+        parser.add_argument(
+            "--assets",
+            type=int,
+            default=5,
+            help="Seeded assets per user (default: 5)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=30,
+            help="Measured requests per route (default: 30)",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Unmeasured requests per route before measuring (default: 3)",
+        )
+        parser.add_argument(
+            "--routes",
+            nargs="+",
+            metavar="NAME",
+            help="Only run routes whose name contains one of these strings",
+        )
+        parser.add_argument(
+            "--output", type=str, help="Write the results to this JSON file"
+        )
+        parser.add_argument(
+            "--compare",
+            type=str,
+            metavar="BASELINE",
+            help="Compare against a JSON file written earlier with --output",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.3,
+            help="Relative p50 slowdown counted as a regression (default: 0.3)",
+        )
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=1.0,
+            help="Ignore p50 changes smaller than this many ms (default: 1.0)",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as fp:
+                    baseline = json.load(fp)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+
+        with isolated_database():
+            started = time.perf_counter()
+            self.seed(options)
+            self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+            scenarios = self.scenarios()
+            if options["routes"]:
+                scenarios = [
+                    scenario
+                    for scenario in scenarios
+                    if any(part in scenario[0] for part in options["routes"])
+                ]
+            else:
+                covered = {scenario[0] for scenario in scenarios}
+                for name in sorted(set(route_names(core_urls.urlpatterns)) - covered):
+                    self.stdout.write(
+                        self.style.WARNING(f"{name}: no scenario, not measured")
+                    )
+
+            routes = {}
+            for scenario in scenarios:
+                label, result = self.measure(
+                    *scenario, requests=options["requests"], warmup=options["warmup"]
+                )
+                routes[label] = result
+                self.stdout.write(
+                    f"{label:<32} p50 {result['p50_ms']:8.2f}ms  "
+                    f"p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                    f"{result['queries']:5.1f} queries  {result['bytes']:8d} bytes"
+                )
+
+            results = {
+                "meta": {
+                    "created": timezone.now().isoformat(),
+                    "vendor": connection.vendor,
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "users": options["users"],
+                    "transactions": options["transactions"],
+                    "assets": options["assets"],
+                    "requests": options["requests"],
+                },
+                "routes": routes,
+            }
+
+        if options["output"]:
+            with open(options["output"], "w") as fp:
+                json.dump(results, fp, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(
+                baseline, results, options["threshold"], options["min_delta_ms"]
+            )
+            if regressions:
+                raise CommandError(f"{regressions} regression(s) against the baseline")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def seed(self, options):
+        call_command(
+            "seed_load_data",
+            users=options["users"],
+            transactions=options["transactions"],
+            assets=options["assets"],
+            prefix="bench",
+            password=PASSWORD,
+            stdout=io.StringIO(),
+        )
+        self.counter = itertools.count()
+        self.admin = CustomUser.objects.create_superuser("bench-admin", PASSWORD)
+        self.user = CustomUser.objects.get(username="bench-0")
+
+        # موجودی و دارایی کافی برای تکرار خرید، فروش و سواپ در طول بنچمارک
+        Wallet.objects.filter(user=self.user).update(balance=Decimal("1e15"))
+        self.held = (
+            Asset.objects.filter(user=self.user).select_related("coin").first().coin
+        )
+        Asset.objects.filter(user=self.user).update(amount=Decimal("1e11"))
+        self.target = (
+            Coin.objects.exclude(pk=self.held.pk).order_by("market_cap_rank").first()
+        )
+
+        Announcement.objects.bulk_create(
+            Announcement(title=f"Announcement {i}", message="...") for i in range(20)
+        )
+        ContactMessage.objects.bulk_create(
+            ContactMessage(user=user, message="...", stars=5)
+            for user in CustomUser.objects.filter(username__startswith="bench-")[:100]
+        )
+
+    def scenarios(self):
+        held, target = self.held, self.target
+        return [
+            ("api-root", "get", {}, None, None),
+            ("users-list", "get", {}, self.admin, None),
+            ("users-detail", "get", {"pk": self.user.pk}, self.user, None),
+            ("wallets-list", "get", {}, self.admin, None),
+            ("wallets-detail", "get", {"pk": self.user.wallet.pk}, self.user, None),
+            ("assets-list", "get", {}, self.admin, None),
+            (
+                "assets-detail",
+                "get",
+                {"pk": self.user.assets.first().pk},
+                self.user,
+                None,
+            ),
+            ("coins-list", "get", {}, None, None),
+            ("coins-detail", "get", {"symbol": target.symbol}, None, None),
+            ("announcements-list", "get", {}, self.user, None),
+            (
+                "announcements-detail",
+                "get",
+                {"pk": Announcement.objects.first().pk},
+                self.user,
+                None,
+            ),
+            ("contact-messages-list", "get", {}, self.admin, None),
+            (
+                "contact-messages-detail",
+                "get",
+                {"pk": ContactMessage.objects.first().pk},
+                self.admin,
+                None,
+            ),
+            (
+                "contact-messages-list",
+                "post",
+                {},
+                self.user,
+                {"message": "hello", "stars": 4},
+            ),
+            (
+                "register",
+                "post",
+                {},
+                None,
+                lambda: {"username": f"new-{next(self.counter)}", "password": PASSWORD},
+            ),
+            ("login", "post", {}, None, {"username": "bench-0", "password": PASSWORD}),
+            (
+                "token_refresh",
+                "post",
+                {},
+                None,
+                {"refresh": str(RefreshToken.for_user(self.user))},
+            ),
+            (
+                "change-password",
+                "post",
+                {},
+                self.user,
+                {"old_password": PASSWORD, "new_password": PASSWORD},
+            ),
+            ("user-me", "get", {}, self.user, None),
+            ("wallet-me", "get", {}, self.user, None),
+            ("my-assets", "get", {}, self.user, None),
+            ("portfolio", "get", {}, self.user, None),
+            ("user-transactions", "get", {}, self.user, None),
+            ("transaction-export", "get", {}, self.user, None),
+            (
+                "buy-coin",
+                "post",
+                {},
+                self.user,
+                {"coin_id": target.pk, "amount": "0.001"},
+            ),
+            (
+                "sell-asset",
+                "post",
+                {},
+                self.user,
+                {"coin_symbol": held.symbol, "amount": 0.001},
+            ),
+            (
+                "swap",
+                "post",
+                {},
+                self.user,
+                {
+                    "from_symbol": held.symbol,
+                    "to_symbol": target.symbol,
+                    "amount": "0.001",
+                },
+            ),
+            (
+                "orders-batch",
+                "post",
+                {},
+                self.user,
+                {
+                    "legs": [
+                        {
+                            "side": "buy",
+                            "coin_symbol": target.symbol,
+                            "amount": "0.001",
+                        },
+                        {"side": "sell", "coin_symbol": held.symbol, "amount": "0.001"},
+                    ]
+                },
+            ),
+        ]
+
+    def measure(self, name, method, kwargs, user, data, requests, warmup):
+        path = reverse(name, kwargs=kwargs)
+        label = f"{method.upper()} {path}"
+        client = APIClient()
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        send = getattr(client, method)
+
+        latencies, queries, sizes = [], [], []
+        for i in range(warmup + requests):
+            payload = data() if callable(data) else data
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = send(path, payload, format="json")
+                if response.streaming:
+                    size = sum(len(chunk) for chunk in response.streaming_content)
+                else:
+                    size = len(response.content)
+                elapsed = time.perf_counter() - started
+
+            if response.status_code >= 400:
+                raise CommandError(
+                    f"{label} returned {response.status_code}: {response.content[:500]}"
+                )
+            if i >= warmup:
+                latencies.append(elapsed * 1000)
+                queries.append(len(context))
+                sizes.append(size)
+
+        return label, {
+            "name": name,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "queries": sum(queries) / len(queries),
+            "bytes": round(sum(sizes) / len(sizes)),
+        }
+
+    def compare(self, baseline, results, threshold, min_delta_ms):
+        previous_routes = baseline.get("routes", {})
+        # کند یا تند شدن کل ماشین (CPU مشترک، فرکانس) همه مسیرها را با هم جابه‌جا
+        # می‌کند؛ میانه نسبت p50ها این اثر را حذف می‌کند تا فقط مسیرهایی که نسبت
+        # به بقیه کند شده‌اند گزارش شوند
+        ratios = [
+            current["p50_ms"] / previous_routes[label]["p50_ms"]
+            for label, current in results["routes"].items()
+            if previous_routes.get(label, {}).get("p50_ms")
+        ]
+        drift = statistics.median(ratios) if len(ratios) >= 5 else 1.0
+
+        regressions = 0
+        self.stdout.write("")
+        self.stdout.write(f"Comparison with baseline (machine drift x{drift:.2f}):")
+        for label, current in results["routes"].items():
+            previous = previous_routes.get(label)
+            if previous is None:
+                self.stdout.write(f"{label}: not in baseline")
+                continue
+
+            # p95 و p99 با چند ده نمونه پرنوسان‌اند؛ فقط p50 برای تشخیص کندی استفاده می‌شود
+            problems = []
+            expected = previous["p50_ms"] * max(drift, 1.0)
+            delta = current["p50_ms"] - expected
+            if delta > min_delta_ms and delta > expected * threshold:
+                problems.append(
+                    f"p50 {previous['p50_ms']:.2f} -> {current['p50_ms']:.2f}ms"
+                )
+            if current["queries"] > previous["queries"]:
+                problems.append(
+                    f"queries {previous['queries']:.1f} -> {current['queries']:.1f}"
+                )
+            if current["bytes"] > previous["bytes"] * (1 + threshold):
+                problems.append(f"bytes {previous['bytes']} -> {current['bytes']}")
+
+            if problems:
+                regressions += 1
+                self.stdout.write(
+                    self.style.ERROR(f"{label}: REGRESSION {', '.join(problems)}")
+                )
+            else:
+                self.stdout.write(
+                    f"{label}: ok (p50 {delta:+.2f}ms, "
+                    f"p95 {current['p95_ms'] - previous['p95_ms']:+.2f}ms)"
+                )
+        return regressions
@@ -0,0 +1,138 @@
+import random
+import string
+import time
+from decimal import Decimal
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from django.test import Client
+
+from core.benchmarking import isolated_database, percentile
+from core.cache import bump_catalog_version, coin_catalog, get_catalog_version
+from core.management.commands.load_test import call_wsgi
+from core.models import Coin
+from core.search import CoinSearchIndex, parse_coin_query
+
+SYLLABLES = ["bit", "coin", "eth", "sol", "chain", "swap", "dao", "fi", "lun", "tron"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure GET /api/coins/?search= autocomplete latency and range/sort "
+        "queries on a throwaway database with a large coin catalog"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--coins",
+            type=int,
+            default=50000,
+            help="Active coins in the catalog (default: 50000)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Timed requests per query kind (default: 2000)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10,
+            help="?limit= of the autocomplete requests (default: 10)",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with isolated_database():
+            self.create_coins(rng, options["coins"])
+            client = Client()
+
+            bump_catalog_version()
+            coin_catalog.clear()
+            started = time.perf_counter()
+            client.get("/api/coins/")
+            list_ms = (time.perf_counter() - started) * 1000
+            size = len(client.get("/api/coins/").content)
+            started = time.perf_counter()
+            index = coin_catalog.get_index(get_catalog_version(), None)
+            index_ms = (time.perf_counter() - started) * 1000
+            # تغییر قیمت نسخه را عوض می‌کند؛ بخش متنی index دوباره ساخته نمی‌شود
+            started = time.perf_counter()
+            CoinSearchIndex(index.coins, index)
+            reuse_ms = (time.perf_counter() - started) * 1000
+
+            self.stdout.write(
+                f"{options['coins']} coins: full list {size / 1024 / 1024:.1f} MiB, "
+                f"first list {list_ms:.0f}ms, index build {index_ms:.0f}ms "
+                f"({reuse_ms:.0f}ms after a price-only change)"
+            )
+
+            symbols = list(Coin.objects.values_list("symbol", flat=True))
+            kinds = {
+                "search (1 char)": lambda: f"search={rng.choice(string.ascii_lowercase)}",
+                "search (prefix)": lambda: f"search={rng.choice(symbols)[:3]}",
+                "search (exact)": lambda: f"search={rng.choice(symbols)}",
+                "search (name)": lambda: f"search={rng.choice(SYLLABLES)}",
+                "search (miss)": lambda: "search=qqqzx",
+                "price range": lambda: (
+                    f"current_price_min={rng.randint(1, 500)}"
+                    f"&current_price_max={rng.randint(500, 1000)}"
+                ),
+                "rank range, by volume": lambda: (
+                    f"market_cap_rank_max={rng.randint(100, 5000)}"
+                    f"&ordering=-total_volume"
+                ),
+            }
+            app = WSGIHandler()
+            self.stdout.write(
+                f"{'':<24} {'index p50':>10} {'request p50':>12} {'p99':>9}"
+            )
+            for name, make_query in kinds.items():
+                # اولین درخواست هر فیلد ترتیب مرتب همان فیلد را می‌سازد
+                call_wsgi(app, f"/api/coins/?{make_query()}", {})
+                index_times, latencies = [], []
+                for _ in range(options["requests"]):
+                    query = f"{make_query()}&limit={options['limit']}"
+                    started = time.perf_counter()
+                    index.query(**parse_coin_query(QueryDict(query)))
+                    index_times.append((time.perf_counter() - started) * 1000)
+
+                    started = time.perf_counter()
+                    status = call_wsgi(app, f"/api/coins/?{query}", {})
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    assert status == 200, query
+                line = (
+                    f"{name:<24} {percentile(index_times, 50):8.3f}ms "
+                    f"{percentile(latencies, 50):10.3f}ms "
+                    f"{percentile(latencies, 99):7.3f}ms"
+                )
+                fast = percentile(latencies, 50) < 1
+                self.stdout.write(
+                    self.style.SUCCESS(line) if fast else self.style.WARNING(line)
+                )
+
+    def create_coins(self, rng, count):
+        names = set()
+        coins = []
+        for rank in range(1, count + 1):
+            name = "".join(rng.sample(SYLLABLES, rng.randint(1, 3))).title()
+            while name in names:
+                name += rng.choice(string.ascii_uppercase)
+            names.add(name)
+            price = Decimal(rng.randint(1, 10**7)) / 10**4
+            coins.append(
+                Coin(
+                    symbol=f"{name[:4].lower()}{rank}",
+                    name=name,
+                    image="https://example.com/coin.png",
+                    current_price=price,
+                    market_cap=rng.randint(10**3, 10**12),
+                    total_volume=rng.randint(10**3, 10**10),
+                    market_cap_rank=rank,
+                    ath=price,
+                    atl=price,
+                )
+            )
+        Coin.objects.bulk_create(coins, batch_size=2000)
@@ -0,0 +1,224 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarking import isolated_database, percentile
+from core.matching import MatchingEngine, OrderBook
+from core.models import Asset, Coin, CustomUser, LimitOrder, Wallet
+from core.trading import place_limit_order
+
+START_PRICE = Decimal("100")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure limit order placement, order book recovery and matching "
+        "throughput with many resting orders on a throwaway database, and "
+        "compare the per-coin heaps with scanning every resting order"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orders",
+            type=int,
+            default=100000,
+            help="Resting limit orders (default: 100000)",
+        )
+        parser.add_argument("--coins", type=int, default=50, help="Coins (default: 50)")
+        parser.add_argument(
+            "--users", type=int, default=1000, help="Order owners (default: 1000)"
+        )
+        parser.add_argument(
+            "--placements",
+            type=int,
+            default=1000,
+            help="Orders placed through the API code path (default: 1000)",
+        )
+        parser.add_argument(
+            "--updates",
+            type=int,
+            default=2000,
+            help="Price updates of the random walk (default: 2000)",
+        )
+        parser.add_argument(
+            "--step",
+            type=float,
+            default=0.005,
+            help="Maximum relative price change per update (default: 0.005)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["orders"] < 1 or options["coins"] < 1 or options["users"] < 1:
+            raise CommandError("--orders, --coins and --users must be positive")
+        rng = random.Random(options["seed"])
+        with isolated_database():
+            coins, users = self.create_data(rng, options)
+            self.place(rng, coins, users, options)
+
+            engine = MatchingEngine()
+            started = time.perf_counter()
+            engine.recover()
+            seconds = time.perf_counter() - started
+            self.stdout.write(
+                f"recover: {len(engine):,} resting orders in {seconds * 1000:.0f}ms "
+                f"({len(engine) / seconds:,.0f} orders/sec)"
+            )
+
+            walk = self.price_walk(rng, coins, options)
+            self.compare_matching(engine, walk)
+            self.end_to_end(engine, walk)
+
+    def create_data(self, rng, options):
+        coins = Coin.objects.bulk_create(
+            Coin(
+                symbol=f"c{i}",
+                name=f"Coin {i}",
+                image=f"https://example.com/c{i}.png",
+                current_price=START_PRICE,
+                market_cap=1000,
+                total_volume=1000,
+                market_cap_rank=i + 1,
+                ath=START_PRICE,
+                atl=START_PRICE,
+            )
+            for i in range(options["coins"])
+        )
+        CustomUser.objects.bulk_create(
+            CustomUser(username=f"bench-orders-{i}") for i in range(options["users"])
+        )
+        users = list(CustomUser.objects.filter(username__startswith="bench-orders-"))
+        Wallet.objects.bulk_create(
+            Wallet(user=user, balance=Decimal("1000000000")) for user in users
+        )
+        Asset.objects.bulk_create(
+            (
+                Asset(user=user, coin=coin, amount=Decimal("1000000"))
+                for user in users
+                for coin in coins[:20]
+            ),
+            batch_size=2000,
+        )
+
+        # سفارش‌های خرید زیر و فروش بالای قیمت فعلی، تا ۲۰٪ فاصله. موجودی
+        # رزرو این‌ها کسر نمی‌شود؛ فقط ردیف سفارش برای موتور تطبیق لازم است
+        orders = []
+        for _ in range(options["orders"] - options["placements"]):
+            side = rng.choice(["buy", "sell"])
+            distance = Decimal(rng.randint(1, 2000)) / 10000
+            price = START_PRICE * (1 - distance if side == "buy" else 1 + distance)
+            amount = Decimal(rng.randint(1, 10**6)) / 10**6
+            orders.append(
+                LimitOrder(
+                    user=rng.choice(users),
+                    coin=rng.choice(coins),
+                    side=side,
+                    price=price,
+                    amount=amount,
+                    reserved=price * amount if side == "buy" else amount,
+                )
+            )
+        LimitOrder.objects.bulk_create(orders, batch_size=2000)
+        return coins, users
+
+    def place(self, rng, coins, users, options):
+        """ثبت سفارش با همان مسیر endpoint (رزرو موجودی و insert)."""
+        latencies = []
+        for _ in range(options["placements"]):
+            side = rng.choice(["buy", "sell"])
+            distance = Decimal(rng.randint(1, 2000)) / 10000
+            price = START_PRICE * (1 - distance if side == "buy" else 1 + distance)
+            started = time.perf_counter()
+            place_limit_order(
+                rng.choice(users),
+                rng.choice(coins[:20]).symbol,
+                side,
+                price.quantize(Decimal("0.0001")),
+                Decimal(rng.randint(1, 10**6)) / 10**6,
+            )
+            latencies.append(time.perf_counter() - started)
+        if latencies:
+            self.stdout.write(
+                f"place: {len(latencies) / sum(latencies):,.0f} orders/sec, "
+                f"p50 {percentile(latencies, 50) * 1000:.2f}ms "
+                f"p99 {percentile(latencies, 99) * 1000:.2f}ms"
+            )
+
+    def price_walk(self, rng, coins, options):
+        prices = {coin.pk: START_PRICE for coin in coins}
+        walk = []
+        for _ in range(options["updates"]):
+            coin_id = rng.choice(coins).pk
+            change = Decimal(str(rng.uniform(-options["step"], options["step"])))
+            prices[coin_id] = (prices[coin_id] * (1 + change)).quantize(
+                Decimal("0.0001")
+            )
+            walk.append((coin_id, prices[coin_id]))
+        return walk
+
+    def compare_matching(self, engine, walk):
+        """
+        فقط پیدا کردن سفارش‌های عبورکرده، بدون دیتابیس: heapهای موتور تطبیق
+        در برابر پیمایش همه سفارش‌های باز همان رمزارز در هر قیمت تازه.
+        """
+        books, resting = {}, {}
+        for coin_id, book in engine.books.items():
+            orders = [(order_id, "buy", -price) for price, order_id in book.buys] + [
+                (order_id, "sell", price) for price, order_id in book.sells
+            ]
+            books[coin_id] = OrderBook()
+            books[coin_id].extend(orders)
+            resting[coin_id] = orders
+
+        heap_times, scan_times, crossed = [], [], 0
+        for coin_id, price in walk:
+            started = time.perf_counter()
+            crossed += len(books[coin_id].crossed(price))
+            heap_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            kept = []
+            for order in resting[coin_id]:
+                _, side, limit = order
+                if not (limit >= price if side == "buy" else limit <= price):
+                    kept.append(order)
+            resting[coin_id] = kept
+            scan_times.append(time.perf_counter() - started)
+
+        for name, times in (("heap", heap_times), ("scan", scan_times)):
+            self.stdout.write(
+                f"match {name}: {len(walk) / sum(times):,.0f} price updates/sec, "
+                f"p50 {percentile(times, 50) * 10**6:.1f}us "
+                f"p99 {percentile(times, 99) * 10**6:.1f}us"
+            )
+        self.stdout.write(
+            f"{crossed:,} orders crossed, heap "
+            f"{sum(scan_times) / sum(heap_times):.0f}x faster than scanning"
+        )
+
+    def end_to_end(self, engine, walk):
+        """تطبیق و پر شدن واقعی در دیتابیس، یک flush برای هر قیمت تازه."""
+        latencies = []
+        started = time.perf_counter()
+        for coin_id, price in walk:
+            update_started = time.perf_counter()
+            engine.on_prices({coin_id: price})
+            latencies.append(time.perf_counter() - update_started)
+        seconds = time.perf_counter() - started
+
+        filled = LimitOrder.objects.filter(status="filled").count()
+        if filled != engine.stats["fills"]:
+            raise CommandError(
+                f"{filled} orders filled in the database, engine reported "
+                f"{engine.stats['fills']}"
+            )
+        self.stdout.write(
+            f"end to end: {len(walk) / seconds:,.0f} price updates/sec, "
+            f"{engine.stats['fills'] / seconds:,.0f} fills/sec "
+            f"({engine.stats['fills']:,} fills), p50 "
+            f"{percentile(latencies, 50) * 1000:.2f}ms p99 "
+            f"{percentile(latencies, 99) * 1000:.2f}ms, "
+            f"{len(engine):,} orders still resting"
+        )
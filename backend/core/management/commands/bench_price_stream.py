@@ -0,0 +1,179 @@
+import asyncio
+import random
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db.models import Case, F, When
+from django.test.utils import override_settings
+
+from core.benchmarking import isolated_database, percentile
+from core.models import Coin
+from core.pricestream import PriceHub
+
+
+class TimedHub(PriceHub):
+    def __init__(self):
+        super().__init__()
+        self.publish_times = []
+
+    def publish(self, changes):
+        started = time.perf_counter()
+        super().publish(changes)
+        self.publish_times.append(time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the price stream fan-out: poll/encode and publish time for "
+        "thousands of subscribers, with slow consumers conflated and stuck "
+        "ones dropped, on a throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscribers",
+            type=int,
+            default=5000,
+            help="Connected subscribers (default: 5000)",
+        )
+        parser.add_argument(
+            "--coins", type=int, default=500, help="Active coins (default: 500)"
+        )
+        parser.add_argument(
+            "--changes",
+            type=int,
+            default=50,
+            help="Coins whose price changes each round (default: 50)",
+        )
+        parser.add_argument(
+            "--rounds", type=int, default=40, help="Poll rounds (default: 40)"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.05,
+            help="Seconds between rounds (default: 0.05)",
+        )
+        parser.add_argument(
+            "--max-lag",
+            type=float,
+            default=1.0,
+            help="PRICE_STREAM_MAX_LAG for the run (default: 1.0)",
+        )
+        parser.add_argument(
+            "--all-symbols",
+            type=float,
+            default=0.2,
+            help="Share of subscribers following every symbol (default: 0.2)",
+        )
+        parser.add_argument(
+            "--slow",
+            type=float,
+            default=0.1,
+            help="Share reading only every fourth round (default: 0.1)",
+        )
+        parser.add_argument(
+            "--stuck",
+            type=float,
+            default=0.05,
+            help="Share that never reads and gets dropped (default: 0.05)",
+        )
+
+    def handle(self, *args, **options):
+        with isolated_database(), override_settings(
+            PRICE_STREAM_MAX_LAG=options["max_lag"]
+        ):
+            Coin.objects.bulk_create(
+                Coin(
+                    symbol=f"c{i}",
+                    name=f"Coin {i}",
+                    image="https://example.com/coin.png",
+                    current_price=Decimal("100.0000"),
+                    market_cap=1000000,
+                    total_volume=1000,
+                    market_cap_rank=i + 1,
+                    ath=Decimal("100.0000"),
+                    atl=Decimal("100.0000"),
+                )
+                for i in range(options["coins"])
+            )
+            asyncio.run(self.run(options))
+
+    async def run(self, options):
+        rng = random.Random(0)
+        symbols = [f"c{i}" for i in range(options["coins"])]
+        hub = TimedHub()
+
+        fast, slow, stuck = [], [], []
+        for i in range(options["subscribers"]):
+            if rng.random() < options["all_symbols"]:
+                subscription = await hub.subscribe()
+            else:
+                subscription = await hub.subscribe(rng.sample(symbols, 5))
+            share = rng.random()
+            if share < options["stuck"]:
+                # snapshot اولیه را هم نمی‌خواند
+                stuck.append(subscription)
+                continue
+            subscription.take()
+            if share < options["stuck"] + options["slow"]:
+                slow.append(subscription)
+            else:
+                fast.append(subscription)
+        # subscribe حلقه poll را روشن کرده؛ اینجا poll دستی و قابل تکرار است
+        hub._task.cancel()
+
+        poll_times, delivered, frames = [], 0, 0
+        for round_number in range(options["rounds"]):
+            await asyncio.sleep(options["interval"])
+            changed = rng.sample(symbols, min(options["changes"], len(symbols)))
+            await sync_to_async(self.move_prices)(changed, round_number)
+
+            started = time.perf_counter()
+            await hub.poll()
+            poll_times.append(time.perf_counter() - started)
+
+            readers = fast + (slow if round_number % 4 == 3 else [])
+            for subscription in readers:
+                if subscription.dropped:
+                    continue
+                frames += len(subscription.pending)
+                delivered += len(subscription.take())
+
+        encoded = hub.stats["changes"] * 2
+        self.stdout.write(
+            f"{hub.subscribers + hub.stats['dropped']} subscribers "
+            f"({len(fast)} fast, {len(slow)} slow, {len(stuck)} stuck), "
+            f"{options['coins']} coins, {options['changes']} changes x "
+            f"{options['rounds']} rounds"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"poll p50 {1000 * percentile(poll_times, 50):.2f}ms, "
+                f"p99 {1000 * percentile(poll_times, 99):.2f}ms "
+                f"(of which publish p50 "
+                f"{1000 * percentile(hub.publish_times, 50):.2f}ms)"
+            )
+        )
+        self.stdout.write(
+            f"{encoded} frames encoded, {frames} delivered "
+            f"({frames / max(encoded, 1):.0f} per encode), "
+            f"{delivered / 1024 / 1024:.1f} MiB written"
+        )
+        self.stdout.write(
+            f"{hub.stats['conflated']} frames conflated, "
+            f"{hub.stats['dropped']} subscribers dropped"
+        )
+
+    def move_prices(self, symbols, round_number):
+        step = Decimal("0.0001") * (round_number + 1)
+        Coin.objects.filter(symbol__in=symbols).update(
+            current_price=Case(
+                *(
+                    When(symbol=symbol, then=F("current_price") + step * (i % 3 + 1))
+                    for i, symbol in enumerate(symbols)
+                )
+            )
+        )
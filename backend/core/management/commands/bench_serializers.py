@@ -0,0 +1,202 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmarking import isolated_database, percentile
+from core.cache import bump_catalog_version
+from core.models import Asset, Coin, CustomUser, Transaction
+from core.renderers import FastJSONRenderer, orjson
+from core.serializers import (
+    AssetSerializer,
+    CoinSerializer,
+    TransactionSerializer,
+    asset_rows,
+    coin_rows,
+    transaction_rows,
+)
+
+# حروف فارسی و U+2028 هم باید بایت به بایت مثل JSONRenderer نوشته شوند
+NAMES = ["Bitcoin", "اتریوم", "Line\u2028Separator", 'Quote "coin"', "Ünïcødé"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF ModelSerializer + JSONRenderer with the .values() fast "
+        "path + FastJSONRenderer on the hot list endpoints (rows/sec), and "
+        "check the rendered bytes are identical, on a throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--coins", type=int, default=5000, help="Coins (default: 5000)"
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=20000,
+            help="Transactions of the benchmark user (default: 20000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timed runs per path; the median is reported (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            user = self.create_data(options)
+            cases = [
+                (
+                    "coins",
+                    lambda: Coin.objects.filter(is_active=True).order_by(
+                        "market_cap_rank"
+                    ),
+                    CoinSerializer,
+                    coin_rows,
+                    [],
+                ),
+                (
+                    "assets",
+                    lambda: Asset.objects.filter(user=user).order_by("id"),
+                    AssetSerializer,
+                    asset_rows,
+                    ["user", "coin"],
+                ),
+                (
+                    "transactions",
+                    lambda: Transaction.objects.filter(user=user).order_by(
+                        "-timestamp", "-id"
+                    ),
+                    TransactionSerializer,
+                    transaction_rows,
+                    ["coin"],
+                ),
+            ]
+            self.stdout.write(
+                f"orjson {'installed' if orjson is not None else 'not installed'}"
+            )
+            self.stdout.write(
+                f"{'':<20} {'rows':>6} {'serialize':>22} {'render':>22} "
+                f"{'total':>22}"
+            )
+            for case in cases:
+                self.compare(*case, options)
+            self.requests(user)
+
+    def create_data(self, options):
+        rng = random.Random(0)
+        coins = Coin.objects.bulk_create(
+            Coin(
+                symbol=f"c{i}",
+                name=f"{rng.choice(NAMES)} {i}",
+                image=f"https://example.com/c{i}.png",
+                current_price=Decimal(rng.randint(1, 10**9)) / 10**4,
+                market_cap=rng.randint(10**3, 10**12),
+                total_volume=rng.randint(10**3, 10**10),
+                market_cap_rank=i + 1,
+                ath=Decimal(rng.randint(1, 10**9)) / 10**4,
+                atl=Decimal("0.0001"),
+            )
+            for i in range(options["coins"])
+        )
+        user = CustomUser.objects.create_user("bench-serializers", "bench-pass")
+        Asset.objects.bulk_create(
+            Asset(user=user, coin=coin, amount=Decimal(rng.randint(1, 10**12)) / 10**8)
+            for coin in coins
+        )
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    user=user,
+                    transaction_type=rng.choice(["buy", "sell"]),
+                    coin=rng.choice(coins),
+                    total_value=Decimal(rng.randint(1, 10**12)) / 10**8,
+                )
+                for _ in range(options["transactions"])
+            ),
+            batch_size=2000,
+        )
+        return user
+
+    def compare(self, name, queryset, serializer_class, rows, related, options):
+        def drf_serialize():
+            # همان کوئری viewها پیش از مسیر سریع
+            instances = queryset().select_related(*related)
+            return serializer_class(instances, many=True).data
+
+        def fast_serialize():
+            return rows.serialize(rows.values(queryset()))
+
+        drf_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        drf_data, fast_data = drf_serialize(), fast_serialize()
+        if drf_renderer.render(drf_data) != fast_renderer.render(fast_data):
+            raise CommandError(f"{name}: fast path output differs from DRF")
+
+        count = len(drf_data)
+        timings = {}
+        for path, serialize, renderer in (
+            ("before", drf_serialize, drf_renderer),
+            ("after", fast_serialize, fast_renderer),
+        ):
+            serialize_times, render_times = [], []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                data = serialize()
+                serialized = time.perf_counter()
+                renderer.render(data)
+                serialize_times.append(serialized - started)
+                render_times.append(time.perf_counter() - serialized)
+            timings[path] = (
+                percentile(serialize_times, 50),
+                percentile(render_times, 50),
+            )
+
+        for path in ("before", "after"):
+            serialize_time, render_time = timings[path]
+            cells = [
+                f"{count / seconds:>12,.0f} rows/s {seconds * 1000:>5.0f}ms"
+                for seconds in (
+                    serialize_time,
+                    render_time,
+                    serialize_time + render_time,
+                )
+            ]
+            self.stdout.write(f"{name + ' ' + path:<20} {count:>6} " + " ".join(cells))
+        before, after = sum(timings["before"]), sum(timings["after"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{name}: identical bytes, {before / after:.1f}x faster end to end"
+            )
+        )
+
+    def requests(self, user):
+        """زمان کامل همان درخواست‌ها با مسیر سریع."""
+        client = Client()
+        token = RefreshToken.for_user(user).access_token
+        for path, headers in (
+            ("/api/coins/", {}),
+            ("/api/asset/", {"HTTP_AUTHORIZATION": f"Bearer {token}"}),
+            (
+                "/api/transaction/?page_size=200",
+                {"HTTP_AUTHORIZATION": f"Bearer {token}"},
+            ),
+        ):
+            latencies = []
+            for _ in range(5):
+                # لیست رمزارزها cache می‌شود؛ هر بار نسخه تازه ساخته می‌شود
+                bump_catalog_version()
+                started = time.perf_counter()
+                response = client.get(path, **headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"{path} returned {response.status_code}")
+            self.stdout.write(
+                f"GET {path}: p50 {percentile(latencies, 50) * 1000:.1f}ms, "
+                f"{len(response.content) / 1024:.0f} KiB"
+            )
@@ -0,0 +1,286 @@
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from core import trading
+from core.benchmarking import isolated_database, percentile
+from core.ledger import compact
+from core.models import Asset, Coin, CustomUser, Transaction, Wallet
+
+
+INITIAL_BALANCE = Decimal("1000000000")
+
+
+class Command(BaseCommand):
+    help = "Measure buy throughput (trades/sec) with N concurrent buyers on a throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--buyers", type=int, default=8, help="Number of concurrent buyer threads"
+        )
+        parser.add_argument(
+            "--trades", type=int, default=200, help="Buy orders placed by each buyer"
+        )
+        parser.add_argument(
+            "--same-account",
+            action="store_true",
+            help="All buyers trade on one account instead of one account each",
+        )
+        parser.add_argument(
+            "--orders",
+            choices=["buy", "mixed"],
+            default="buy",
+            help="Only buys, or alternate buys and sells (default: buy)",
+        )
+        parser.add_argument(
+            "--wallet-mode",
+            choices=["row", "ledger", "compare"],
+            default="row",
+            help=(
+                "Update the wallet row, append to the wallet ledger, or a run "
+                "with each of the two (default: row)"
+            ),
+        )
+        parser.add_argument(
+            "--sqlite-mode",
+            choices=["settings", "default", "tuned", "compare"],
+            default="settings",
+            help=(
+                "SQLite connection options: as configured, SQLite defaults, "
+                "SQLITE_TUNED_OPTIONS, or a run with each of the last two "
+                "(default: settings)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["wallet_mode"] == "compare":
+            wallet_modes = ["row", "ledger"]
+        else:
+            wallet_modes = [options["wallet_mode"]]
+        if options["sqlite_mode"] == "compare":
+            modes = ["default", "tuned"]
+        else:
+            modes = [options["sqlite_mode"]]
+        if (
+            modes == ["settings"]
+            and "ledger" in wallet_modes
+            and self.deferred_sqlite()
+        ):
+            # برداشت در حالت دفتر اول ردیف کیف پول را می‌خواند و بعد می‌نویسد؛
+            # SQLite ارتقای قفل در تراکنش DEFERRED را بدون صبر با database is
+            # locked رد می‌کند و نتیجه به جای توان عملیاتی، تعداد خطاها می‌شود
+            self.stdout.write(
+                "SQLite transactions are DEFERRED in settings, so ledger withdrawals "
+                "fail with 'database is locked'; using SQLITE_TUNED_OPTIONS "
+                "(DB_SQLITE_TUNED=1) for every run. Pass --sqlite-mode default to "
+                "measure the defaults anyway."
+            )
+            modes = ["tuned"]
+
+        summaries = []
+        for mode in modes:
+            with self.sqlite_mode(mode):
+                for wallet_mode in wallet_modes:
+                    summaries.append(self.run({**options, "wallet_mode": wallet_mode}))
+        if len(summaries) > 1:
+            self.report(summaries)
+
+    def deferred_sqlite(self):
+        return (
+            connection.vendor == "sqlite"
+            and connection.settings_dict.get("OPTIONS", {}).get("transaction_mode")
+            != "IMMEDIATE"
+        )
+
+    @contextmanager
+    def sqlite_mode(self, mode):
+        """
+        گزینه‌های اتصال SQLite را برای همه threadها عوض می‌کند. دیتابیس موقت
+        isolated_database بعد از این ساخته می‌شود تا journal_mode فایل تازه از
+        همان اتصال اول با این حالت یکی باشد.
+        """
+        settings_dict = connection.settings_dict
+        if mode == "settings" or connection.vendor != "sqlite":
+            yield
+            return
+        options = settings_dict.get("OPTIONS", {})
+        untuned = {
+            key: value
+            for key, value in options.items()
+            if key not in settings.SQLITE_TUNED_OPTIONS
+        }
+        if mode == "tuned":
+            settings_dict["OPTIONS"] = {**untuned, **settings.SQLITE_TUNED_OPTIONS}
+        else:
+            settings_dict["OPTIONS"] = untuned
+        connections.close_all()
+        try:
+            yield
+        finally:
+            connections.close_all()
+            settings_dict["OPTIONS"] = options
+
+    def run(self, options):
+        buyers = options["buyers"]
+        trades = options["trades"]
+
+        with isolated_database(), override_settings(
+            WALLET_LEDGER=options["wallet_mode"] == "ledger"
+        ):
+            coin = Coin.objects.create(
+                symbol="bench",
+                name="Bench",
+                image="https://example.com/bench.png",
+                current_price=Decimal("12.3456"),
+                market_cap=0,
+                total_volume=0,
+                market_cap_rank=1,
+                ath=Decimal("12.3456"),
+                atl=Decimal("12.3456"),
+            )
+            accounts = self.create_accounts(
+                1 if options["same_account"] else buyers, coin
+            )
+            users = [accounts[i % len(accounts)] for i in range(buyers)]
+
+            results = [None] * buyers
+            barrier = threading.Barrier(buyers)
+            threads = [
+                threading.Thread(
+                    target=self.run_buyer,
+                    args=(users[i], coin, trades, options["orders"], barrier),
+                    kwargs={"results": results, "index": i},
+                )
+                for i in range(buyers)
+            ]
+
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            latencies = [value for result in results for value in result["latencies"]]
+            locked = sum(result["locked"] for result in results)
+            rejected = sum(result["rejected"] for result in results)
+            compacted = compact()
+            lost = self.count_lost_updates(accounts)
+
+            self.stdout.write(
+                f"{connection.vendor}: {buyers} buyers x {trades} {options['orders']} "
+                f"orders ({len(accounts)} account{'s' if len(accounts) > 1 else ''}, "
+                f"{options['wallet_mode']} wallet{self.describe_sqlite()})"
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{len(latencies)} trades in {elapsed:.2f}s = "
+                    f"{len(latencies) / elapsed:.0f} trades/sec"
+                )
+            )
+            self.stdout.write(
+                f"latency p50 {1000 * percentile(latencies, 50):.2f}ms, "
+                f"p95 {1000 * percentile(latencies, 95):.2f}ms, "
+                f"p99 {1000 * percentile(latencies, 99):.2f}ms"
+            )
+            self.stdout.write(
+                f"{locked} failed with 'database is locked', {rejected} rejected, "
+                f"{lost} wallets with lost updates"
+            )
+            if compacted["entries"]:
+                self.stdout.write(
+                    f"compacted {compacted['entries']} ledger entries afterwards"
+                )
+            self.stdout.write("")
+            return {
+                "wallet": options["wallet_mode"],
+                "sqlite": self.describe_sqlite().removeprefix(", "),
+                "rate": len(latencies) / elapsed,
+                "p50": 1000 * percentile(latencies, 50),
+                "p99": 1000 * percentile(latencies, 99),
+                "locked": locked,
+                "lost": lost,
+            }
+
+    def report(self, summaries):
+        self.stdout.write(
+            f"{'wallet':<8} {'trades/sec':>10} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'locked':>6} {'lost':>4}  sqlite"
+        )
+        for summary in summaries:
+            line = (
+                f"{summary['wallet']:<8} {summary['rate']:>10.0f} "
+                f"{summary['p50']:>8.2f} {summary['p99']:>8.2f} "
+                f"{summary['locked']:>6} {summary['lost']:>4}  {summary['sqlite']}"
+            )
+            failed = summary["locked"] or summary["lost"]
+            self.stdout.write(self.style.ERROR(line) if failed else line)
+
+    def describe_sqlite(self):
+        if connection.vendor != "sqlite":
+            return ""
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        return f", journal {journal_mode}, {connection.transaction_mode or 'DEFERRED'} transactions"
+
+    def create_accounts(self, count, coin):
+        password = make_password("bench")
+        CustomUser.objects.bulk_create(
+            CustomUser(username=f"bench-{i}", password=password) for i in range(count)
+        )
+        users = list(CustomUser.objects.order_by("id"))
+        Wallet.objects.bulk_create(
+            Wallet(user=user, balance=INITIAL_BALANCE) for user in users
+        )
+        # برای سفارش‌های فروش از قبل دارایی کافی وجود دارد
+        Asset.objects.bulk_create(
+            Asset(user=user, coin=coin, amount=INITIAL_BALANCE) for user in users
+        )
+        return users
+
+    def run_buyer(self, user, coin, trades, orders, barrier, results, index):
+        result = {"latencies": [], "locked": 0, "rejected": 0}
+        amount = Decimal("0.01")
+        try:
+            barrier.wait()
+            for i in range(trades):
+                started = time.perf_counter()
+                try:
+                    if orders == "mixed" and i % 2:
+                        trading.sell(user, coin.symbol, amount)
+                    else:
+                        trading.buy(user, coin.pk, amount)
+                except OperationalError:
+                    result["locked"] += 1
+                    continue
+                except trading.TradeError:
+                    result["rejected"] += 1
+                    continue
+                result["latencies"].append(time.perf_counter() - started)
+        finally:
+            results[index] = result
+            connections.close_all()
+
+    def count_lost_updates(self, users):
+        # هر معامله با همان گرد کردن trading روی موجودی کیف پول اعمال می‌شود
+        expected = {user.pk: INITIAL_BALANCE for user in users}
+        for user_id, kind, total_value in Transaction.objects.values_list(
+            "user", "transaction_type", "total_value"
+        ).iterator():
+            change = trading.quantize(Wallet, "balance", total_value)
+            expected[user_id] += change if kind == "sell" else -change
+
+        lost = 0
+        for wallet in Wallet.objects.filter(user__in=users).with_current_balance():
+            # SQLite محاسبات F() روی decimal را با float انجام می‌دهد؛ خطای جزئی مجاز است
+            if abs(wallet.current_balance - expected[wallet.user_id]) > Decimal("0.01"):
+                lost += 1
+        return lost
@@ -0,0 +1,439 @@
+import itertools
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import resolve, reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import async_views
+from core import urls as core_urls
+from core.authentication import user_cache
+from core.benchmarking import isolated_database, route_names
+from core.cache import PORTFOLIO_VERSION, coin_catalog, versions
+from core.models import (
+    Announcement,
+    Asset,
+    CacheVersion,
+    Coin,
+    ContactMessage,
+    CustomUser,
+    LimitOrder,
+    PriceCandle,
+    Transaction,
+    Wallet,
+)
+from core.querybudget import duplicated_shapes, format_queries, get_query_budget
+
+PASSWORD = "budget-pass"
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every API route against its declared query budget "
+        "on a throwaway database; GET routes with an async view (ASGI) are "
+        "checked through that view too"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs=2,
+            default=[2, 10],
+            metavar=("SMALL", "LARGE"),
+            help="Row counts per table used for the two measurements (default: 2 10)",
+        )
+        parser.add_argument(
+            "--verbose-sql",
+            action="store_true",
+            help="Print duplicated query shapes for passing routes too",
+        )
+
+    def handle(self, *args, **options):
+        sizes = tuple(options["sizes"])
+
+        with isolated_database():
+            self.setup_data()
+            failures = self.check_routes(sizes, options["verbose_sql"])
+
+        if failures:
+            raise CommandError(f"{failures} route(s) exceeded their query budget")
+        self.stdout.write(
+            self.style.SUCCESS("All routes are within their query budgets")
+        )
+
+    def setup_data(self):
+        self.counter = itertools.count()
+        self.coins = [
+            Coin.objects.create(
+                symbol=f"c{i}",
+                name=f"Coin {i}",
+                image=f"https://example.com/c{i}.png",
+                current_price=Decimal(10 + i),
+                market_cap=1000 * (i + 1),
+                total_volume=100 * (i + 1),
+                market_cap_rank=i + 1,
+                ath=Decimal(20 + i),
+                atl=Decimal(1),
+            )
+            for i in range(12)
+        ]
+        self.admin = CustomUser.objects.create_superuser("budget-admin", PASSWORD)
+        self.user = CustomUser.objects.create_user("budget-user", PASSWORD)
+        # کاربری که هر بار از صفر اولین رمزارزش را می‌خرد یا با سواپ می‌گیرد
+        self.newcomer = CustomUser.objects.create_user("budget-newcomer", PASSWORD)
+        Wallet.objects.filter(user__in=[self.user, self.newcomer]).update(
+            balance=Decimal("100000000")
+        )
+
+    def grow(self, size):
+        """هر جدول را به حداقل size ردیف برای کاربر تست می‌رساند."""
+        for coin in self.coins[:size]:
+            Asset.objects.update_or_create(
+                user=self.user, coin=coin, defaults={"amount": Decimal("1000")}
+            )
+        for _ in range(size - self.user.transactions.count()):
+            Transaction.objects.create(
+                user=self.user,
+                transaction_type="buy",
+                coin=self.coins[0],
+                total_value=Decimal("10"),
+            )
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for i in range(PriceCandle.objects.count(), size):
+            PriceCandle.objects.create(
+                coin=self.coins[0],
+                resolution="1h",
+                bucket=now - timedelta(hours=i),
+                open=Decimal("10"),
+                high=Decimal("11"),
+                low=Decimal("9"),
+                close=Decimal("10"),
+            )
+        for _ in range(size - self.user.limit_orders.count()):
+            LimitOrder.objects.create(
+                user=self.user,
+                coin=self.coins[0],
+                side="buy",
+                price=Decimal("1"),
+                amount=Decimal("1"),
+                reserved=Decimal("1"),
+            )
+        # سناریوی لغو در هر دور همان سفارش را دوباره لغو می‌کند
+        self.user.limit_orders.filter(status="cancelled").update(
+            status="open", closed_at=None
+        )
+        for i in range(size - Announcement.objects.count()):
+            Announcement.objects.create(title=f"Announcement {i}", message="...")
+        for _ in range(size - ContactMessage.objects.count()):
+            author = CustomUser.objects.create_user(
+                f"budget-{next(self.counter)}", PASSWORD
+            )
+            Asset.objects.create(user=author, coin=self.coins[1], amount=Decimal("1"))
+            ContactMessage.objects.create(user=author, message="...", stars=5)
+
+    def scenarios(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        coin = self.coins[0]
+        order = self.user.limit_orders.order_by("id").first()
+        return [
+            ("api-root", "get", {}, None, None),
+            ("users-list", "get", {}, self.admin, None),
+            ("users-detail", "get", {"pk": self.user.pk}, self.user, None),
+            ("wallets-list", "get", {}, self.admin, None),
+            ("wallets-detail", "get", {"pk": self.user.wallet.pk}, self.user, None),
+            ("assets-list", "get", {}, self.admin, None),
+            (
+                "assets-detail",
+                "get",
+                {"pk": self.user.assets.first().pk},
+                self.user,
+                None,
+            ),
+            ("coins-list", "get", {}, None, None),
+            ("coins-detail", "get", {"symbol": coin.symbol}, None, None),
+            ("coins-history", "get", {"symbol": coin.symbol}, None, None),
+            ("announcements-list", "get", {}, self.user, None),
+            (
+                "announcements-detail",
+                "get",
+                {"pk": Announcement.objects.first().pk},
+                self.user,
+                None,
+            ),
+            ("contact-messages-list", "get", {}, self.admin, None),
+            (
+                "contact-messages-detail",
+                "get",
+                {"pk": ContactMessage.objects.first().pk},
+                self.admin,
+                None,
+            ),
+            (
+                "contact-messages-list",
+                "post",
+                {},
+                self.user,
+                {"message": "hello", "stars": 4},
+            ),
+            (
+                "register",
+                "post",
+                {},
+                None,
+                lambda: {
+                    "username": f"new-{next(self.counter)}",
+                    "password": PASSWORD,
+                },
+            ),
+            (
+                "login",
+                "post",
+                {},
+                None,
+                {"username": "budget-user", "password": PASSWORD},
+            ),
+            ("token_refresh", "post", {}, None, {"refresh": refresh}),
+            (
+                "change-password",
+                "post",
+                {},
+                self.user,
+                {"old_password": PASSWORD, "new_password": PASSWORD},
+            ),
+            ("user-me", "get", {}, self.user, None),
+            ("wallet-me", "get", {}, self.user, None),
+            ("my-assets", "get", {}, self.user, None),
+            ("portfolio", "get", {}, self.user, None),
+            ("admin-stats", "get", {}, self.admin, None),
+            ("user-transactions", "get", {}, self.user, None),
+            ("transaction-export", "get", {}, self.user, None),
+            ("buy-coin", "post", {}, self.user, {"coin_id": coin.pk, "amount": "1"}),
+            (
+                "buy-coin",
+                "post",
+                {},
+                self.newcomer,
+                {"coin_id": coin.pk, "amount": "1"},
+                self.reset_newcomer,
+                "first purchase",
+            ),
+            (
+                "sell-asset",
+                "post",
+                {},
+                self.user,
+                {"coin_symbol": coin.symbol, "amount": 1},
+            ),
+            (
+                "swap",
+                "post",
+                {},
+                self.user,
+                {
+                    "from_symbol": coin.symbol,
+                    "to_symbol": self.coins[1].symbol,
+                    "amount": "1",
+                },
+            ),
+            (
+                "swap",
+                "post",
+                {},
+                self.newcomer,
+                {
+                    "from_symbol": coin.symbol,
+                    "to_symbol": self.coins[1].symbol,
+                    "amount": "1",
+                },
+                lambda: self.reset_newcomer(holding=coin),
+                "first receive",
+            ),
+            (
+                "orders-batch",
+                "post",
+                {},
+                self.user,
+                {
+                    "legs": [
+                        {"side": "buy", "coin_symbol": coin.symbol, "amount": "1"},
+                        {
+                            "side": "sell",
+                            "coin_symbol": self.coins[1].symbol,
+                            "amount": "1",
+                        },
+                    ]
+                },
+            ),
+            ("limit-orders-list", "get", {}, self.user, None),
+            ("limit-orders-detail", "get", {"pk": order.pk}, self.user, None),
+            (
+                "limit-orders-list",
+                "post",
+                {},
+                self.user,
+                {
+                    "coin_symbol": coin.symbol,
+                    "side": "buy",
+                    "price": "5",
+                    "amount": "1",
+                },
+            ),
+            (
+                "limit-orders-list",
+                "post",
+                {},
+                self.user,
+                {
+                    "coin_symbol": coin.symbol,
+                    "side": "sell",
+                    "price": "50",
+                    "amount": "1",
+                },
+            ),
+            ("limit-orders-cancel", "post", {"pk": order.pk}, self.user, None),
+        ]
+
+    def reset_newcomer(self, holding=None):
+        """
+        دارایی‌ها و نسخه پرتفوی newcomer را پاک می‌کند تا خرید یا سواپ بعدی
+        اولین معامله او باشد؛ holding تنها دارایی او می‌شود.
+        """
+        Asset.objects.filter(user=self.newcomer).delete()
+        CacheVersion.objects.filter(
+            name=PORTFOLIO_VERSION.format(user_id=self.newcomer.pk)
+        ).delete()
+        if holding is not None:
+            # مثل معامله قبلی، نسخه پرتفوی را هم می‌سازد (core/signals.py)
+            Asset.objects.create(
+                user=self.newcomer, coin=holding, amount=Decimal("1000")
+            )
+
+    def check_routes(self, sizes, verbose_sql):
+        small, large = sizes
+        self.grow(small)
+        scenarios = [self.prepare(*scenario) for scenario in self.scenarios()]
+        covered = {scenario["name"] for scenario in scenarios}
+        # نسخه async همان مسیرها (core/async_views.py) هم با همان بودجه اجرا می‌شود
+        async_routes = {
+            pattern.name: pattern.callback for pattern in async_views.urlpatterns
+        }
+        scenarios += [
+            dict(
+                scenario,
+                label=f"{scenario['label']} (async)",
+                async_view=async_routes[scenario["name"]],
+                counts=[],
+            )
+            for scenario in scenarios
+            if scenario["method"] == "get" and scenario["name"] in async_routes
+        ]
+        missing = sorted(set(route_names(core_urls.urlpatterns)) - covered)
+
+        # اول همه routeها با داده کم و بعد با داده زیاد اندازه‌گیری می‌شوند
+        for size in (small, large):
+            self.grow(size)
+            for scenario in scenarios:
+                if scenario["setup"] is not None:
+                    scenario["setup"]()
+                with CaptureQueriesContext(connection) as context:
+                    self.run_scenario(scenario)
+                scenario["counts"].append(len(context))
+                scenario["queries"] = context.captured_queries
+
+        failures = 0
+        for scenario in scenarios:
+            label = scenario["label"]
+            budget = scenario["budget"]
+            counts = scenario["counts"]
+            if budget is None:
+                failures += 1
+                self.stdout.write(
+                    self.style.ERROR(f"{label}: no query_budget declared")
+                )
+                continue
+
+            report = f"{label}: {counts[0]} -> {counts[1]} queries (budget {budget})"
+            if max(counts) > budget or counts[1] > counts[0]:
+                failures += 1
+                self.stdout.write(self.style.ERROR(report))
+                self.stdout.write(format_queries(scenario["queries"]))
+                continue
+
+            self.stdout.write(report)
+            if verbose_sql:
+                for shape, count in duplicated_shapes(scenario["queries"]):
+                    self.stdout.write(f"  {count}x {shape}")
+
+        for name in missing:
+            self.stdout.write(self.style.WARNING(f"{name}: no scenario, not checked"))
+        return failures
+
+    def prepare(self, name, method, kwargs, user, data, setup=None, note=None):
+        path = reverse(name, kwargs=kwargs)
+        match = resolve(path)
+        # زیر ASYNC_READ_VIEWS مسیر به view async می‌رسد؛ بودجه مال view DRF است
+        view = getattr(match.func, "sync_view", match.func)
+        actions = getattr(view, "actions", None) or {}
+
+        headers = {}
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        client = APIClient()
+        client.credentials(**headers)
+
+        return {
+            "name": name,
+            "method": method,
+            "path": path,
+            "kwargs": match.kwargs,
+            "label": f"{method.upper()} {path}" + (f" ({note})" if note else ""),
+            "budget": get_query_budget(view.cls, actions.get(method, method)),
+            "client": client,
+            "headers": headers,
+            "data": data,
+            "setup": setup,
+            "async_view": None,
+            "counts": [],
+        }
+
+    def run_scenario(self, scenario):
+        # کش‌ها خالی می‌شوند تا مسیر سرد (بدترین حالت) اندازه‌گیری شود
+        cache.clear()
+        coin_catalog.clear()
+        user_cache.clear()
+        versions.clear()
+        if scenario["async_view"] is not None:
+            response = self.run_async_view(scenario)
+        else:
+            data = scenario["data"]
+            payload = data() if callable(data) else data
+            client = scenario["client"]
+            response = getattr(client, scenario["method"])(
+                scenario["path"], payload, format="json"
+            )
+        if response.streaming:
+            # کوئری‌های پاسخ جریانی هنگام خواندن بدنه اجرا می‌شوند
+            b"".join(response.streaming_content)
+        if response.status_code >= 400:
+            body = getattr(response, "data", None) or response.content
+            raise CommandError(
+                f"{scenario['label']} returned {response.status_code}: {body}"
+            )
+
+    def run_async_view(self, scenario):
+        """
+        view async را مستقیم اجرا می‌کند. async_to_sync کوئری‌های ORM async را
+        در همین thread اجرا می‌کند، پس CaptureQueriesContext آن‌ها را می‌بیند.
+        """
+        request = RequestFactory().get(scenario["path"], **scenario["headers"])
+        return async_to_sync(scenario["async_view"])(request, **scenario["kwargs"])
@@ -0,0 +1,220 @@
+import tempfile
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.authentication import user_cache
+from core.benchmarking import isolated_database
+from core.cache import coin_catalog, versions
+from core.models import (
+    Announcement,
+    Coin,
+    ContactMessage,
+    CustomUser,
+    Transaction,
+    Wallet,
+)
+from core.routers import PIN_KEY, REPLICA_DB_ALIAS, replica_enabled, shared_cache
+
+PASSWORD = "routing-pass"
+
+
+class Command(BaseCommand):
+    help = (
+        "Check which database serves each API route with a primary and a "
+        "replica, on two throwaway databases: read-only lists go to the "
+        "replica and a user who just wrote is pinned to the primary. Needs a "
+        "'replica' database and a shared cache, e.g. "
+        "DB_REPLICA_NAME=/tmp/replica.sqlite3 CACHE_URL=file:///tmp/crypton-cache"
+    )
+
+    def handle(self, *args, **options):
+        if not replica_enabled():
+            raise CommandError(
+                "No 'replica' database configured; set DB_REPLICA_NAME (SQLite) "
+                "or DB_REPLICA_HOST (PostgreSQL)"
+            )
+        if not shared_cache():
+            raise CommandError(
+                "The replica needs a shared cache; set CACHE_URL, e.g. "
+                "CACHE_URL=file:///tmp/crypton-cache"
+            )
+        with isolated_database(), isolated_database(REPLICA_DB_ALIAS):
+            self.setup_data()
+            self.replicate()
+            failures = self.check_routes()
+
+        if failures:
+            raise CommandError(f"{failures} request(s) used the wrong database")
+        self.stdout.write(self.style.SUCCESS("All requests used the expected database"))
+
+    def setup_data(self):
+        self.coin = Coin.objects.create(
+            symbol="c0",
+            name="Coin 0",
+            image="https://example.com/c0.png",
+            current_price=Decimal("10"),
+            market_cap=1000,
+            total_volume=100,
+            market_cap_rank=1,
+            ath=Decimal("20"),
+            atl=Decimal("1"),
+        )
+        self.admin = CustomUser.objects.create_superuser("routing-admin", PASSWORD)
+        self.user = CustomUser.objects.create_user("routing-user", PASSWORD)
+        self.other = CustomUser.objects.create_user("routing-other", PASSWORD)
+        Wallet.objects.update(balance=Decimal("1000"))
+        for user in (self.user, self.other):
+            Transaction.objects.create(
+                user=user,
+                transaction_type="buy",
+                coin=self.coin,
+                total_value=Decimal("10"),
+            )
+        Announcement.objects.create(title="Announcement", message="...")
+        ContactMessage.objects.create(user=self.user, message="...", stars=5)
+
+    def replicate(self):
+        """کپی داده دیتابیس اصلی در replica، مثل رسیدن تغییرات به replica."""
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as fixture:
+            call_command(
+                "dumpdata", "core", output=fixture.name, database=DEFAULT_DB_ALIAS
+            )
+            call_command(
+                "loaddata", fixture.name, database=REPLICA_DB_ALIAS, verbosity=0
+            )
+
+    def steps(self):
+        """(توضیح، متد، نام route، kwargs، کاربر، داده، دیتابیس مورد انتظار)"""
+        coin = {"symbol": self.coin.symbol}
+        yield from [
+            ("anonymous", "get", "coins-list", {}, None, None, REPLICA_DB_ALIAS),
+            ("anonymous", "get", "coins-detail", coin, None, None, REPLICA_DB_ALIAS),
+            ("anonymous", "get", "coins-history", coin, None, None, REPLICA_DB_ALIAS),
+            (
+                "user",
+                "get",
+                "announcements-list",
+                {},
+                self.user,
+                None,
+                REPLICA_DB_ALIAS,
+            ),
+            ("user", "get", "user-transactions", {}, self.user, None, REPLICA_DB_ALIAS),
+            ("admin", "get", "users-list", {}, self.admin, None, REPLICA_DB_ALIAS),
+            ("admin", "get", "wallets-list", {}, self.admin, None, REPLICA_DB_ALIAS),
+            ("admin", "get", "assets-list", {}, self.admin, None, REPLICA_DB_ALIAS),
+            (
+                "admin",
+                "get",
+                "contact-messages-list",
+                {},
+                self.admin,
+                None,
+                REPLICA_DB_ALIAS,
+            ),
+            # مسیرهای بدون read_replica
+            ("user", "get", "wallet-me", {}, self.user, None, DEFAULT_DB_ALIAS),
+            ("user", "get", "my-assets", {}, self.user, None, DEFAULT_DB_ALIAS),
+            (
+                "user",
+                "post",
+                "buy-coin",
+                {},
+                self.user,
+                {"coin_id": self.coin.pk, "amount": "1"},
+                DEFAULT_DB_ALIAS,
+            ),
+            # خرید بالا کاربر را به دیتابیس اصلی سنجاق کرده است
+            (
+                "user after a write",
+                "get",
+                "user-transactions",
+                {},
+                self.user,
+                None,
+                DEFAULT_DB_ALIAS,
+            ),
+            (
+                "user after a write",
+                "get",
+                "announcements-list",
+                {},
+                self.user,
+                None,
+                DEFAULT_DB_ALIAS,
+            ),
+            (
+                "another user",
+                "get",
+                "user-transactions",
+                {},
+                self.other,
+                None,
+                REPLICA_DB_ALIAS,
+            ),
+        ]
+        # بدون صبر کردن تا REPLICA_PIN_SECONDS
+        cache.delete(PIN_KEY.format(user_id=self.user.pk))
+        yield (
+            "user after the pin expires",
+            "get",
+            "user-transactions",
+            {},
+            self.user,
+            None,
+            REPLICA_DB_ALIAS,
+        )
+
+    def check_routes(self):
+        failures = 0
+        aliases = (DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS)
+        for who, method, name, kwargs, user, data, expected in self.steps():
+            # کش‌های process خالی می‌شوند تا همه کوئری‌ها واقعاً اجرا شوند
+            coin_catalog.clear()
+            user_cache.clear()
+            versions.clear()
+
+            counts = dict.fromkeys(aliases, 0)
+
+            def recorder(alias):
+                def record(execute, sql, params, many, context):
+                    counts[alias] += 1
+                    return execute(sql, params, many, context)
+
+                return record
+
+            client = APIClient()
+            if user is not None:
+                token = RefreshToken.for_user(user).access_token
+                client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            path = reverse(name, kwargs=kwargs)
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(
+                recorder(DEFAULT_DB_ALIAS)
+            ), connections[REPLICA_DB_ALIAS].execute_wrapper(
+                recorder(REPLICA_DB_ALIAS)
+            ):
+                response = getattr(client, method)(path, data, format="json")
+
+            other = (
+                REPLICA_DB_ALIAS if expected == DEFAULT_DB_ALIAS else DEFAULT_DB_ALIAS
+            )
+            report = (
+                f"{method.upper()} {path} ({who}): {response.status_code}, "
+                f"{counts[DEFAULT_DB_ALIAS]} queries on {DEFAULT_DB_ALIAS}, "
+                f"{counts[REPLICA_DB_ALIAS]} on {REPLICA_DB_ALIAS}"
+            )
+            if response.status_code >= 400 or counts[other] or not counts[expected]:
+                failures += 1
+                self.stdout.write(
+                    self.style.ERROR(f"{report} (expected only {expected})")
+                )
+            else:
+                self.stdout.write(report)
+        return failures
@@ -0,0 +1,103 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.authentication import user_cache
+from core.benchmarking import isolated_database
+from core.cache import versions
+from core.models import CustomUser
+
+PASSWORD = "user-cache-pass"
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the authenticated-user cache on a throwaway database: repeated "
+        "requests hit, saving or deactivating the user misses right away, and "
+        "the reported hits, misses and hit ratio match the requests made"
+    )
+
+    def handle(self, *args, **options):
+        # TTL بلند تا انقضا وسط بررسی نتیجه را عوض نکند
+        with isolated_database(), override_settings(AUTH_USER_CACHE_TTL=60):
+            self.user = CustomUser.objects.create_user("cache-user", PASSWORD)
+            self.other = CustomUser.objects.create_user("cache-other", PASSWORD)
+            user_cache.clear()
+            versions.clear()
+            failures, expected = self.check_steps()
+            failures += self.check_stats(expected)
+
+        if failures:
+            raise CommandError(f"{failures} check(s) failed")
+        self.stdout.write(self.style.SUCCESS("The user cache counts every lookup"))
+
+    def steps(self):
+        """(توضیح، کاربر، نتیجه مورد انتظار کش، status مورد انتظار)"""
+        yield "first request", self.user, "miss", 200
+        yield "second request", self.user, "hit", 200
+        yield "third request", self.user, "hit", 200
+        yield "another user", self.other, "miss", 200
+        yield "another user again", self.other, "hit", 200
+        self.user.first_name = "Changed"
+        self.user.save()
+        yield "after the user is saved", self.user, "miss", 200
+        yield "after the save, again", self.user, "hit", 200
+        self.user.is_active = False
+        self.user.save()
+        yield "after deactivation", self.user, "miss", 401
+        yield "deactivated, again", self.user, "hit", 401
+        yield "another user after that", self.other, "hit", 200
+
+    def check_steps(self):
+        failures = 0
+        expected = {"hit": 0, "miss": 0}
+        path = reverse("user-me")
+        for description, user, outcome, status in self.steps():
+            client = APIClient()
+            token = RefreshToken.for_user(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            before = user_cache.stats()
+            response = client.get(path)
+            after = user_cache.stats()
+            if after["hits"] - before["hits"] == 1:
+                result = "hit"
+            elif after["misses"] - before["misses"] == 1:
+                result = "miss"
+            else:
+                result = "not counted"
+            expected[outcome] += 1
+
+            line = f"{description}: {result}, {response.status_code}"
+            if result == outcome and response.status_code == status:
+                self.stdout.write(line)
+            else:
+                failures += 1
+                self.stdout.write(
+                    self.style.ERROR(f"{line} (expected {outcome}, {status})")
+                )
+        return failures, expected
+
+    def check_stats(self, expected):
+        stats = user_cache.stats()
+        lookups = expected["hit"] + expected["miss"]
+        ratio = expected["hit"] / lookups
+        line = (
+            f"stats: {stats['hits']} hits, {stats['misses']} misses, "
+            f"hit ratio {stats['hit_ratio']:.2f}, {stats['size']} cached"
+        )
+        if (
+            stats["hits"] == expected["hit"]
+            and stats["misses"] == expected["miss"]
+            and abs(stats["hit_ratio"] - ratio) < 1e-9
+        ):
+            self.stdout.write(line)
+            return 0
+        self.stdout.write(
+            self.style.ERROR(
+                f"{line} (expected {expected['hit']} hits, {expected['miss']} "
+                f"misses, hit ratio {ratio:.2f})"
+            )
+        )
+        return 1
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.ledger import compact
+
+
+class Command(BaseCommand):
+    help = "Fold wallet ledger entries into each wallet's balance snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-entries",
+            type=int,
+            default=1,
+            help="Only compact wallets with at least this many pending entries (default: 1)",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete ledger entries once they are folded into the snapshot",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running and compact every this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            result = compact(min_entries=options["min_entries"], prune=options["prune"])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Compacted {result['entries']} entries in {result['wallets']} wallets, "
+                f"pruned {result['pruned']} in {elapsed * 1000:.1f}ms"
+            )
+            if not options["interval"]:
+                break
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                break
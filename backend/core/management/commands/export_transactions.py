@@ -0,0 +1,79 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    export_queryset,
+    iter_export,
+    parse_bound,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream transaction history to a CSV or NDJSON file without loading it into memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            choices=list(EXPORT_FORMATS),
+            default="csv",
+            help="Output format (default: csv)",
+        )
+        parser.add_argument(
+            "--file",
+            type=str,
+            default="-",
+            help="Destination file, '-' for stdout (default: -)",
+        )
+        parser.add_argument(
+            "--username", type=str, help="Only export this user's transactions"
+        )
+        parser.add_argument(
+            "--start", type=str, help="Earliest date or ISO datetime (inclusive)"
+        )
+        parser.add_argument(
+            "--end",
+            type=str,
+            help="Latest date (inclusive) or ISO datetime (exclusive)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f"Rows fetched from the database per round trip (default: {EXPORT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = options["start"] and parse_bound(options["start"])
+            end = options["end"] and parse_bound(options["end"], end=True)
+        except ValueError as e:
+            raise CommandError(e)
+
+        queryset = export_queryset(
+            username=options["username"], start=start or None, end=end or None
+        )
+        chunks = iter_export(queryset, options["output"], options["chunk_size"])
+
+        started = time.perf_counter()
+        written = 0
+        if options["file"] == "-":
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+                written += len(chunk)
+            return
+
+        with open(options["file"], "w", encoding="utf-8", newline="") as fp:
+            for chunk in chunks:
+                fp.write(chunk)
+                written += len(chunk)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {written} characters to {options['file']} in {elapsed:.2f}s"
+            )
+        )
@@ -1,7 +1,38 @@
 import json
+import time
 from decimal import Decimal
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.cache import bump_catalog_version
 from core.models import Coin
+from core.utils import iter_json_array
+
+
+UPDATE_FIELDS = [
+    "name",
+    "image",
+    "current_price",
+    "market_cap",
+    "total_volume",
+    "market_cap_rank",
+    "ath",
+    "atl",
+    "is_active",
+]
+
+
+def coin_defaults(coin):
+    return {
+        "name": coin["name"],
+        "image": coin["image"],
+        "current_price": Decimal(coin["current_price"]),
+        "market_cap": coin["market_cap"],
+        "total_volume": coin["total_volume"],
+        "market_cap_rank": coin["market_cap_rank"],
+        "ath": Decimal(coin["ath"]),
+        "atl": Decimal(coin["atl"]),
+        "is_active": True,
+    }
 
 
 class Command(BaseCommand):
@@ -11,10 +42,34 @@ class Command(BaseCommand):
         parser.add_argument(
             "json_file", type=str, help="Path to the JSON file containing coins data"
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Stream the file and upsert coins in batches instead of one by one",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of coins written per batch in bulk mode (default: 500)",
+        )
+        parser.add_argument(
+            "--deactivate-missing",
+            action="store_true",
+            help="Mark active coins that are not present in the file as inactive (implies --bulk)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the changes that would be made without writing anything (implies --bulk)",
+        )
 
     def handle(self, *args, **kwargs):
         json_file = kwargs["json_file"]
 
+        if kwargs["bulk"] or kwargs["deactivate_missing"] or kwargs["dry_run"]:
+            return self.handle_bulk(**kwargs)
+
         try:
             with open(json_file, "r") as file:
                 coins_data = json.load(file)
@@ -25,19 +80,121 @@ class Command(BaseCommand):
         for coin in coins_data:
             obj, created = Coin.objects.update_or_create(
                 symbol=coin["symbol"],
-                defaults={
-                    "name": coin["name"],
-                    "image": coin["image"],
-                    "current_price": Decimal(coin["current_price"]),
-                    "market_cap": coin["market_cap"],
-                    "total_volume": coin["total_volume"],
-                    "market_cap_rank": coin["market_cap_rank"],
-                    "ath": Decimal(coin["ath"]),
-                    "atl": Decimal(coin["atl"]),
-                    "is_active": True,
-                },
+                defaults=coin_defaults(coin),
             )
             action = "Created" if created else "Updated"
             self.stdout.write(self.style.SUCCESS(f"{action} coin: {obj.symbol}"))
 
         self.stdout.write(self.style.SUCCESS("Import complete!"))
+
+    def handle_bulk(self, json_file, batch_size, deactivate_missing, dry_run, **kwargs):
+        if batch_size < 1:
+            self.stderr.write(self.style.ERROR("--batch-size must be at least 1"))
+            return
+
+        started = time.perf_counter()
+        seen = set()
+        rows = 0
+        batches = 0
+        self.diff = {"created": 0, "updated": 0, "unchanged": 0, "deactivated": 0}
+
+        try:
+            with open(json_file, "r") as file:
+                batch = {}
+                for coin in iter_json_array(file):
+                    batch[coin["symbol"]] = Coin(
+                        symbol=coin["symbol"], **coin_defaults(coin)
+                    )
+                    rows += 1
+                    if len(batch) >= batch_size:
+                        self.write_batch(batch, dry_run)
+                        seen.update(batch)
+                        batches += 1
+                        batch = {}
+                if batch:
+                    self.write_batch(batch, dry_run)
+                    seen.update(batch)
+                    batches += 1
+        except Exception as e:
+            self.stderr.write(
+                self.style.ERROR(f"Error importing JSON file after {rows} rows: {e}")
+            )
+            if batches and not dry_run:
+                bump_catalog_version()
+            return
+
+        if deactivate_missing:
+            self.deactivate_missing(seen, batch_size, dry_run)
+
+        if not dry_run:
+            bump_catalog_version()
+
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        if dry_run:
+            self.stdout.write(
+                "Dry run: {created} to create, {updated} to update, "
+                "{unchanged} unchanged, {deactivated} to deactivate".format(**self.diff)
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'Dry run' if dry_run else 'Import'} complete: {rows} rows, "
+                f"{batches} batches, {elapsed:.2f}s elapsed, {rate:.0f} rows/sec"
+            )
+        )
+
+    def write_batch(self, batch, dry_run):
+        if dry_run:
+            self.print_diff(batch)
+            return
+
+        # هر batch تراکنش جداگانه دارد تا قفل نوشتن بین batchها آزاد شود
+        with transaction.atomic():
+            Coin.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=["symbol"],
+                update_fields=UPDATE_FIELDS,
+            )
+
+    def print_diff(self, batch):
+        existing = Coin.objects.in_bulk(list(batch), field_name="symbol")
+        for symbol, coin in batch.items():
+            current = existing.get(symbol)
+            if current is None:
+                self.diff["created"] += 1
+                self.stdout.write(self.style.SUCCESS(f"+ {symbol}"))
+                continue
+
+            changes = [
+                f"{field}: {getattr(current, field)} -> {getattr(coin, field)}"
+                for field in UPDATE_FIELDS
+                if getattr(current, field) != getattr(coin, field)
+            ]
+            if changes:
+                self.diff["updated"] += 1
+                self.stdout.write(f"~ {symbol}: " + ", ".join(changes))
+            else:
+                self.diff["unchanged"] += 1
+
+    def deactivate_missing(self, seen, batch_size, dry_run):
+        missing = [
+            (pk, symbol)
+            for pk, symbol in Coin.objects.filter(is_active=True).values_list(
+                "pk", "symbol"
+            )
+            if symbol not in seen
+        ]
+        self.diff["deactivated"] = len(missing)
+
+        if dry_run:
+            for _, symbol in missing:
+                self.stdout.write(self.style.WARNING(f"- {symbol}"))
+            return
+
+        for start in range(0, len(missing), batch_size):
+            ids = [pk for pk, _ in missing[start : start + batch_size]]
+            Coin.objects.filter(pk__in=ids).update(is_active=False)
+
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Deactivated {len(missing)} coins"))
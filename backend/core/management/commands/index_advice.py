@@ -0,0 +1,292 @@
+import io
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarking import isolated_database
+from core.exports import export_queryset
+from core.indexadvice import (
+    explain,
+    format_index,
+    plan_problems,
+    suggest_index,
+    time_queryset,
+)
+from core.models import (
+    Announcement,
+    Asset,
+    Coin,
+    ContactMessage,
+    CustomUser,
+    Transaction,
+)
+from core.pagination import KeysetPagination
+from core.portfolio import portfolio_queryset
+from core.views import (
+    AnnouncementViewSet,
+    AssetViewSet,
+    CoinViewSet,
+    ContactMessageViewSet,
+    UserTransactions,
+    UserViewSet,
+    WalletViewSet,
+)
+
+
+def view_queryset(view_class, user, query=None, action="list"):
+    """queryset همان view برای یک درخواست GET ساختگی از طرف user."""
+    request = Request(APIRequestFactory().get("/", query or {}))
+    request.user = user
+    view = view_class(
+        request=request, action=action, args=(), kwargs={}, format_kwarg=None
+    )
+    return view.filter_queryset(view.get_queryset())
+
+
+def keyset_page(queryset):
+    field, tiebreaker = KeysetPagination.ordering
+    return queryset.order_by(f"-{field}", f"-{tiebreaker}")[
+        : KeysetPagination.page_size + 1
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the queryset behind each API view, flag full table scans and "
+        "separate sorts, and propose Meta.indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            action="store_true",
+            help=(
+                "Run against a throwaway seeded database and time every query "
+                "without and with the models' Meta.indexes"
+            ),
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=2000,
+            help="Seeded users with --seed (default: 2000)",
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=100,
+            help="Seeded transactions per user with --seed (default: 100)",
+        )
+        parser.add_argument(
+            "--username",
+            type=str,
+            help="Regular user the per-user queries run as (default: the most active)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timed runs per query, the median is reported (default: 5)",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Use EXPLAIN ANALYZE on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        if not options["seed"]:
+            cases = self.cases(options["username"])
+            self.report(self.analyze(cases, options), None, options)
+            return
+
+        with isolated_database():
+            self.seed(options)
+            cases = self.cases(options["username"])
+            with self.without_model_indexes():
+                before = self.analyze(cases, options)
+            after = self.analyze(cases, options)
+            self.report(after, before, options)
+
+    def seed(self, options):
+        self.stdout.write("Seeding a throwaway database...")
+        call_command(
+            "seed_load_data",
+            users=options["users"],
+            transactions=options["transactions"],
+            prefix="advice",
+            stdout=io.StringIO(),
+        )
+        users = list(CustomUser.objects.values_list("id", flat=True))
+        ContactMessage.objects.bulk_create(
+            ContactMessage(user_id=user_id, message="...", stars=5)
+            for user_id in users
+            for _ in range(3)
+        )
+        Announcement.objects.bulk_create(
+            Announcement(title=f"Announcement {i}", message="...") for i in range(200)
+        )
+        # روی PostgreSQL autovacuum آمار planner را بعد از درج انبوه به‌روز
+        # می‌کند؛ جنگو روی SQLite هیچ‌وقت ANALYZE اجرا نمی‌کند، پس اینجا هم نه
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    @contextmanager
+    def without_model_indexes(self):
+        models = [
+            model
+            for model in apps.get_app_config("core").get_models()
+            if model._meta.indexes
+        ]
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+        try:
+            yield
+        finally:
+            with connection.schema_editor() as editor:
+                for model in models:
+                    for index in model._meta.indexes:
+                        editor.add_index(model, index)
+
+    def cases(self, username):
+        """(نام، queryset، فقط اولین ردیف) برای هر مسیر خواندنی API."""
+        # viewها فقط پرچم‌های ادمین را می‌خوانند؛ کاربر ذخیره‌نشده هم کافی است
+        admin = CustomUser(username="admin", is_staff=True, is_superuser=True)
+        if username:
+            user = CustomUser.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"User '{username}' does not exist")
+        else:
+            busiest = (
+                Transaction.objects.values("user")
+                .annotate(count=Count("id"))
+                .order_by("-count")
+                .first()
+            )
+            user = (
+                CustomUser.objects.filter(
+                    pk=busiest["user"] if busiest else None
+                ).first()
+                or CustomUser.objects.filter(is_superuser=False).first()
+            )
+        if user is None:
+            raise CommandError("Need at least one regular user to run queries as")
+
+        coin = Asset.objects.filter(user=user).values_list("coin__symbol", flat=True)
+        coin = coin.first() or Coin.objects.values_list("symbol", flat=True).first()
+
+        transactions = view_queryset(UserTransactions, user)
+        return [
+            ("users-list", view_queryset(UserViewSet, admin), False),
+            ("wallets-list", view_queryset(WalletViewSet, admin), False),
+            ("assets-list", view_queryset(AssetViewSet, admin), False),
+            (
+                "assets-list?username",
+                view_queryset(AssetViewSet, admin, {"username": user.username}),
+                False,
+            ),
+            ("my-assets", view_queryset(AssetViewSet, user), False),
+            ("portfolio", portfolio_queryset(user), False),
+            ("coins-list", view_queryset(CoinViewSet, admin), False),
+            (
+                "coins-detail",
+                view_queryset(CoinViewSet, admin).filter(symbol=coin),
+                False,
+            ),
+            ("announcements-list", view_queryset(AnnouncementViewSet, user), False),
+            (
+                "contact-messages-list (admin)",
+                view_queryset(ContactMessageViewSet, admin),
+                False,
+            ),
+            (
+                "contact-messages-list",
+                view_queryset(ContactMessageViewSet, user),
+                False,
+            ),
+            ("user-transactions", keyset_page(transactions), False),
+            (
+                "user-transactions?coin",
+                keyset_page(view_queryset(UserTransactions, user, {"coin": coin})),
+                False,
+            ),
+            ("transaction-export", export_queryset(user=user), True),
+            (
+                "transaction-export?username",
+                export_queryset(username=user.username),
+                True,
+            ),
+            ("transaction-export (admin, all)", export_queryset(), True),
+        ]
+
+    def analyze(self, cases, options):
+        results = {}
+        for name, queryset, first_row in cases:
+            plan = explain(queryset, analyze=options["analyze"])
+            problems = plan_problems(plan, connection.vendor)
+            results[name] = {
+                "plan": plan,
+                "problems": problems,
+                "index": suggest_index(queryset) if problems else None,
+                "unfiltered": not queryset.query.where,
+                "ms": time_queryset(queryset, options["repeat"], first_row),
+            }
+        return results
+
+    def report(self, results, before, options):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Plans on {connection.vendor} are printed but not checked"
+                )
+            )
+
+        proposals = {}
+        for name, result in results.items():
+            self.stdout.write("")
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            previous = before and before[name]
+            if previous:
+                self.line("before", previous)
+            self.line("after" if previous else "plan", result)
+            if options["verbosity"] >= 2:
+                for row in result["plan"].splitlines():
+                    self.stdout.write(f"      {row}")
+
+            for label, entry in (
+                ("before", previous),
+                ("after" if previous else "now", result),
+            ):
+                if entry and entry["index"] is not None:
+                    proposals.setdefault(format_index(entry["index"]), []).append(
+                        f"{name} ({label})"
+                    )
+
+        self.stdout.write("")
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("No indexes to propose"))
+            return
+        self.stdout.write("Proposed Meta.indexes:")
+        for index, names in proposals.items():
+            self.stdout.write(f"  {index}")
+            self.stdout.write(f"      for {', '.join(names)}")
+
+    def line(self, label, result):
+        if not result["problems"]:
+            verdict = self.style.SUCCESS("ok")
+        else:
+            verdict = self.style.WARNING("; ".join(result["problems"]))
+            if result["index"] is None and result["unfiltered"]:
+                verdict += " (unfiltered list: paginate rather than index)"
+            elif result["index"] is None:
+                verdict += " (no single-table index can serve this)"
+        self.stdout.write(f"  {label:<6} {result['ms']:9.2f}ms  {verdict}")
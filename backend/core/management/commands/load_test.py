@@ -0,0 +1,397 @@
+import asyncio
+import io
+import json
+import os
+import ssl
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.authentication import user_cache
+from core.benchmarking import percentile
+from core.models import Coin, CustomUser
+
+INTERFACES = ("wsgi", "asgi")
+
+
+def summarize(results, elapsed):
+    latencies = [latency for result in results for latency in result["latencies"]]
+    errors = sum(result["errors"] for result in results)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def wsgi_environ(path, headers):
+    path, _, query = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SCRIPT_NAME": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in headers.items():
+        environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    return environ
+
+
+def call_wsgi(app, path, headers):
+    status = []
+    body = app(wsgi_environ(path, headers), lambda line, *args: status.append(line))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+    return int(status[0].split()[0])
+
+
+async def call_asgi(app, path, headers):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")]
+        + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    received = False
+    status = None
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # کلاینت قطع نمی‌شود؛ جنگو بعد از پاسخ خودش این انتظار را لغو می‌کند
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+class HTTPConnection:
+    """کلاینت HTTP/1.1 حداقلی با keep-alive روی asyncio (بدون وابستگی)."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.base = parts.path.rstrip("/")
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def get(self, path, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl
+            )
+        lines = [f"GET {self.base}{path} HTTP/1.1", f"Host: {self.host}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip().lower()
+
+        if "content-length" in response_headers:
+            await self.reader.readexactly(int(response_headers["content-length"]))
+        elif response_headers.get("transfer-encoding") == "chunked":
+            while size := int((await self.reader.readline()).split(b";")[0], 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        else:
+            await self.reader.read()
+            await self.close()
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the read endpoints under WSGI (sync DRF views, "
+        "a thread per connection) and ASGI (async views, one event loop) at "
+        "several concurrency levels, or load a running server with --url"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--paths",
+            nargs="+",
+            help=(
+                "Paths requested round-robin (default: coin list and detail, "
+                "announcements, /api/user/, /api/wallet/, /api/asset/)"
+            ),
+        )
+        parser.add_argument(
+            "--concurrency",
+            nargs="+",
+            type=int,
+            default=[1, 8, 32, 64],
+            help="Concurrent connections per run (default: 1 8 32 64)",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=5.0,
+            help="Seconds per concurrency level (default: 5)",
+        )
+        parser.add_argument(
+            "--interfaces",
+            nargs="+",
+            choices=INTERFACES,
+            default=list(INTERFACES),
+            help="Handlers to compare in-process (default: wsgi asgi)",
+        )
+        parser.add_argument(
+            "--username",
+            type=str,
+            help="User the requests authenticate as (default: first user with assets)",
+        )
+        parser.add_argument(
+            "--url",
+            type=str,
+            help="Load a running server at this base URL instead of in-process handlers",
+        )
+        parser.add_argument(
+            "--worker",
+            choices=INTERFACES,
+            help="Internal: run one interface in this process and print JSON",
+        )
+        parser.add_argument("--token", type=str, help="Internal: access token")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            results = {
+                concurrency: self.run_in_process(
+                    options["worker"],
+                    options["paths"],
+                    {"Authorization": f"Bearer {options['token']}"},
+                    concurrency,
+                    options["duration"],
+                )
+                for concurrency in options["concurrency"]
+            }
+            self.stdout.write(json.dumps(results))
+            return
+
+        token, paths = self.prepare(options)
+        headers = {"Authorization": f"Bearer {token}"}
+        self.stdout.write(f"Paths: {' '.join(paths)}")
+
+        if options["url"]:
+            results = {
+                options["url"]: {
+                    concurrency: asyncio.run(
+                        self.run_http(
+                            options["url"],
+                            paths,
+                            headers,
+                            concurrency,
+                            options["duration"],
+                        )
+                    )
+                    for concurrency in options["concurrency"]
+                }
+            }
+        else:
+            results = {
+                interface: self.spawn(interface, token, paths, options)
+                for interface in options["interfaces"]
+            }
+        self.report(results)
+
+    def prepare(self, options):
+        users = CustomUser.objects.filter(is_active=True, wallet__isnull=False)
+        if options["username"]:
+            user = users.filter(username=options["username"]).first()
+        else:
+            user = users.filter(assets__isnull=False).first() or users.first()
+        if user is None:
+            raise CommandError(
+                "No user to authenticate as; run seed_load_data or pass --username"
+            )
+
+        paths = options["paths"]
+        if not paths:
+            coin = Coin.objects.filter(is_active=True).order_by("market_cap_rank")
+            symbol = coin.values_list("symbol", flat=True).first()
+            if symbol is None:
+                raise CommandError("No active coins; run import_coins first")
+            paths = [
+                "/api/coins/",
+                f"/api/coins/{symbol}/",
+                "/api/announcements/",
+                "/api/user/",
+                "/api/wallet/",
+                "/api/asset/",
+            ]
+        return str(RefreshToken.for_user(user).access_token), paths
+
+    def spawn(self, interface, token, paths, options):
+        """
+        هر interface در process جدا اجرا می‌شود، مثل دو استقرار جدا؛ ASYNC_READ_VIEWS
+        موقع بارگذاری settings خوانده می‌شود و داخل یک process عوض نمی‌شود.
+        """
+        self.stdout.write(f"Running {interface}...")
+        command = [
+            sys.executable,
+            str(Path(settings.BASE_DIR) / "manage.py"),
+            "load_test",
+            "--worker",
+            interface,
+            "--token",
+            token,
+            "--duration",
+            str(options["duration"]),
+            "--paths",
+            *paths,
+            "--concurrency",
+            *map(str, options["concurrency"]),
+        ]
+        env = dict(os.environ, ASYNC_READ_VIEWS="1" if interface == "asgi" else "0")
+        process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise CommandError(f"{interface} run failed:\n{process.stderr}")
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def run_in_process(self, interface, paths, headers, concurrency, duration):
+        # آمار کش کاربر هر سطح جدا شمرده می‌شود
+        user_cache.clear()
+        if interface == "wsgi":
+            result = self.run_wsgi(WSGIHandler(), paths, headers, concurrency, duration)
+        else:
+            result = asyncio.run(
+                self.run_asgi(ASGIHandler(), paths, headers, concurrency, duration)
+            )
+        result["auth_hit_ratio"] = user_cache.stats()["hit_ratio"]
+        return result
+
+    def run_wsgi(self, app, paths, headers, concurrency, duration):
+        # هر thread یک اتصال؛ مثل worker با thread (gunicorn --threads)
+        start = threading.Barrier(concurrency)
+
+        def connection(index):
+            latencies, errors = [], 0
+            start.wait()
+            deadline = time.perf_counter() + duration
+            i = index
+            while (now := time.perf_counter()) < deadline:
+                status = call_wsgi(app, paths[i % len(paths)], headers)
+                latencies.append((time.perf_counter() - now) * 1000)
+                errors += status >= 400
+                i += 1
+            return {"latencies": latencies, "errors": errors}
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(connection, range(concurrency)))
+        return summarize(results, time.perf_counter() - started)
+
+    async def run_asgi(self, app, paths, headers, concurrency, duration):
+        # همه اتصال‌ها روی یک event loop؛ مثل یک worker uvicorn
+        async def connection(index):
+            latencies, errors = [], 0
+            deadline = time.perf_counter() + duration
+            i = index
+            while (now := time.perf_counter()) < deadline:
+                status = await call_asgi(app, paths[i % len(paths)], headers)
+                latencies.append((time.perf_counter() - now) * 1000)
+                errors += status >= 400
+                i += 1
+            return {"latencies": latencies, "errors": errors}
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(connection(i) for i in range(concurrency)))
+        return summarize(results, time.perf_counter() - started)
+
+    async def run_http(self, url, paths, headers, concurrency, duration):
+        async def connection(index):
+            client = HTTPConnection(url)
+            latencies, errors = [], 0
+            deadline = time.perf_counter() + duration
+            i = index
+            try:
+                while (now := time.perf_counter()) < deadline:
+                    try:
+                        status = await client.get(paths[i % len(paths)], headers)
+                    except (OSError, asyncio.IncompleteReadError, ValueError):
+                        await client.close()
+                        errors += 1
+                        continue
+                    latencies.append((time.perf_counter() - now) * 1000)
+                    errors += status >= 400
+                    i += 1
+            finally:
+                await client.close()
+            return {"latencies": latencies, "errors": errors}
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(connection(i) for i in range(concurrency)))
+        return summarize(results, time.perf_counter() - started)
+
+    def report(self, results):
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'target':<24} {'conns':>5} {'req/s':>9} {'p50 ms':>8} "
+            f"{'p99 ms':>8} {'errors':>6} {'auth hit':>8}"
+        )
+        for target, levels in results.items():
+            for concurrency, result in levels.items():
+                # سرور در حال اجرا (--url) آمار کشش را به این process نمی‌دهد
+                hit_ratio = result.get("auth_hit_ratio")
+                hits = "-" if hit_ratio is None else f"{hit_ratio:.1%}"
+                line = (
+                    f"{target:<24} {concurrency:>5} {result['rps']:>9.1f} "
+                    f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                    f"{result['errors']:>6} {hits:>8}"
+                )
+                self.stdout.write(self.style.ERROR(line) if result["errors"] else line)
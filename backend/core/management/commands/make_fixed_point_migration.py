@@ -0,0 +1,102 @@
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.questioner import NonInteractiveMigrationQuestioner
+from django.db.migrations.state import ProjectState
+from django.db.migrations.writer import MigrationWriter
+
+from core.fields import ConvertFixedPoint, FixedPointDecimalField
+
+APP_LABEL = "core"
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the core migration for a FIXED_POINT_AMOUNTS switch: every amount "
+        "column that changes between DecimalField and FixedPointDecimalField gets "
+        "a ConvertFixedPoint operation that also rescales existing rows. Run it "
+        "instead of makemigrations right after changing the setting"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--name",
+            default="fixed_point_amounts",
+            help="Migration name (default: fixed_point_amounts)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the migration instead of writing it",
+        )
+
+    def handle(self, *args, **options):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        from_state = loader.project_state()
+        autodetector = MigrationAutodetector(
+            from_state,
+            ProjectState.from_apps(apps),
+            NonInteractiveMigrationQuestioner(specified_apps={APP_LABEL}),
+        )
+        changes = autodetector.changes(
+            graph=loader.graph,
+            trim_to_apps={APP_LABEL},
+            convert_apps={APP_LABEL},
+            migration_name=options["name"],
+        )
+        if not changes:
+            raise CommandError(
+                "No pending changes in core; FIXED_POINT_AMOUNTS already matches "
+                "the migrations"
+            )
+
+        (migration,) = changes[APP_LABEL]
+        operations, others = [], []
+        for operation in migration.operations:
+            if self.switches_storage(from_state, operation):
+                operations.append(
+                    ConvertFixedPoint(
+                        model_name=operation.model_name,
+                        name=operation.name,
+                        field=operation.field,
+                        preserve_default=operation.preserve_default,
+                    )
+                )
+            else:
+                others.append(operation.describe())
+        # بقیه تغییرها با makemigrations معمولی نوشته می‌شوند تا این migration
+        # فقط تبدیل ستون‌ها باشد
+        if others:
+            raise CommandError(
+                "Pending model changes other than the amount columns; run "
+                "makemigrations for them first:\n  " + "\n  ".join(others)
+            )
+        migration.operations = operations
+
+        writer = MigrationWriter(migration)
+        if options["dry_run"]:
+            self.stdout.write(writer.as_string())
+            return
+        os.makedirs(os.path.dirname(writer.path), exist_ok=True)
+        with open(writer.path, "w", encoding="utf-8") as migration_file:
+            migration_file.write(writer.as_string())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {writer.path} ({len(operations)} column(s) to convert)"
+            )
+        )
+
+    def switches_storage(self, from_state, operation):
+        """آیا operation ستون را بین decimal و ممیز ثابت جابه‌جا می‌کند."""
+        if type(operation) is not migrations.AlterField:
+            return False
+        old = from_state.models[APP_LABEL, operation.model_name_lower].fields[
+            operation.name
+        ]
+        return isinstance(old, FixedPointDecimalField) != isinstance(
+            operation.field, FixedPointDecimalField
+        )
@@ -0,0 +1,153 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.matching import MatchingEngine
+from core.pricehistory import PriceHistoryRecorder
+from core.pricefeed import (
+    FileTickSource,
+    PriceFeedWorker,
+    ReplayTickSource,
+    SocketTickSource,
+)
+
+
+class Command(BaseCommand):
+    help = "Keep coin prices fresh by applying ticks from a price source in coalesced batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            choices=["replay", "file", "socket"],
+            default="replay",
+            help="Where ticks come from (default: replay of data/coins.json)",
+        )
+        parser.add_argument(
+            "--path",
+            type=str,
+            help="NDJSON file for --source file ('-' for stdin) or JSON file for --source replay",
+        )
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Keep waiting for new lines at the end of the file (like tail -f)",
+        )
+        parser.add_argument("--host", type=str, default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=9000)
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.01,
+            help="Maximum relative price change per replayed tick (default: 0.01)",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0,
+            help="Replayed ticks per second, 0 for unthrottled (default: 0)",
+        )
+        parser.add_argument("--seed", type=int, help="Random seed for the replay source")
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between database writes (default: 1.0)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Coins per UPDATE statement and transaction (default: 200)",
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=float,
+            default=10.0,
+            help="Seconds between throughput reports (default: 10)",
+        )
+        parser.add_argument(
+            "--no-history",
+            action="store_true",
+            help="Do not record price ticks and OHLC candles",
+        )
+        parser.add_argument(
+            "--no-orders",
+            action="store_true",
+            help="Do not match resting limit orders against the new prices",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            help="Stop after this many seconds instead of running forever",
+        )
+
+    def handle(self, *args, **options):
+        source = self.build_source(options)
+        self.history = None if options["no_history"] else PriceHistoryRecorder()
+        self.engine = None if options["no_orders"] else MatchingEngine()
+        worker = PriceFeedWorker(
+            source,
+            flush_interval=options["flush_interval"],
+            batch_size=options["batch_size"],
+            on_flush=self.on_flush,
+            on_report=self.write_report,
+        )
+
+        if self.engine is not None:
+            coins = self.engine.recover()
+            self.stdout.write(
+                f"Order book recovered: {len(self.engine)} open limit orders "
+                f"on {len(coins)} coins"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Price feed started ({options['source']})"))
+        try:
+            worker.run(
+                duration=options["duration"],
+                report_interval=options["report_interval"],
+            )
+        except KeyboardInterrupt:
+            worker.stop()
+            worker.flush()
+        except OSError as e:
+            raise CommandError(f"Price source failed: {e}")
+        finally:
+            if self.history is not None:
+                self.history.close()
+
+        self.stdout.write(self.style.SUCCESS("Price feed stopped"))
+
+    def build_source(self, options):
+        if options["source"] == "file":
+            if not options["path"]:
+                raise CommandError("--path is required for --source file")
+            return FileTickSource(options["path"], follow=options["follow"])
+        if options["source"] == "socket":
+            return SocketTickSource(options["host"], options["port"])
+        return ReplayTickSource(
+            options["path"],
+            jitter=options["jitter"],
+            rate=options["rate"],
+            seed=options["seed"],
+        )
+
+    def on_flush(self, coins):
+        if self.history is not None:
+            self.history(coins)
+        if self.engine is not None:
+            self.engine(coins)
+
+    def write_report(self, report):
+        self.stdout.write(
+            "{ticks} ticks ({ticks_per_sec:.0f} ticks/sec), {rows} rows in "
+            "{flushes} flushes, flush avg {flush_avg_ms:.1f}ms max {flush_max_ms:.1f}ms, "
+            "{invalid} invalid, {lock_retries} lock retries".format(**report)
+        )
+        if self.history is not None:
+            self.stdout.write(
+                "history: {ticks} ticks, {candles} candle writes, {extremes} "
+                "ath/atl updates, {retries} retries".format(**self.history.stats)
+            )
+        if self.engine is not None:
+            self.stdout.write(
+                "orders: {resting} resting, {fills} filled, {skipped} cancelled "
+                "skipped, {retries} retries, {errors} errors".format(
+                    resting=len(self.engine), **self.engine.stats
+                )
+            )
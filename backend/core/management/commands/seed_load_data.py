@@ -0,0 +1,256 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Asset, Coin, CustomUser, Transaction, Wallet
+
+DEFAULT_COINS_FILE = Path(settings.BASE_DIR) / "data" / "coins.json"
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users, wallets, assets and transaction history in bulk "
+        "for load and scale testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=1000, help="Users to create (default: 1000)"
+        )
+        parser.add_argument(
+            "--assets",
+            type=int,
+            default=5,
+            help="Distinct coins held per user (default: 5)",
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=100,
+            help="Historical transactions per user (default: 100)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Transaction history spans this many days back (default: 365)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per bulk_create and transaction (default: 5000)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Random seed (default: 42)"
+        )
+        parser.add_argument(
+            "--password",
+            type=str,
+            default="load-test",
+            help="Password shared by all generated users, hashed once",
+        )
+        parser.add_argument(
+            "--prefix",
+            type=str,
+            default="load",
+            help="Username prefix; users are named <prefix>-<n> (default: load)",
+        )
+        parser.add_argument(
+            "--coins-file",
+            type=str,
+            default=str(DEFAULT_COINS_FILE),
+            help="Coins imported first if the coin table is empty",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete users created earlier with the same prefix first",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+        started = time.perf_counter()
+
+        existing = CustomUser.objects.filter(username__startswith=f"{prefix}-")
+        if options["clear"]:
+            deleted, _ = existing.delete()
+            self.stdout.write(f"Deleted {deleted} rows from a previous run")
+        elif existing.exists():
+            raise CommandError(
+                f"Users with prefix '{prefix}-' already exist, use --clear or --prefix"
+            )
+
+        coins = self.load_coins(options["coins_file"])
+        user_ids = self.timed(
+            "users and wallets",
+            self.create_users,
+            options["users"],
+            prefix,
+            options["password"],
+        )
+        self.timed(
+            "assets",
+            self.create_assets,
+            user_ids,
+            coins,
+            min(options["assets"], len(coins)),
+        )
+        self.timed(
+            "transactions",
+            self.create_transactions,
+            user_ids,
+            coins,
+            options["transactions"],
+            options["days"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s")
+        )
+
+    def timed(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        count = len(result) if isinstance(result, list) else result
+        self.stdout.write(
+            f"{label}: {count} rows in {elapsed:.1f}s ({count / elapsed:.0f} rows/sec)"
+        )
+        return result
+
+    def load_coins(self, coins_file):
+        if not Coin.objects.filter(is_active=True).exists():
+            call_command("import_coins", coins_file, bulk=True, stdout=self.stdout)
+        coins = list(
+            Coin.objects.filter(is_active=True, current_price__gt=0)
+            .order_by("market_cap_rank")
+            .only("id", "current_price", "market_cap_rank")
+        )
+        if not coins:
+            raise CommandError("No active coins with a price to trade")
+
+        # محبوبیت رمزارزها تقریباً از قانون Zipf پیروی می‌کند: وزن ~ 1 / رتبه
+        self.coin_weights = list(
+            accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(coins)))
+        )
+        return coins
+
+    def pick_coins(self, coins, count):
+        picked = {}
+        while len(picked) < count:
+            coin = self.random.choices(coins, cum_weights=self.coin_weights)[0]
+            picked[coin.pk] = coin
+        return list(picked.values())
+
+    def money(self, median):
+        # مبالغ معاملات و موجودی‌ها توزیع log-normal دارند (تعداد زیادی کوچک، چند بزرگ)
+        return self.random.lognormvariate(0, 1.2) * median
+
+    def create_users(self, count, prefix, password):
+        # هش رمز یک بار محاسبه می‌شود؛ create_user برای هر کاربر دوباره هش می‌کند
+        password_hash = make_password(password)
+        users = (
+            CustomUser(username=f"{prefix}-{i}", password=password_hash)
+            for i in range(count)
+        )
+        for batch in batched(users, self.batch_size):
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(batch)
+
+        user_ids = list(
+            CustomUser.objects.filter(username__startswith=f"{prefix}-")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        wallets = (
+            Wallet(
+                user_id=user_id,
+                balance=Decimal(f"{self.money(50_000_000):.4f}"),
+            )
+            for user_id in user_ids
+        )
+        for batch in batched(wallets, self.batch_size):
+            with transaction.atomic():
+                Wallet.objects.bulk_create(batch)
+        return user_ids
+
+    def create_assets(self, user_ids, coins, per_user):
+        def assets():
+            for user_id in user_ids:
+                for coin in self.pick_coins(coins, per_user):
+                    amount = self.money(5_000_000) / float(coin.current_price)
+                    yield Asset(
+                        user_id=user_id,
+                        coin_id=coin.pk,
+                        amount=Decimal(f"{amount:.8f}") or Decimal("0.00000001"),
+                    )
+
+        count = 0
+        for batch in batched(assets(), self.batch_size):
+            with transaction.atomic():
+                Asset.objects.bulk_create(batch)
+            count += len(batch)
+        return count
+
+    def create_transactions(self, user_ids, coins, per_user, days):
+        now = timezone.now()
+        span = days * 24 * 3600
+
+        def transactions():
+            for user_id in user_ids:
+                offsets = sorted(self.random.random() * span for _ in range(per_user))
+                picked = self.random.choices(
+                    coins, cum_weights=self.coin_weights, k=per_user
+                )
+                for offset, coin in zip(offsets, picked):
+                    yield Transaction(
+                        user_id=user_id,
+                        transaction_type=(
+                            "buy" if self.random.random() < 0.6 else "sell"
+                        ),
+                        coin_id=coin.pk,
+                        total_value=Decimal(f"{self.money(2_000_000):.8f}"),
+                        timestamp=now - timedelta(seconds=offset),
+                    )
+
+        # bulk_create مقدار timestamp را با auto_now_add به زمان فعلی عوض می‌کند؛
+        # زمان‌های پخش‌شده بعد از درج در همان تراکنش با یک UPDATE به ازای هر ردیف
+        # نوشته می‌شوند (bulk_update برای این حجم چند برابر کندتر است)
+        field = Transaction._meta.get_field("timestamp")
+        update = "UPDATE {table} SET {column} = %s WHERE {pk} = %s".format(
+            table=connection.ops.quote_name(Transaction._meta.db_table),
+            column=connection.ops.quote_name(field.column),
+            pk=connection.ops.quote_name(Transaction._meta.pk.column),
+        )
+        count = 0
+        for batch in batched(transactions(), self.batch_size):
+            timestamps = [
+                field.get_db_prep_value(row.timestamp, connection) for row in batch
+            ]
+            with transaction.atomic():
+                Transaction.objects.bulk_create(batch)
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        update, [(ts, row.pk) for ts, row in zip(timestamps, batch)]
+                    )
+            count += len(batch)
+        return count
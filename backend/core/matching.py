@@ -0,0 +1,241 @@
+"""
+موتور تطبیق سفارش‌های محدود (LimitOrder).
+
+برای هر رمزارز دو heap در حافظه نگه داشته می‌شود: خریدها به ترتیب نزولی
+قیمت و فروش‌ها به ترتیب صعودی (در قیمت برابر، سفارش قدیمی‌تر اول). خرید
+وقتی قیمت به حد آن یا پایین‌تر برسد و فروش وقتی به حد آن یا بالاتر برسد پر
+می‌شود؛ پس با هر قیمت تازه فقط سفارش‌هایی از سر heap برداشته می‌شوند که
+قیمت از آن‌ها گذشته است (O(k log n) برای k سفارش پرشده) و به بقیه دست
+زده نمی‌شود.
+
+MatchingEngine به on_flush فید قیمت (PriceFeedWorker) وصل می‌شود و دیتابیس
+منبع اصلی سفارش‌هاست:
+
+- هنگام شروع recover() همه سفارش‌های باز را از دیتابیس می‌خواند؛
+- در هر flush سفارش‌های تازه (id بزرگ‌تر از آخرین id دیده‌شده چند ثانیه
+  پیش، تا سفارشی که دیرتر commit شده جا نماند) اضافه می‌شوند و اگر قیمت
+  فعلی از آن‌ها گذشته باشد همان‌جا پر می‌شوند؛
+- در همان sync سفارش‌های تازه لغوشده (با همان همپوشانی زمانی) از دفتر
+  کنار گذاشته می‌شوند. حذف از heap تنبل است: وقتی به سر heap برسند دور
+  ریخته می‌شوند و اگر بیش از نیمی از heapهای یک رمزارز لغوشده باشد heap از
+  نو ساخته می‌شود. سفارشی که بین دو sync لغو شود و قیمت به آن برسد را
+  fill_limit_orders کنار می‌گذارد.
+
+سفارش‌های هر رمزارز با trading.fill_limit_orders در یک تراکنش پر می‌شوند.
+اگر دیتابیس قفل باشد یا پر کردن سفارش‌های یک رمزارز خطای دیگری بدهد (که در
+log ثبت می‌شود) سفارش‌ها به heap برمی‌گردند و در flush بعدی دوباره امتحان
+می‌شوند؛ خطای یک رمزارز جلوی بقیه رمزارزها و flush فید قیمت را نمی‌گیرد.
+فقط یک فید قیمت باید موتور تطبیق را اجرا کند.
+"""
+
+import heapq
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.db import OperationalError
+from django.utils import timezone
+
+from .models import Coin, LimitOrder
+from .trading import fill_limit_orders
+
+logger = logging.getLogger(__name__)
+
+
+class OrderBook:
+    """سفارش‌های باز یک رمزارز."""
+
+    def __init__(self):
+        # (-price, id) برای خرید و (price, id) برای فروش
+        self.buys = []
+        self.sells = []
+        # idهای لغوشده‌ای که هنوز در heapها هستند
+        self.cancelled = set()
+
+    def __len__(self):
+        return len(self.buys) + len(self.sells) - len(self.cancelled)
+
+    def add(self, order_id, side, price):
+        if side == "buy":
+            heapq.heappush(self.buys, (-price, order_id))
+        else:
+            heapq.heappush(self.sells, (price, order_id))
+
+    def extend(self, orders):
+        """چند سفارش (id, side, price) با یک heapify به جای push تک‌تک."""
+        for order_id, side, price in orders:
+            if side == "buy":
+                self.buys.append((-price, order_id))
+            else:
+                self.sells.append((price, order_id))
+        heapq.heapify(self.buys)
+        heapq.heapify(self.sells)
+
+    def discard(self, order_ids):
+        """سفارش‌های لغوشده این دفتر را کنار می‌گذارد."""
+        self.cancelled.update(order_ids)
+        if len(self.cancelled) > len(self):
+            cancelled = self.cancelled
+            self.buys = [entry for entry in self.buys if entry[1] not in cancelled]
+            self.sells = [entry for entry in self.sells if entry[1] not in cancelled]
+            heapq.heapify(self.buys)
+            heapq.heapify(self.sells)
+            self.cancelled = set()
+
+    def crossed(self, price):
+        """سفارش‌هایی که price از حدشان گذشته، به صورت (id, side, price)، از heap برداشته می‌شوند."""
+        orders = []
+        buys, sells, cancelled = self.buys, self.sells, self.cancelled
+        while buys and -buys[0][0] >= price:
+            limit, order_id = heapq.heappop(buys)
+            if order_id in cancelled:
+                cancelled.discard(order_id)
+            else:
+                orders.append((order_id, "buy", -limit))
+        while sells and sells[0][0] <= price:
+            limit, order_id = heapq.heappop(sells)
+            if order_id in cancelled:
+                cancelled.discard(order_id)
+            else:
+                orders.append((order_id, "sell", limit))
+        return orders
+
+
+class MatchingEngine:
+    def __init__(self, sync_overlap=30.0):
+        # سفارش‌هایی که تا sync_overlap ثانیه بعد از گرفتن id commit شوند پیدا می‌شوند
+        self.sync_overlap = sync_overlap
+        self.books = defaultdict(OrderBook)
+        self.prices = {}
+        self.last_id = 0
+        self._known = set()
+        self._marks = deque()
+        self._synced_at = None
+        self.stats = {"fills": 0, "skipped": 0, "retries": 0, "errors": 0}
+
+    def __call__(self, coins):
+        self.on_prices(
+            {
+                coin.pk: coin.current_price
+                for coin in coins
+                if getattr(coin, "current_price", None) is not None
+            }
+        )
+
+    def __len__(self):
+        return len(self._known)
+
+    def recover(self):
+        """heapها را از سفارش‌های باز دیتابیس از نو می‌سازد (مثلاً بعد از restart)."""
+        self.books = defaultdict(OrderBook)
+        self.last_id = 0
+        self._known = set()
+        self._marks = deque()
+        self._synced_at = timezone.now()
+        return self._load(LimitOrder.objects.filter(status="open"))
+
+    def sync(self):
+        """
+        سفارش‌های باز تازه را اضافه و لغوشده‌های تازه را کنار می‌گذارد؛
+        رمزارزهای سفارش‌های تازه را برمی‌گرداند.
+        """
+        now = time.monotonic()
+        self._marks.append((now, self.last_id))
+        while len(self._marks) > 1 and self._marks[1][0] <= now - self.sync_overlap:
+            self._marks.popleft()
+        floor = self._marks[0][1]
+        coin_ids = self._load(LimitOrder.objects.filter(status="open", id__gt=floor))
+        self._drop_cancelled()
+        return coin_ids
+
+    def _drop_cancelled(self):
+        synced_at, self._synced_at = self._synced_at, timezone.now()
+        if synced_at is None:
+            return
+        # closed_at قبل از commit لغو گرفته می‌شود؛ همان همپوشانی سفارش‌های تازه
+        since = synced_at - timedelta(seconds=self.sync_overlap)
+        cancelled = defaultdict(set)
+        rows = LimitOrder.objects.filter(
+            status="cancelled", closed_at__gte=since
+        ).values_list("id", "coin_id")
+        for order_id, coin_id in rows:
+            if order_id in self._known:
+                self._known.discard(order_id)
+                cancelled[coin_id].add(order_id)
+        for coin_id, order_ids in cancelled.items():
+            self.books[coin_id].discard(order_ids)
+
+    def _load(self, queryset):
+        orders = defaultdict(list)
+        rows = (
+            queryset.order_by("id")
+            .values_list("id", "coin_id", "side", "price")
+            .iterator(chunk_size=5000)
+        )
+        for order_id, coin_id, side, price in rows:
+            if order_id in self._known:
+                continue
+            self._known.add(order_id)
+            orders[coin_id].append((order_id, side, price))
+            self.last_id = max(self.last_id, order_id)
+
+        for coin_id, entries in orders.items():
+            book = self.books[coin_id]
+            if len(entries) > len(book):
+                book.extend(entries)
+            else:
+                for entry in entries:
+                    book.add(*entry)
+
+        missing = [coin_id for coin_id in orders if coin_id not in self.prices]
+        if missing:
+            self.prices.update(
+                Coin.objects.filter(pk__in=missing).values_list("pk", "current_price")
+            )
+        return set(orders)
+
+    def on_prices(self, prices):
+        """prices: coin_id -> قیمت تازه. سفارش‌هایی که قیمت از آن‌ها گذشته پر می‌شوند."""
+        self.prices.update(prices)
+        for coin_id in set(prices) | self.sync():
+            self.match(coin_id)
+
+    def match(self, coin_id):
+        """سفارش‌های رمزارز را با آخرین قیمت آن تطبیق می‌دهد و پرشده‌ها را برمی‌گرداند."""
+        book = self.books.get(coin_id)
+        price = self.prices.get(coin_id)
+        if not book or price is None:
+            return []
+        crossed = book.crossed(price)
+        if not crossed:
+            return []
+        try:
+            filled = fill_limit_orders(
+                coin_id, price, [order_id for order_id, _, _ in crossed]
+            )
+        except OperationalError:
+            # دیتابیس قفل است؛ همه در flush بعدی دوباره امتحان می‌شوند
+            self.stats["retries"] += 1
+            for entry in crossed:
+                book.add(*entry)
+            return []
+        except Exception:
+            # خطای یک رمزارز نباید flush فید قیمت و بقیه رمزارزها را متوقف کند
+            logger.exception(
+                "Filling %d limit order(s) of coin %s at %s failed",
+                len(crossed),
+                coin_id,
+                price,
+            )
+            self.stats["errors"] += 1
+            for entry in crossed:
+                book.add(*entry)
+            return []
+
+        for order_id, _, _ in crossed:
+            self._known.discard(order_id)
+        self.stats["fills"] += len(filled)
+        # لغوشده‌ها
+        self.stats["skipped"] += len(crossed) - len(filled)
+        return filled
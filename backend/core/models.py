@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
@@ -5,8 +6,11 @@ from django.contrib.auth.models import (
 )
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Coalesce
 from decimal import Decimal
 
+from .fields import amount_field, fixed_value
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, username, password=None, **extra_fields):
@@ -63,23 +67,166 @@ class Coin(models.Model):
     atl = models.DecimalField(max_digits=20, decimal_places=4)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # لیست رمزارزها: فقط فعال‌ها به ترتیب رتبه. جنگو is_active=True را
+        # `WHERE is_active` می‌نویسد که SQLite با ستون index تطبیقش نمی‌دهد؛
+        # index جزئی روی هر دو دیتابیس استفاده می‌شود
+        indexes = [
+            models.Index(
+                fields=["market_cap_rank"],
+                condition=models.Q(is_active=True),
+                name="coin_active_rank_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.symbol})"
 
 
+class PriceTick(models.Model):
+    """
+    قیمت یک رمزارز در یک flush فید قیمت. فقط PRICE_HISTORY_RETENTION_DAYS
+    نگه داشته می‌شود؛ نمودارها از PriceCandle خوانده می‌شوند.
+    """
+
+    coin = models.ForeignKey(Coin, on_delete=models.CASCADE, related_name="+")
+    timestamp = models.DateTimeField()
+    price = models.DecimalField(max_digits=20, decimal_places=4)
+
+    class Meta:
+        indexes = [
+            # حذف ردیف‌های قدیمی بر اساس زمان
+            models.Index(fields=["timestamp"], name="pricetick_time_idx"),
+        ]
+
+
+class PriceCandle(models.Model):
+    """کندل OHLC یک رمزارز در یک بازه (bucket شروع بازه است)."""
+
+    RESOLUTION_CHOICES = [("1m", "1 minute"), ("1h", "1 hour"), ("1d", "1 day")]
+
+    coin = models.ForeignKey(
+        Coin, on_delete=models.CASCADE, related_name="price_candles"
+    )
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()
+    open = models.DecimalField(max_digits=20, decimal_places=4)
+    high = models.DecimalField(max_digits=20, decimal_places=4)
+    low = models.DecimalField(max_digits=20, decimal_places=4)
+    close = models.DecimalField(max_digits=20, decimal_places=4)
+
+    class Meta:
+        constraints = [
+            # هدف upsert ثبت کندل‌ها و index نمودار (coin، resolution، بازه زمانی)
+            models.UniqueConstraint(
+                fields=["coin", "resolution", "bucket"], name="pricecandle_bucket_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["resolution", "bucket"], name="pricecandle_res_bucket_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.coin_id} {self.resolution} {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class CacheVersion(models.Model):
+    """
+    شمارنده نسخه کش‌ها (کاتالوگ، قیمت هر رمزارز، پرتفوی هر کاربر) که همه
+    processها می‌بینند؛ core.cache.VersionStore را ببینید.
+    """
+
+    name = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}={self.version}"
+
+
+class WalletQuerySet(models.QuerySet):
+    def with_current_balance(self):
+        """
+        موجودی واقعی هر کیف پول (snapshot به علاوه ورودی‌های فشرده‌نشده دفتر)
+        را با یک subquery در همان کوئری اضافه می‌کند.
+        """
+        pending = (
+            WalletLedgerEntry.objects.filter(
+                wallet=models.OuterRef("pk"), id__gt=models.OuterRef("ledger_offset")
+            )
+            .order_by()
+            .values("wallet")
+            .annotate(total=models.Sum("amount"))
+            .values("total")
+        )
+        return self.annotate(
+            current_balance=models.ExpressionWrapper(
+                models.F("balance")
+                + Coalesce(
+                    models.Subquery(pending),
+                    fixed_value(WalletLedgerEntry, "amount", Decimal("0")),
+                ),
+                output_field=self.model._meta.get_field("balance"),
+            )
+        )
+
+
 class Wallet(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
-    balance = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    # در حالت دفتر (WALLET_LEDGER) این مقدار snapshot آخرین فشرده‌سازی است
+    balance = amount_field(max_digits=20, decimal_places=4, default=0)
+    # id آخرین ورودی دفتر که در balance جمع شده است
+    ledger_offset = models.BigIntegerField(default=0)
+
+    objects = WalletQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.user.username}'s Wallet: {self.balance} USD"
 
+    def get_current_balance(self):
+        """موجودی واقعی؛ از annotate با with_current_balance یا با یک کوئری."""
+        if hasattr(self, "current_balance"):
+            return self.current_balance
+        if not getattr(settings, "WALLET_LEDGER", False):
+            return self.balance
+        pending = self.ledger_entries.filter(id__gt=self.ledger_offset).aggregate(
+            total=models.Sum("amount")
+        )["total"]
+        return self.balance + (pending or Decimal("0"))
+
+
+class WalletLedgerEntry(models.Model):
+    """
+    تغییر موجودی کیف پول به صورت append-only. ورودی‌ها هیچ‌وقت ویرایش
+    نمی‌شوند و دستور compact_wallets آن‌ها را در Wallet.balance جمع می‌کند.
+    """
+
+    wallet = models.ForeignKey(
+        Wallet, on_delete=models.CASCADE, related_name="ledger_entries"
+    )
+    amount = amount_field(max_digits=20, decimal_places=4)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["wallet", "id"], name="ledger_wallet_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet_id}: {self.amount}"
+
 
 class Announcement(models.Model):
     title = models.CharField(max_length=255)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at"], name="announcement_created_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -90,6 +237,15 @@ class ContactMessage(models.Model):
     stars = models.PositiveSmallIntegerField()  # مثلاً از ۱ تا ۵
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # لیست ادمین (همه پیام‌ها) و لیست هر کاربر، هر دو جدیدترین اول
+        indexes = [
+            models.Index(fields=["-created_at"], name="contact_created_idx"),
+            models.Index(
+                fields=["user", "-created_at"], name="contact_user_created_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} ({self.stars}⭐)"
 
@@ -99,7 +255,7 @@ class Asset(models.Model):
         CustomUser, on_delete=models.CASCADE, related_name="assets"
     )
     coin = models.ForeignKey(Coin, on_delete=models.CASCADE)
-    amount = models.DecimalField(max_digits=20, decimal_places=8)
+    amount = amount_field(max_digits=20, decimal_places=8)
 
     class Meta:
         unique_together = ("user", "coin")
@@ -119,12 +275,84 @@ class Transaction(models.Model):
     )
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     coin = models.ForeignKey("Coin", on_delete=models.CASCADE)
-    total_value = models.DecimalField(
+    total_value = amount_field(
         max_digits=30,
         decimal_places=8,
         help_text="مجموع پول جابجا شده",
     )
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # صفحه‌بندی keyset تاریخچه روی (timestamp, id) هر کاربر
+        indexes = [
+            models.Index(
+                fields=["user", "-timestamp", "-id"], name="transaction_user_time_idx"
+            ),
+            models.Index(
+                fields=["user", "coin", "-timestamp", "-id"],
+                name="transaction_user_coin_idx",
+            ),
+            models.Index(
+                fields=["user", "transaction_type", "-timestamp", "-id"],
+                name="transaction_user_type_idx",
+            ),
+            # خروجی کامل ادمین بدون مرتب‌سازی جدا و از همان ردیف اول جریان پیدا می‌کند
+            models.Index(fields=["timestamp", "id"], name="transaction_time_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - {self.coin.symbol} - {self.total_value}"
+
+
+class LimitOrder(models.Model):
+    """
+    سفارش محدود خرید یا فروش. هنگام ثبت، پول (خرید) یا رمزارز (فروش) از
+    موجودی کاربر برداشته و در reserved نگه داشته می‌شود؛ لغو آن را برمی‌گرداند
+    و پر شدن با موتور تطبیق (core/matching.py) انجام می‌شود.
+    """
+
+    SIDE_CHOICES = Transaction.TRANSACTION_TYPES
+    STATUS_CHOICES = [
+        ("open", "باز"),
+        ("filled", "انجام شده"),
+        ("cancelled", "لغو شده"),
+    ]
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="limit_orders"
+    )
+    coin = models.ForeignKey(Coin, on_delete=models.CASCADE, related_name="+")
+    side = models.CharField(max_length=4, choices=SIDE_CHOICES)
+    # خرید وقتی قیمت به price یا پایین‌تر برسد و فروش وقتی به price یا بالاتر
+    price = models.DecimalField(max_digits=20, decimal_places=4)
+    amount = amount_field(max_digits=20, decimal_places=8)
+    # خرید: پول کسرشده از کیف پول (price * amount)، فروش: رمزارز کسرشده از دارایی
+    reserved = amount_field(max_digits=30, decimal_places=8)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="open")
+    fill_price = models.DecimalField(
+        max_digits=20, decimal_places=4, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="limitorder_user_time_idx"
+            ),
+            # بازسازی دفتر سفارش‌ها بعد از restart فقط سفارش‌های باز را می‌خواند
+            models.Index(
+                fields=["coin", "side", "price"],
+                condition=models.Q(status="open"),
+                name="limitorder_open_idx",
+            ),
+            # موتور تطبیق در هر flush لغوهای تازه را می‌خواند
+            models.Index(
+                fields=["closed_at"],
+                condition=models.Q(status="cancelled"),
+                name="limitorder_cancelled_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.side} {self.amount} {self.coin_id} @ {self.price} ({self.status})"
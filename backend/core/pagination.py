@@ -0,0 +1,124 @@
+"""
+صفحه‌بندی keyset (cursor) برای لیست‌های زمانی مثل تاریخچه تراکنش‌ها.
+
+به جای OFFSET، هر صفحه از آخرین (timestamp, id) صفحه قبل ادامه پیدا می‌کند؛
+با index مناسب روی (user, -timestamp, -id) زمان گرفتن هر صفحه به عمق آن
+بستگی ندارد.
+
+لیست‌های ادمین (کاربران، کیف پول‌ها، دارایی‌ها و پیام‌ها) صفحه‌بندی شماره‌ای
+با AdminPagination دارند تا پنل بتواند به هر صفحه برود و تعداد کل را ببیند.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    # ستون زمانی و ستون یکتای جداکننده رکوردهای هم‌زمان؛ ترتیب همیشه نزولی است
+    ordering = ("timestamp", "id")
+    invalid_cursor_message = "cursor نامعتبر است."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field, tiebreaker = self.ordering
+
+        queryset = queryset.order_by(f"-{field}", f"-{tiebreaker}")
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            # شرط اول کران بازه index است و شرط دوم رکوردهای هم‌زمان را جدا می‌کند
+            queryset = queryset.filter(
+                Q(**{f"{field}__lte": value}),
+                Q(**{f"{field}__lt": value}) | Q(**{f"{tiebreaker}__lt": pk}),
+            )
+
+        # یک ردیف اضافه خوانده می‌شود تا بدون COUNT معلوم شود صفحه بعد هست یا نه
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            value, pk = raw.rsplit("|", 1)
+            return datetime.fromisoformat(value), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row):
+        field, tiebreaker = self.ordering
+        # ردیف می‌تواند نمونه مدل یا dict ردیف values() باشد
+        get = row.__getitem__ if isinstance(row, dict) else row.__getattribute__
+        raw = f"{get(field).isoformat()}|{get(tiebreaker)}"
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class LimitOrderPagination(KeysetPagination):
+    ordering = ("created_at", "id")
+
+
+class AdminPagination(PageNumberPagination):
+    """?page= و ?page_size= تا سقف ADMIN_MAX_PAGE_SIZE."""
+
+    page_size_query_param = "page_size"
+
+    @property
+    def page_size(self):
+        return getattr(settings, "ADMIN_PAGE_SIZE", 50)
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, "ADMIN_MAX_PAGE_SIZE", 500)
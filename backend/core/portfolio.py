@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Window
+
+from .cache import (
+    CATALOG_VERSION,
+    PORTFOLIO_VERSION,
+    PRICE_LIST_VERSION,
+    price_version_names,
+    versions,
+)
+from .fields import decimal_expression
+from .models import Asset
+
+
+PORTFOLIO_CACHE_KEY = "portfolio:{user_id}"
+
+VALUE_FIELD = DecimalField(max_digits=40, decimal_places=4)
+
+
+def asset_value_expression():
+    return ExpressionWrapper(
+        decimal_expression(Asset, "amount") * F("coin__current_price"),
+        output_field=VALUE_FIELD,
+    )
+
+
+def portfolio_queryset(user):
+    """
+    ارزش هر دارایی و ارزش کل با یک کوئری (تابع پنجره‌ای SUM() OVER ()) در
+    خود دیتابیس محاسبه می‌شود.
+    """
+    value = asset_value_expression()
+    return (
+        Asset.objects.filter(user=user)
+        .values(
+            "coin_id",
+            "amount",
+            coin_symbol=F("coin__symbol"),
+            coin_name=F("coin__name"),
+            image=F("coin__image"),
+            current_price=F("coin__current_price"),
+        )
+        .annotate(value=value, total=Window(Sum(value), output_field=VALUE_FIELD))
+        .order_by("-value", "coin_id")
+    )
+
+
+def compute_portfolio(user):
+    rows = list(portfolio_queryset(user))
+
+    total = rows[0]["total"] if rows else Decimal("0")
+    for row in rows:
+        row.pop("total")
+        row["allocation"] = (
+            (row["value"] * 100 / total).quantize(Decimal("0.01"))
+            if total
+            else Decimal("0")
+        )
+
+    return {"total_value": total, "assets": rows}
+
+
+def get_portfolio(user):
+    """
+    پرتفوی کش‌شده کاربر. با تغییر دارایی‌های کاربر یا تغییر قیمت یکی از
+    رمزارزهایی که دارد، نتیجه دوباره محاسبه می‌شود.
+    """
+    key = PORTFOLIO_CACHE_KEY.format(user_id=user.pk)
+    version_name = PORTFOLIO_VERSION.format(user_id=user.pk)
+
+    cached = cache.get(key)
+    if cached is not None:
+        if versions.get_many(cached["versions"]) == cached["versions"]:
+            return cached["data"]
+
+    # نسخه‌ها قبل و بعد از کوئری از دیتابیس خوانده می‌شوند تا تغییر همزمان
+    # (معامله یا قیمت تازه در هر process) باعث کش شدن داده کهنه نشود
+    # قیمت‌ها با PRICE_LIST_VERSION، چون رمزارزهای پرتفوی قبل از کوئری معلوم نیستند
+    guard = [version_name, CATALOG_VERSION, PRICE_LIST_VERSION]
+    before = versions.get_many(guard, fresh=True)
+    data = compute_portfolio(user)
+    coin_ids = [row.pop("coin_id") for row in data["assets"]]
+    after = versions.get_many(guard + price_version_names(coin_ids), fresh=True)
+    if any(after[name] != before[name] for name in guard):
+        return data
+
+    after.pop(CATALOG_VERSION)
+    after.pop(PRICE_LIST_VERSION)
+    cache.set(
+        key,
+        {"versions": after, "data": data},
+        timeout=getattr(settings, "PORTFOLIO_CACHE_TTL", 60),
+    )
+    return data
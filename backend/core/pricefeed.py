@@ -0,0 +1,303 @@
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+from .cache import bump_price_versions
+from .models import Coin
+
+
+PRICE_FIELDS = ("current_price", "market_cap", "total_volume")
+
+PRICE_QUANT = Decimal("0.0001")
+
+BIGINT_MAX = 2**63 - 1
+
+
+def parse_tick(raw):
+    """
+    یک tick را به dict با symbol و فیلدهای قیمت تبدیل می‌کند؛ tick نامعتبر None برمی‌گرداند.
+    """
+    if isinstance(raw, (str, bytes)):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return None
+    if not isinstance(raw, dict) or not raw.get("symbol"):
+        return None
+
+    tick = {"symbol": str(raw["symbol"])}
+    try:
+        if raw.get("current_price") is not None:
+            price = Decimal(str(raw["current_price"])).quantize(PRICE_QUANT)
+            if not price.is_finite() or price < 0 or price.adjusted() >= 16:
+                return None
+            tick["current_price"] = price
+        for field in ("market_cap", "total_volume"):
+            if raw.get(field) is not None:
+                tick[field] = int(raw[field])
+                if not 0 <= tick[field] <= BIGINT_MAX:
+                    return None
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+    return tick if len(tick) > 1 else None
+
+
+class FileTickSource:
+    """
+    tickها را به صورت JSON خط به خط (NDJSON) از فایل یا stdin (مسیر "-") می‌خواند.
+    با follow=True مثل tail -f منتظر خطوط جدید می‌ماند.
+    """
+
+    def __init__(self, path, follow=False, poll_interval=0.2):
+        self.path = path
+        self.follow = follow
+        self.poll_interval = poll_interval
+
+    def __iter__(self):
+        if self.path == "-":
+            yield from sys.stdin
+            return
+
+        with open(self.path, "r") as file:
+            while True:
+                line = file.readline()
+                if line:
+                    yield line
+                elif self.follow:
+                    time.sleep(self.poll_interval)
+                else:
+                    return
+
+
+class SocketTickSource:
+    """
+    به یک سوکت TCP وصل می‌شود و tickها را به صورت NDJSON می‌خواند
+    (مثلاً یک `nc -lk 9000` به عنوان جایگزین محلی صرافی).
+    """
+
+    def __init__(self, host="127.0.0.1", port=9000):
+        self.host = host
+        self.port = port
+
+    def __iter__(self):
+        with socket.create_connection((self.host, self.port)) as conn:
+            with conn.makefile("r", encoding="utf-8") as stream:
+                yield from stream
+
+
+class ReplayTickSource:
+    """
+    قیمت‌های data/coins.json را با نوسان تصادفی (jitter) بازپخش می‌کند.
+    rate تعداد tick در ثانیه است و 0 یعنی بدون محدودیت.
+    """
+
+    def __init__(self, path=None, jitter=0.01, rate=0, seed=None):
+        self.path = path or Path(settings.BASE_DIR) / "data" / "coins.json"
+        self.jitter = jitter
+        self.rate = rate
+        self.random = random.Random(seed)
+
+    def __iter__(self):
+        with open(self.path, "r") as file:
+            coins = json.load(file)
+        base = {
+            coin["symbol"]: (
+                float(coin["current_price"]),
+                coin["market_cap"],
+                coin["total_volume"],
+            )
+            for coin in coins
+        }
+        prices = {symbol: values[0] for symbol, values in base.items()}
+        symbols = list(base)
+        delay = 1 / self.rate if self.rate else 0
+
+        while True:
+            symbol = self.random.choice(symbols)
+            base_price, market_cap, total_volume = base[symbol]
+            price = prices[symbol] * (1 + self.random.uniform(-self.jitter, self.jitter))
+            prices[symbol] = price
+            ratio = price / base_price if base_price else 1
+            volume_factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+            yield {
+                "symbol": symbol,
+                "current_price": round(price, 4),
+                "market_cap": int(market_cap * ratio),
+                "total_volume": int(total_volume * volume_factor),
+            }
+            if delay:
+                time.sleep(delay)
+
+
+class PriceFeedWorker:
+    """
+    tickها را از source می‌خواند، آخرین مقدار هر symbol را نگه می‌دارد و در هر
+    flush همه را با یک bulk UPDATE در دیتابیس می‌نویسد.
+
+    هر batch در تراکنش کوتاه جداگانه نوشته می‌شود و بین batchها مکث کوتاهی
+    هست تا قفل نوشتن SQLite برای endpointهای خرید و فروش آزاد شود.
+    """
+
+    def __init__(
+        self,
+        source,
+        flush_interval=1.0,
+        batch_size=200,
+        batch_pause=0.005,
+        on_flush=None,
+        on_report=None,
+    ):
+        self.source = source
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.on_flush = on_flush
+        self.on_report = on_report
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._source_done = threading.Event()
+        self._source_error = None
+        self._coin_ids = {}
+
+        self.stats = {
+            "ticks": 0,
+            "invalid": 0,
+            "flushes": 0,
+            "rows": 0,
+            "lock_retries": 0,
+            "flush_seconds": [],
+        }
+
+    def stop(self):
+        self._stop.set()
+
+    def _read_source(self):
+        try:
+            for raw in self.source:
+                if self._stop.is_set():
+                    break
+                tick = parse_tick(raw)
+                with self._lock:
+                    if tick is None:
+                        self.stats["invalid"] += 1
+                        continue
+                    self.stats["ticks"] += 1
+                    self._pending.setdefault(tick["symbol"], {}).update(tick)
+        except Exception as e:
+            self._source_error = e
+        finally:
+            self._source_done.set()
+
+    def run(self, duration=None, report_interval=10.0):
+        reader = threading.Thread(target=self._read_source, daemon=True)
+        reader.start()
+
+        started = time.monotonic()
+        last_report = started
+        last_ticks = 0
+
+        while not self._stop.is_set():
+            finished = self._source_done.wait(self.flush_interval)
+            self.flush()
+
+            now = time.monotonic()
+            if self.on_report and now - last_report >= report_interval:
+                ticks = self.stats["ticks"]
+                self.on_report(self.report(ticks - last_ticks, now - last_report))
+                last_report, last_ticks = now, ticks
+
+            if finished or (duration and now - started >= duration):
+                break
+
+        self.stop()
+        self.flush()
+        if self.on_report:
+            now = time.monotonic()
+            self.on_report(
+                self.report(self.stats["ticks"] - last_ticks, now - last_report)
+            )
+        if self._source_error:
+            raise self._source_error
+
+    def report(self, ticks, seconds):
+        latencies = self.stats["flush_seconds"]
+        report = {
+            "ticks": self.stats["ticks"],
+            "ticks_per_sec": ticks / seconds if seconds else 0,
+            "flushes": self.stats["flushes"],
+            "rows": self.stats["rows"],
+            "invalid": self.stats["invalid"],
+            "lock_retries": self.stats["lock_retries"],
+            "flush_avg_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0,
+            "flush_max_ms": 1000 * max(latencies) if latencies else 0,
+        }
+        self.stats["flush_seconds"] = []
+        return report
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return []
+
+        started = time.perf_counter()
+        self._resolve_ids(pending)
+
+        # tickها را بر اساس فیلدهایشان گروه می‌کنیم چون bulk_update همه فیلدها را می‌نویسد
+        groups = {}
+        for symbol, tick in pending.items():
+            pk = self._coin_ids.get(symbol)
+            if pk is None:
+                continue
+            fields = tuple(field for field in PRICE_FIELDS if field in tick)
+            values = {field: tick[field] for field in fields}
+            groups.setdefault(fields, []).append(Coin(pk=pk, symbol=symbol, **values))
+
+        written = []
+        try:
+            for fields, coins in groups.items():
+                for start in range(0, len(coins), self.batch_size):
+                    batch = coins[start : start + self.batch_size]
+                    # نسخه در همان تراکنش بالا می‌رود تا قفل بودن دیتابیس در آن
+                    # هم مثل خود UPDATE به flush بعدی برسد، نه اینکه worker را بکشد
+                    with transaction.atomic():
+                        Coin.objects.bulk_update(batch, fields)
+                        bump_price_versions([coin.pk for coin in batch])
+                    written.extend(batch)
+                    if self.batch_pause:
+                        time.sleep(self.batch_pause)
+        except OperationalError:
+            # دیتابیس قفل است؛ tickهای نوشته‌نشده را برای flush بعدی برمی‌گردانیم
+            self.stats["lock_retries"] += 1
+            done = {coin.symbol for coin in written}
+            with self._lock:
+                for symbol, tick in pending.items():
+                    if symbol not in done:
+                        newer = self._pending.get(symbol, {})
+                        self._pending[symbol] = {**tick, **newer}
+
+        self.stats["flushes"] += 1
+        self.stats["rows"] += len(written)
+        self.stats["flush_seconds"].append(time.perf_counter() - started)
+
+        if written and self.on_flush:
+            self.on_flush(written)
+        return written
+
+    def _resolve_ids(self, pending):
+        missing = [symbol for symbol in pending if symbol not in self._coin_ids]
+        if missing:
+            self._coin_ids.update(
+                Coin.objects.filter(symbol__in=missing).values_list("symbol", "pk")
+            )
@@ -0,0 +1,336 @@
+"""
+تاریخچه قیمت رمزارزها: tickهای خام (PriceTick) و کندل‌های OHLC در سه سطح
+1m، 1h و 1d (PriceCandle).
+
+PriceHistoryRecorder به on_flush فید قیمت (PriceFeedWorker) وصل می‌شود و در
+هر flush، در یک تراکنش:
+
+- برای هر رمزارزی که قیمتش عوض شده یک PriceTick می‌نویسد؛
+- کندل باز 1m همان رمزارز را در حافظه به‌روز و با upsert ذخیره می‌کند؛
+- در اولین flush هر دقیقه، کندل 1m همه رمزارزهایی که دقیقه‌شان تمام شده
+  (حتی آن‌هایی که قیمت تازه ندارند) در کندل 1h و کندل 1h در کندل 1d ادغام
+  (rollup) و ذخیره می‌شود؛ پس سطح‌های 1h و 1d حداکثر یک دقیقه عقب‌اند و
+  در هر flush فقط دو ردیف برای هر رمزارز نوشته می‌شود؛
+- اگر قیمت از ath یا atl رمزارز گذشته باشد همان ردیف‌های Coin را به‌روز
+  می‌کند.
+
+فید قیمت tickهای بین دو flush را ادغام می‌کند، پس high و low دقت
+flush_interval را دارند. هر prune_interval ثانیه ردیف‌های قدیمی‌تر از
+PRICE_HISTORY_RETENTION_DAYS حذف می‌شوند تا جدول‌ها بی‌انتها بزرگ نشوند.
+"""
+
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_price_versions
+from .exports import parse_bound
+from .models import Coin, PriceCandle, PriceTick
+
+# از ریز به درشت؛ هر سطح از ادغام سطح قبلی ساخته می‌شود
+RESOLUTIONS = {
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+
+DEFAULT_RETENTION_DAYS = {"tick": 1, "1m": 7, "1h": 365, "1d": None}
+
+# بازه پیش‌فرض نمودار وقتی from داده نشده
+DEFAULT_SPANS = {
+    "1m": timedelta(hours=6),
+    "1h": timedelta(days=7),
+    "1d": timedelta(days=365),
+}
+
+MAX_CANDLES = 1500
+
+
+def get_retention():
+    """مدت نگهداری هر سطح به صورت timedelta؛ None یعنی همیشه."""
+    days = {
+        **DEFAULT_RETENTION_DAYS,
+        **getattr(settings, "PRICE_HISTORY_RETENTION_DAYS", {}),
+    }
+    return {
+        level: None if value is None else timedelta(days=value)
+        for level, value in days.items()
+    }
+
+
+def bucket_start(moment, resolution):
+    """شروع bucket شامل moment به وقت UTC."""
+    moment = moment.astimezone(dt_timezone.utc)
+    if resolution == "1m":
+        return moment.replace(second=0, microsecond=0)
+    if resolution == "1h":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def parse_history_query(params, now=None):
+    """
+    (resolution، شروع، پایان) برای ?interval=&from=&to=. بدون interval
+    ریزترین سطحی انتخاب می‌شود که داده from را هنوز نگه داشته و بیش از
+    MAX_CANDLES کندل نمی‌دهد. مقدار نامعتبر ValidationError می‌دهد.
+    """
+    now = now or timezone.now()
+    interval = params.get("interval")
+    if interval and interval not in RESOLUTIONS:
+        raise ValidationError(
+            {"interval": [f"یکی از {', '.join(RESOLUTIONS)} را انتخاب کنید."]}
+        )
+
+    bounds = {}
+    for name in ("from", "to"):
+        if params.get(name):
+            try:
+                bounds[name] = parse_bound(params[name], end=name == "to")
+            except ValueError:
+                raise ValidationError({name: ["تاریخ نامعتبر است."]})
+    end = bounds.get("to", now)
+
+    if not interval:
+        if "from" not in bounds:
+            interval = "1h"
+        else:
+            retention = get_retention()
+            span = end - bounds["from"]
+            interval = "1d"
+            for resolution, step in RESOLUTIONS.items():
+                kept = retention[resolution]
+                if (kept is None or bounds["from"] >= now - kept) and (
+                    span / step <= MAX_CANDLES
+                ):
+                    interval = resolution
+                    break
+
+    start = bounds.get("from", end - DEFAULT_SPANS[interval])
+    if start >= end:
+        raise ValidationError({"from": ["from باید قبل از to باشد."]})
+    if (end - start) / RESOLUTIONS[interval] > MAX_CANDLES:
+        raise ValidationError(
+            {
+                "interval": [
+                    f"این بازه بیش از {MAX_CANDLES} کندل {interval} دارد؛ "
+                    "interval بزرگ‌تری انتخاب کنید."
+                ]
+            }
+        )
+    return interval, bucket_start(start, interval), end
+
+
+def history_queryset(coin, resolution, start, end):
+    return PriceCandle.objects.filter(
+        coin=coin, resolution=resolution, bucket__gte=start, bucket__lt=end
+    ).order_by("bucket")
+
+
+class PriceHistoryRecorder:
+    """
+    on_flush فید قیمت. وضعیت کندل‌های باز در حافظه همین process است؛ فقط
+    یک فید قیمت باید تاریخچه را بنویسد و هنگام توقف close() را صدا بزند.
+    """
+
+    def __init__(self, prune_interval=60.0):
+        self.prune_interval = prune_interval
+        # (coin_id، resolution) -> [bucket، open، high، low، close]
+        self._candles = {}
+        # coin_id -> [ath، atl]
+        self._extremes = {}
+        self._ticks = []
+        self._dirty = set()
+        self._dirty_extremes = set()
+        # دقیقه‌ای که کندل‌های 1m قبل از آن ادغام شده‌اند
+        self._minute = None
+        self._last_prune = None
+        self.stats = {"ticks": 0, "candles": 0, "extremes": 0, "retries": 0}
+
+    def __call__(self, coins):
+        self.record(coins)
+
+    def record(self, coins, now=None):
+        """coins همان Coinهای نوشته‌شده در flush (فقط pk و فیلدهای قیمت)."""
+        now = now or timezone.now()
+        minute = bucket_start(now, "1m")
+        if minute != self._minute:
+            self._roll_up_finished(minute)
+        prices = {
+            coin.pk: coin.current_price
+            for coin in coins
+            if getattr(coin, "current_price", None) is not None
+        }
+        if prices:
+            self._load(prices, now)
+            for coin_id, price in prices.items():
+                self._update(coin_id, price, now, minute)
+
+        self._write()
+        if (
+            self._last_prune is None
+            or time.monotonic() - self._last_prune >= self.prune_interval
+        ):
+            self.prune(now)
+
+    def close(self):
+        """کندل‌های 1m باز را در 1h و 1d ادغام و همه چیز را ذخیره می‌کند."""
+        for (coin_id, resolution), candle in list(self._candles.items()):
+            # کندل‌های دقیقه‌های قبل در _roll_up_finished ادغام شده‌اند
+            if resolution == "1m" and candle[0] == self._minute:
+                self._roll_up(coin_id, candle)
+        self._write()
+
+    def _roll_up_finished(self, minute):
+        """
+        کندل‌های 1m که از دور قبل باز مانده‌اند و دقیقه‌شان قبل از minute تمام
+        شده در 1h و 1d ادغام می‌شوند. کندل‌های قدیمی‌تر رمزارزهایی که قیمت
+        تازه نداشته‌اند در دور قبل ادغام شده‌اند و دوباره ادغام نمی‌شوند.
+        """
+        for (coin_id, resolution), candle in list(self._candles.items()):
+            if (
+                resolution == "1m"
+                and candle[0] < minute
+                and (self._minute is None or candle[0] >= self._minute)
+            ):
+                self._roll_up(coin_id, candle)
+        self._minute = minute
+
+    def _load(self, prices, now):
+        """
+        اولین بار که رمزارزی دیده می‌شود کندل‌های باز و ath/atl آن از
+        دیتابیس خوانده می‌شود (مثلاً بعد از restart وسط یک بازه).
+        """
+        missing = [coin_id for coin_id in prices if coin_id not in self._extremes]
+        if not missing:
+            return
+        for coin_id, ath, atl in Coin.objects.filter(pk__in=missing).values_list(
+            "pk", "ath", "atl"
+        ):
+            self._extremes[coin_id] = [ath, atl]
+        current = Q()
+        for resolution in RESOLUTIONS:
+            current |= Q(resolution=resolution, bucket=bucket_start(now, resolution))
+        for candle in PriceCandle.objects.filter(current, coin_id__in=missing):
+            self._candles[(candle.coin_id, candle.resolution)] = [
+                candle.bucket,
+                candle.open,
+                candle.high,
+                candle.low,
+                candle.close,
+            ]
+
+    def _update(self, coin_id, price, now, minute):
+        key = (coin_id, "1m")
+        candle = self._candles.get(key)
+        if candle is not None and candle[0] != minute:
+            # در _roll_up_finished ادغام شده است
+            candle = None
+        if candle is None:
+            self._candles[key] = [minute, price, price, price, price]
+        elif price == candle[4]:
+            # قیمت عوض نشده؛ نه tick نه کندل
+            return
+        else:
+            candle[2] = max(candle[2], price)
+            candle[3] = min(candle[3], price)
+            candle[4] = price
+        self._dirty.add(key)
+        self._ticks.append(PriceTick(coin_id=coin_id, timestamp=now, price=price))
+
+        extremes = self._extremes.get(coin_id)
+        if extremes is not None and not extremes[1] <= price <= extremes[0]:
+            extremes[0] = max(extremes[0], price)
+            extremes[1] = min(extremes[1], price)
+            self._dirty_extremes.add(coin_id)
+
+    def _roll_up(self, coin_id, minute_candle):
+        """کندل 1m تمام‌شده را در 1h و نتیجه را در 1d ادغام می‌کند."""
+        child = minute_candle
+        for resolution in ("1h", "1d"):
+            bucket = bucket_start(minute_candle[0], resolution)
+            key = (coin_id, resolution)
+            candle = self._candles.get(key)
+            if candle is None or candle[0] != bucket:
+                candle = self._candles[key] = [bucket, *child[1:]]
+            else:
+                candle[2] = max(candle[2], child[2])
+                candle[3] = min(candle[3], child[3])
+                candle[4] = child[4]
+            self._dirty.add(key)
+            child = candle
+
+    def _write(self):
+        if not (self._ticks or self._dirty or self._dirty_extremes):
+            return
+        candles = []
+        for coin_id, resolution in self._dirty:
+            bucket, open_, high, low, close = self._candles[(coin_id, resolution)]
+            candles.append(
+                PriceCandle(
+                    coin_id=coin_id,
+                    resolution=resolution,
+                    bucket=bucket,
+                    open=open_,
+                    high=high,
+                    low=low,
+                    close=close,
+                )
+            )
+        extremes = [
+            Coin(
+                pk=coin_id,
+                ath=self._extremes[coin_id][0],
+                atl=self._extremes[coin_id][1],
+            )
+            for coin_id in self._dirty_extremes
+        ]
+
+        try:
+            with transaction.atomic():
+                PriceTick.objects.bulk_create(self._ticks, batch_size=500)
+                PriceCandle.objects.bulk_create(
+                    candles,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=["coin", "resolution", "bucket"],
+                    update_fields=["open", "high", "low", "close"],
+                )
+                if extremes:
+                    Coin.objects.bulk_update(extremes, ["ath", "atl"], batch_size=500)
+                    bump_price_versions([coin.pk for coin in extremes])
+        except OperationalError:
+            # دیتابیس قفل است؛ همه چیز در flush بعدی دوباره نوشته می‌شود
+            self.stats["retries"] += 1
+            return
+
+        self.stats["ticks"] += len(self._ticks)
+        self.stats["candles"] += len(candles)
+        self.stats["extremes"] += len(extremes)
+        self._ticks = []
+        self._dirty = set()
+        self._dirty_extremes = set()
+
+    def prune(self, now=None):
+        """ردیف‌های قدیمی‌تر از مدت نگهداری؛ تعداد حذف‌شده‌ها برمی‌گردد."""
+        now = now or timezone.now()
+        self._last_prune = time.monotonic()
+        deleted = 0
+        try:
+            for level, kept in get_retention().items():
+                if kept is None:
+                    continue
+                if level == "tick":
+                    rows = PriceTick.objects.filter(timestamp__lt=now - kept)
+                else:
+                    rows = PriceCandle.objects.filter(
+                        resolution=level, bucket__lt=now - kept
+                    )
+                deleted += rows.delete()[0]
+        except OperationalError:
+            pass
+        return deleted
@@ -0,0 +1,217 @@
+"""
+پخش زنده تغییر قیمت رمزارزها با Server-Sent Events (مسیر /api/prices/stream/).
+
+هر process یک PriceHub دارد که تا وقتی مشترکی هست هر PRICE_STREAM_INTERVAL
+ثانیه یک کوئری روی جدول Coin می‌زند، با آخرین وضعیت مقایسه می‌کند و برای هر
+symbol تغییرکرده دو frame آماده SSE می‌سازد: فقط فیلدهای تغییرکرده و وضعیت
+کامل. encode یک بار برای هر تغییر انجام می‌شود و مشترک‌ها همان bytes را
+می‌گیرند؛ هزینه هر مشترک فقط اضافه کردن یک reference به بافرش است.
+
+بافر هر مشترک dict از symbol به frame است و ادغام می‌شود (conflation): اگر
+مشترک frame قبلی یک symbol را هنوز نخوانده باشد، frame وضعیت کامل جایش را
+می‌گیرد. پس بافر از تعداد symbolهای مشترک بزرگ‌تر نمی‌شود. مشترکی که
+PRICE_STREAM_MAX_LAG ثانیه چیزی نخواند قطع می‌شود؛ EventSource خودش دوباره
+وصل می‌شود و اول snapshot کامل می‌گیرد.
+
+مسیر فقط زیر ASGI (ASYNC_READ_VIEWS) ثبت می‌شود؛ زیر WSGI هر اتصال باز یک
+thread را نگه می‌داشت.
+"""
+
+import asyncio
+import json
+import time
+
+from django.conf import settings
+
+from .models import Coin
+from .pricefeed import PRICE_FIELDS
+from .serializers import CoinSerializer
+
+
+def get_interval():
+    return getattr(settings, "PRICE_STREAM_INTERVAL", 1.0)
+
+
+def get_max_lag():
+    return getattr(settings, "PRICE_STREAM_MAX_LAG", 30.0)
+
+
+def encode_event(event, data):
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    def __init__(self, hub, symbols=None):
+        self.hub = hub
+        # None یعنی همه symbolها
+        self.symbols = symbols
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.last_read = time.monotonic()
+        self.dropped = False
+
+    def offer(self, symbol, delta, full):
+        if symbol in self.pending:
+            self.pending[symbol] = full
+            self.hub.stats["conflated"] += 1
+        else:
+            self.pending[symbol] = delta
+        self.ready.set()
+
+    def drop(self):
+        self.dropped = True
+        self.ready.set()
+
+    def take(self):
+        """همه frameهای منتظر در یک تکه bytes."""
+        chunk = b"".join(self.pending.values())
+        self.pending.clear()
+        self.ready.clear()
+        self.last_read = time.monotonic()
+        return chunk
+
+
+class PriceHub:
+    def __init__(self):
+        self._loop = None
+        self._task = None
+        self._all = set()
+        self._by_symbol = {}
+        self._state = {}
+        self._frames = {}
+        self.stats = {"polls": 0, "changes": 0, "conflated": 0, "dropped": 0}
+
+    @property
+    def subscribers(self):
+        return len(self._all) + len(
+            {sub for subs in self._by_symbol.values() for sub in subs}
+        )
+
+    async def subscribe(self, symbols=None):
+        """
+        مشترک جدید؛ بافرش از قبل snapshot کامل symbolهای درخواستی را دارد.
+        """
+        self._bind_loop()
+        if not self._state:
+            await self.poll()
+
+        subscription = Subscription(self, frozenset(symbols) if symbols else None)
+        if subscription.symbols is None:
+            self._all.add(subscription)
+            snapshot = self._frames
+        else:
+            for symbol in subscription.symbols:
+                self._by_symbol.setdefault(symbol, set()).add(subscription)
+            snapshot = {
+                symbol: frame
+                for symbol, frame in self._frames.items()
+                if symbol in subscription.symbols
+            }
+        subscription.pending.update(snapshot)
+        subscription.ready.set()
+        # بعد از ثبت مشترک؛ وگرنه حلقه poll بدون مشترک بلافاصله تمام می‌شود
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._all.discard(subscription)
+        for symbol in subscription.symbols or ():
+            subs = self._by_symbol.get(symbol)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._by_symbol[symbol]
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # event loop جدید (مثلاً restart سرور یا تست)؛ مشترک‌ها و task
+            # loop قبلی معتبر نیستند
+            self._all.clear()
+            self._by_symbol.clear()
+            self._loop = loop
+            self._task = None
+
+    async def _run(self):
+        while self._all or self._by_symbol:
+            await asyncio.sleep(get_interval())
+            await self.poll()
+        self._task = None
+
+    async def poll(self):
+        """یک کوئری، مقایسه با وضعیت قبلی و پخش تغییرها."""
+        rows = Coin.objects.filter(is_active=True).values("symbol", *PRICE_FIELDS)
+        fields = CoinSerializer().fields
+        changes = {}
+        async for row in rows:
+            symbol = row.pop("symbol")
+            current = {
+                field: fields[field].to_representation(value)
+                for field, value in row.items()
+            }
+            previous = self._state.get(symbol)
+            if previous != current:
+                changed = {
+                    field: value
+                    for field, value in current.items()
+                    if previous is None or previous.get(field) != value
+                }
+                self._state[symbol] = current
+                full = encode_event("price", {"symbol": symbol, **current})
+                self._frames[symbol] = full
+                changes[symbol] = (
+                    encode_event("price", {"symbol": symbol, **changed}),
+                    full,
+                )
+
+        self.stats["polls"] += 1
+        self.stats["changes"] += len(changes)
+        if changes:
+            self.publish(changes)
+
+    def publish(self, changes):
+        now = time.monotonic()
+        max_lag = get_max_lag()
+        targets = {}
+        for subscription in self._all:
+            targets[subscription] = changes.keys()
+        for symbol in changes:
+            for subscription in self._by_symbol.get(symbol, ()):
+                targets.setdefault(subscription, []).append(symbol)
+
+        for subscription, symbols in targets.items():
+            if subscription.pending and now - subscription.last_read > max_lag:
+                self.stats["dropped"] += 1
+                self.unsubscribe(subscription)
+                subscription.drop()
+                continue
+            for symbol in symbols:
+                delta, full = changes[symbol]
+                subscription.offer(symbol, delta, full)
+
+
+price_hub = PriceHub()
+
+
+async def stream_events(symbols=None, heartbeat=15.0):
+    """
+    frameهای SSE برای یک اتصال؛ وقتی اتصال بسته یا مشترک قطع شود تمام می‌شود.
+    """
+    subscription = await price_hub.subscribe(symbols)
+    try:
+        yield f"retry: {int(get_interval() * 3000)}\n\n".encode()
+        while True:
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                # comment خط SSE؛ اتصال‌های مرده را زودتر آشکار می‌کند
+                yield b": ping\n\n"
+                continue
+            if subscription.dropped:
+                yield encode_event("dropped", {"reason": "slow consumer"})
+                return
+            yield subscription.take()
+    finally:
+        price_hub.unsubscribe(subscription)
@@ -0,0 +1,132 @@
+"""
+سقف تعداد کوئری برای هر view و ابزار تشخیص N+1.
+
+هر view می‌تواند با `query_budget` سقف کوئری‌های یک درخواست (شامل کوئری
+احراز هویت) را اعلام کند؛ یک عدد برای همه متدها یا dict بر اساس action در
+viewsetها و متد HTTP در APIViewها:
+
+    class CoinViewSet(viewsets.ModelViewSet):
+        query_budget = {"list": 1, "retrieve": 1}
+
+دستور `manage.py check_query_budgets` همه routeهای core/urls.py را با دو
+حجم داده اجرا می‌کند و هر جا تعداد کوئری از بودجه بیشتر شود یا با زیاد شدن
+ردیف‌ها رشد کند با کد خطا خارج می‌شود؛ همین دستور در CI اجرا می‌شود.
+
+QueryBudgetMiddleware همین بودجه‌ها را روی درخواست‌های واقعی بررسی می‌کند:
+با QUERY_BUDGET_CHECKS=log (پیش‌فرض در DEBUG) هشدار log می‌دهد و با raise
+درخواست را با QueryBudgetExceeded شکست می‌دهد، مثلاً برای load_test روی
+سرور staging.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\s*(?:\?|%s)\s*,?)+\)", re.IGNORECASE)
+_SAVEPOINT_ID = re.compile(r'"s\d+_x\d+"')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_shape(sql):
+    """SQL را بدون مقادیر literal برمی‌گرداند تا کوئری‌های هم‌شکل یکی شوند."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _SAVEPOINT_ID.sub('"?"', shape)
+    return _IN_LIST.sub("IN (...)", shape)
+
+
+def duplicated_shapes(queries):
+    """کوئری‌هایی که با همان شکل بیش از یک بار اجرا شده‌اند (نشانه N+1)."""
+    counts = Counter(sql_shape(query["sql"]) for query in queries)
+    return [(shape, count) for shape, count in counts.most_common() if count > 1]
+
+
+def format_queries(queries):
+    lines = [f"{i}. {query['sql']}" for i, query in enumerate(queries, start=1)]
+    duplicates = duplicated_shapes(queries)
+    if duplicates:
+        lines.append("Duplicated query shapes:")
+        lines.extend(f"  {count}x {shape}" for shape, count in duplicates)
+    return "\n".join(lines)
+
+
+def get_query_budget(view_class, action=None):
+    budget = getattr(view_class, "query_budget", None)
+    if isinstance(budget, dict):
+        return budget.get(action)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    درخواست‌هایی را که از query_budget view خود بیشتر کوئری می‌زنند همراه با
+    کوئری‌های تکراری log می‌کند، یا با QUERY_BUDGET_CHECKS=raise شکست می‌دهد.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, "QUERY_BUDGET_CHECKS", "off")
+        if self.mode not in ("log", "raise"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append({"sql": sql})
+            return execute(sql, params, many, context)
+
+        # همه aliasها، تا کوئری‌های replica (core/routers.py) هم شمرده شوند
+        with ExitStack() as stack:
+            for alias_connection in connections.all():
+                stack.enter_context(alias_connection.execute_wrapper(record))
+            response = self.get_response(request)
+
+        # بودجه برای درخواست موفق تعریف شده؛ مسیرهای خطا مثل رمز اشتباه بررسی نمی‌شوند
+        budget = getattr(request, "_query_budget", None)
+        if budget is not None and response.status_code < 400 and len(queries) > budget:
+            message = (
+                f"{request.method} {request.path} ran {len(queries)} queries, "
+                f"budget is {budget}:\n{format_queries(queries)}"
+            )
+            if self.mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    async def __acall__(self, request):
+        # ORM async کوئری‌ها را در thread دیگری اجرا می‌کند که execute_wrapper این
+        # اتصال به آن نمی‌رسد؛ بودجه‌ها با check_query_budgets روی مسیر همزمان بررسی می‌شوند
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if view_class is None:
+            return None
+        actions = getattr(view_func, "actions", None) or {}
+        method = request.method.lower()
+        request._query_budget = get_query_budget(
+            view_class, actions.get(method, method)
+        )
+        return None
@@ -0,0 +1,58 @@
+"""
+JSONRenderer با orjson (اگر نصب باشد) و همان بایت‌های خروجی DRF.
+
+JSONRenderer پیش‌فرض DRF (UNICODE_JSON و COMPACT_JSON) با json.dumps فشرده و
+بدون escape حروف غیر ASCII می‌نویسد و فقط U+2028 و U+2029 را escape می‌کند؛
+orjson هم فشرده و UTF-8 می‌نویسد، پس با همان escape خروجی یکی است. Decimal و
+datetime به default همان JSONEncoder DRF سپرده می‌شوند. هر جا خروجی ممکن است
+فرق کند (indent، اعداد بزرگ‌تر از ۶۴ بیت، کلید غیر رشته‌ای، تنظیمات غیر
+پیش‌فرض) یا orjson نصب نیست، خود JSONRenderer استفاده می‌شود.
+
+تنها تفاوت‌ها در floatهاست: NaN و Infinity که JSONRenderer با خطا رد می‌کند
+null می‌شوند و توان اعداد خیلی بزرگ یا کوچک بدون + نوشته می‌شود (1e16 به جای
+1e+16). Decimalها در این API همیشه رشته‌اند (COERCE_DECIMAL_TO_STRING).
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def __init__(self):
+        super().__init__()
+        self._default = self.encoder_class().default
+        if orjson is not None:
+            # زیرکلاس‌های dict و list (مثل ReturnDict) مثل json.dumps نوشته می‌شوند
+            self._options = (
+                orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+            )
+
+    def can_use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and not self.ensure_ascii
+            and self.compact
+            and self.strict
+            and self.encoder_class is encoders.JSONEncoder
+            and not self.get_indent(accepted_media_type, renderer_context or {})
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.can_use_orjson(
+            accepted_media_type, renderer_context
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self._default, option=self._options)
+        except orjson.JSONEncodeError:
+            # مثلاً عدد بزرگ‌تر از ۶۴ بیت یا کلید عددی؛ json.dumps درستش را می‌نویسد
+            return super().render(data, accepted_media_type, renderer_context)
+        # همان escape که JSONRenderer برای جاوااسکریپت انجام می‌دهد
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
@@ -0,0 +1,185 @@
+"""
+ارسال خواندن‌های لیست‌های پرخواندنی به replica دیتابیس.
+
+وقتی DATABASES یک alias به نام replica دارد (config/settings.py)،
+ReplicaRoutingMiddleware برای درخواست‌های GET و HEAD به viewهایی که
+`read_replica` دارند کوئری‌های خواندنی را با PrimaryReplicaRouter به replica
+می‌فرستد. مثل query_budget، مقدار True برای همه actionها یا مجموعه‌ای از
+actionها در viewsetها و متدهای HTTP در APIViewها است:
+
+    class CoinViewSet(viewsets.ModelViewSet):
+        read_replica = {"list", "retrieve"}
+
+بقیه کوئری‌ها، همه نوشتن‌ها و هر کوئری داخل تراکنش دیتابیس اصلی از
+دیتابیس اصلی خوانده می‌شوند. replica کمی عقب‌تر از دیتابیس اصلی است، پس
+کاربری که درخواست نوشتن موفق داشته (خرید، سفارش، پیام و ...) تا
+REPLICA_PIN_SECONDS ثانیه به دیتابیس اصلی سنجاق می‌شود تا تغییر خودش را
+ببیند. کاربر درخواست‌های خواندنی از user id توکن JWT پیدا می‌شود. سنجاق در
+cache جنگو است و باید به همه workerها برسد، پس با LocMemCache (بدون
+CACHE_URL) middleware خطای ImproperlyConfigured می‌دهد.
+"""
+
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import CachedJWTAuthentication
+
+REPLICA_DB_ALIAS = "replica"
+PIN_KEY = "db-primary-pin:{user_id}"
+
+# cacheهایی که هر process جدا دارد؛ سنجاق یک worker به worker دیگر نمی‌رسد
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+authentication = CachedJWTAuthentication()
+
+
+class RoutingState:
+    """وضعیت یک درخواست؛ process_view آن را پر می‌کند و router می‌خواند."""
+
+    __slots__ = ("use_replica",)
+
+    def __init__(self):
+        self.use_replica = False
+
+
+# بیرون از درخواست (دستورهای مدیریتی، فید قیمت) None است و همه چیز از دیتابیس اصلی
+_routing = ContextVar("replica_routing", default=None)
+
+
+def replica_enabled():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def shared_cache():
+    """آیا cache پیش‌فرض بین processها مشترک است (لازمه pin_to_primary)."""
+    return settings.CACHES[DEFAULT_CACHE_ALIAS]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+def reads_from_replica(view_func, method):
+    """آیا view (همان ورودی process_view) برای method از replica می‌خواند."""
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return getattr(view_func, "read_replica", False)
+    read_replica = getattr(view_class, "read_replica", False)
+    if isinstance(read_replica, bool):
+        return read_replica
+    actions = getattr(view_func, "actions", None) or {}
+    return actions.get(method, method) in read_replica
+
+
+def pin_to_primary(user_id):
+    cache.set(
+        PIN_KEY.format(user_id=user_id),
+        True,
+        timeout=getattr(settings, "REPLICA_PIN_SECONDS", 10),
+    )
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id=user_id), False)
+
+
+def token_user_id(request):
+    """user id توکن JWT درخواست یا None؛ توکن نامعتبر را خود view رد می‌کند."""
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    try:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return authentication.get_validated_token(raw_token).get(
+            api_settings.USER_ID_CLAIM
+        )
+    except AuthenticationFailed:
+        return None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or not routing.use_replica:
+            return None
+        # داخل تراکنش باید همان داده‌ای خوانده شود که نوشته می‌شود
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # نمونه‌ای که از replica خوانده شده هم در دیتابیس اصلی ذخیره می‌شود
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_enabled():
+            raise MiddlewareNotUsed
+        if not shared_cache():
+            raise ImproperlyConfigured(
+                "The replica database needs a shared cache for read-your-writes "
+                "pins; set CACHE_URL (redis:// or file://)"
+            )
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(RoutingState())
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        self.pin_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _routing.set(RoutingState())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        self.pin_writer(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # زیر ASGI این متد در thread دیگری اجرا می‌شود؛ خود RoutingState تغییر
+        # می‌کند (نه مقدار ContextVar) تا به view هم برسد
+        routing = _routing.get()
+        if (
+            routing is not None
+            and request.method in SAFE_METHODS
+            and reads_from_replica(view_func, request.method.lower())
+        ):
+            user_id = token_user_id(request)
+            routing.use_replica = user_id is None or not is_pinned(user_id)
+        return None
+
+    def pin_writer(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        # viewهای DRF کاربر احراز هویت شده با JWT را روی همین request می‌گذارند
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
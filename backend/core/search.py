@@ -0,0 +1,316 @@
+"""
+جستجو، فیلتر بازه‌ای و مرتب‌سازی لیست رمزارزها در حافظه (GET /api/coins/).
+
+index از روی همان خروجی serialize شده لیست رمزارزها (coin_catalog) ساخته
+می‌شود و با تغییر نسخه کاتالوگ همراه بقیه cache دور ریخته می‌شود؛ پس هیچ
+درخواست جستجویی به دیتابیس نمی‌رود و پاسخ‌ها همان dictهای لیست کامل‌اند.
+
+?search= روی symbol و name بدون حساسیت به حروف بزرگ و کوچک است. ترتیب نتایج:
+symbol برابر، شروع symbol، شروع name، و در آخر وجود عبارت در میان symbol یا
+name؛ داخل هر گروه به ترتیب رتبه بازار. شروع‌ها با bisect روی کلیدهای مرتب و
+زیررشته‌ها با str.find روی یک رشته به هم چسبیده پیدا می‌شوند (هر دو در C)؛
+با ?limit= جستجوی زیررشته بعد از پر شدن نتایج متوقف می‌شود.
+
+فیلترها: ?<field>_min= و ?<field>_max= (شامل) و ?ordering=<field> یا
+?ordering=-<field> برای فیلدهای RANGE_FIELDS.
+"""
+
+from bisect import bisect_left, bisect_right
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+RANGE_FIELDS = {
+    "current_price": Decimal,
+    "market_cap": int,
+    "total_volume": int,
+    "market_cap_rank": int,
+}
+
+MAX_LIMIT = 1000
+
+# بین کلیدها در رشته زیررشته‌ها؛ در symbol و name وجود ندارد
+SEPARATOR = "\x00"
+
+# برای شروع‌های تا این طول بهترین PREFIX_TOP رتبه از قبل نگه داشته می‌شود
+PREFIX_DEPTH = 3
+PREFIX_TOP = 50
+
+
+def parse_coin_query(params):
+    """
+    پارامترهای جستجوی لیست رمزارزها به صورت dict برای CoinSearchIndex.query،
+    یا None اگر هیچ‌کدام فرستاده نشده. مقدار نامعتبر ValidationError می‌دهد.
+    """
+    query = {"search": None, "ranges": {}, "ordering": None, "limit": None}
+    search = params.get("search", "").strip()
+    if search:
+        query["search"] = search.lower()
+
+    for field, parse in RANGE_FIELDS.items():
+        bounds = []
+        for suffix in ("min", "max"):
+            name = f"{field}_{suffix}"
+            value = params.get(name)
+            if not value:
+                bounds.append(None)
+                continue
+            try:
+                bound = parse(value)
+            except (InvalidOperation, ValueError):
+                bound = None
+            # NaN و Infinity هم عدد معتبر نیستند؛ مقایسه NaN در Decimal خطا می‌دهد
+            if bound is None or not Decimal(bound).is_finite():
+                raise ValidationError({name: ["یک عدد معتبر وارد کنید."]})
+            bounds.append(bound)
+        if bounds != [None, None]:
+            query["ranges"][field] = tuple(bounds)
+
+    ordering = params.get("ordering")
+    if ordering:
+        if ordering.lstrip("-") not in RANGE_FIELDS:
+            raise ValidationError(
+                {"ordering": [f"یکی از {', '.join(RANGE_FIELDS)} را انتخاب کنید."]}
+            )
+        query["ordering"] = ordering
+
+    limit = params.get("limit")
+    if limit:
+        try:
+            query["limit"] = int(limit)
+        except ValueError:
+            query["limit"] = 0
+        if not 0 < query["limit"] <= MAX_LIMIT:
+            raise ValidationError({"limit": [f"عددی بین 1 و {MAX_LIMIT} وارد کنید."]})
+
+    if query == {"search": None, "ranges": {}, "ordering": None, "limit": None}:
+        return None
+    return query
+
+
+class _TextIndex:
+    """
+    شروع و زیررشته روی یک ستون متنی؛ موقعیت‌ها همان جایگاه در لیست‌اند و
+    همه لیست‌های موقعیت به ترتیب رتبه‌اند.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.sorted_keys = [keys[i] for i in order]
+        self.sorted_positions = order
+        # بهترین رتبه‌ها برای شروع‌های کوتاه که هزاران کلید دارند
+        self.top = {}
+        # موقعیت کلیدهای شامل هر سه‌حرفی برای جستجوی زیررشته
+        self.trigrams = {}
+        for position, key in enumerate(keys):
+            for length in range(1, min(len(key), PREFIX_DEPTH) + 1):
+                top = self.top.setdefault(key[:length], [])
+                if len(top) < PREFIX_TOP:
+                    top.append(position)
+            for trigram in {key[i : i + 3] for i in range(len(key) - 2)}:
+                self.trigrams.setdefault(trigram, []).append(position)
+        self.text = SEPARATOR.join(keys) + SEPARATOR
+        self.starts = []
+        offset = 0
+        for key in keys:
+            self.starts.append(offset)
+            offset += len(key) + 1
+
+    def prefix(self, term, limit=None):
+        """موقعیت کلیدهایی که با term شروع می‌شوند."""
+        top = self.top.get(term)
+        if top is not None and len(top) < PREFIX_TOP:
+            return top
+        if top is not None and limit is not None and limit <= PREFIX_TOP:
+            return top[:limit]
+        low = bisect_left(self.sorted_keys, term)
+        high = bisect_right(self.sorted_keys, term + "\U0010ffff", low)
+        return sorted(self.sorted_positions[low:high])
+
+    def contains(self, term, skip, limit=None):
+        """
+        موقعیت کلیدهایی که term در میانشان است؛ موقعیت‌های skip رد می‌شوند.
+        با limit بعد از پیدا شدن همان تعداد متوقف می‌شود.
+        """
+        if len(term) >= 3:
+            postings = []
+            for i in range(len(term) - 2):
+                posting = self.trigrams.get(term[i : i + 3])
+                if posting is None:
+                    return []
+                postings.append(posting)
+            # کم‌تعدادترین سه‌حرفی کاندیداها را می‌دهد، خود کلید بررسی می‌شود
+            candidates = min(postings, key=len)
+            found = []
+            keys = self.keys
+            for position in candidates:
+                if position not in skip and term in keys[position]:
+                    found.append(position)
+                    if limit is not None and len(found) >= limit:
+                        break
+            return found
+
+        found = []
+        text, starts = self.text, self.starts
+        offset = text.find(term)
+        while offset != -1:
+            position = bisect_right(starts, offset) - 1
+            if position not in skip:
+                found.append(position)
+                if limit is not None and len(found) >= limit:
+                    break
+            # بقیه همین کلید لازم نیست
+            if position + 1 == len(starts):
+                break
+            offset = text.find(term, starts[position + 1])
+        return found
+
+
+class CoinSearchIndex:
+    def __init__(self, coins, previous=None):
+        """
+        coins همان لیست serialize شده به ترتیب رتبه است. اگر previous (index
+        نسخه قبلی) همان symbolها و nameها را به همان ترتیب داشته باشد، بخش
+        متنی‌اش دوباره استفاده می‌شود؛ تغییر قیمت‌ها نسخه کاتالوگ را عوض
+        می‌کند ولی متن را نه.
+        """
+        self.coins = coins
+        symbols = [coin["symbol"].lower() for coin in coins]
+        names = [coin["name"].lower() for coin in coins]
+        if (
+            previous is not None
+            and previous._symbols.keys == symbols
+            and previous._names.keys == names
+        ):
+            self._exact = previous._exact
+            self._symbols = previous._symbols
+            self._names = previous._names
+        else:
+            self._exact = {}
+            for position, symbol in enumerate(symbols):
+                self._exact.setdefault(symbol, position)
+            self._symbols = _TextIndex(symbols)
+            self._names = _TextIndex(names)
+        self._values = {}
+        self._orders = {}
+        self._sorted_values = {}
+
+    def _field(self, field):
+        """مقادیر عددی یک فیلد به ترتیب موقعیت؛ اولین بار که لازم شود ساخته می‌شود."""
+        values = self._values.get(field)
+        if values is None:
+            parse = RANGE_FIELDS[field]
+            values = self._values[field] = [parse(coin[field]) for coin in self.coins]
+        return values
+
+    def _order(self, ordering):
+        """
+        موقعیت‌ها به ترتیب ordering (مثلاً "-market_cap")؛ مقدارهای برابر به
+        ترتیب رتبه می‌مانند.
+        """
+        order = self._orders.get(ordering)
+        if order is None:
+            values = self._field(ordering.lstrip("-"))
+            order = sorted(
+                range(len(values)),
+                key=values.__getitem__,
+                reverse=ordering.startswith("-"),
+            )
+            self._orders[ordering] = order
+        return order
+
+    def _range(self, field, low, high):
+        """موقعیت‌های داخل بازه، به ترتیب مقدار فیلد."""
+        order = self._order(field)
+        sorted_values = self._sorted_values.get(field)
+        if sorted_values is None:
+            values = self._field(field)
+            sorted_values = self._sorted_values[field] = [values[i] for i in order]
+        start = 0 if low is None else bisect_left(sorted_values, low)
+        end = len(order) if high is None else bisect_right(sorted_values, high)
+        return order[start:end]
+
+    def search(self, term, limit=None):
+        """موقعیت‌های منطبق به ترتیب اولویت (نگاه کنید به docstring ماژول)."""
+        results = []
+        seen = set()
+
+        def extend(positions):
+            for position in positions:
+                if position not in seen:
+                    seen.add(position)
+                    results.append(position)
+            return limit is not None and len(results) >= limit
+
+        exact = self._exact.get(term)
+        if extend([] if exact is None else [exact]):
+            return results[:limit]
+        if extend(self._symbols.prefix(term, limit)):
+            return results[:limit]
+        if extend(self._names.prefix(term, limit)):
+            return results[:limit]
+        # شروع‌ها قبلاً آمده‌اند؛ برای ترتیب رتبه symbol و name با هم ادغام می‌شوند
+        remaining = None if limit is None else limit - len(results)
+        contains = sorted(
+            set(self._symbols.contains(term, seen, remaining))
+            | set(self._names.contains(term, seen, remaining))
+        )
+        extend(contains)
+        return results if limit is None else results[:limit]
+
+    def query(self, search=None, ranges=None, ordering=None, limit=None):
+        ranges = ranges or {}
+        checks = [
+            (self._field(field), low, high) for field, (low, high) in ranges.items()
+        ]
+
+        def matches(position):
+            return all(
+                (low is None or values[position] >= low)
+                and (high is None or values[position] <= high)
+                for values, low, high in checks
+            )
+
+        if search is not None:
+            early_limit = limit if not ranges and not ordering else None
+            positions = [p for p in self.search(search, early_limit) if matches(p)]
+            if ordering:
+                values = self._field(ordering.lstrip("-"))
+                positions.sort(key=values.__getitem__, reverse=ordering.startswith("-"))
+        else:
+            # کوچک‌ترین بازه با bisect؛ اگر بازه‌ها بزرگ‌اند و limit داریم، پیمایش
+            # به ترتیب خروجی زودتر به limit می‌رسد
+            candidates = min(
+                (
+                    self._range(field, low, high)
+                    for field, (low, high) in ranges.items()
+                ),
+                key=len,
+                default=None,
+            )
+            total = len(self.coins)
+            if candidates is None or (
+                limit is not None and limit * total < len(candidates) ** 2
+            ):
+                order = self._order(ordering) if ordering else range(total)
+                positions = []
+                for position in order:
+                    if matches(position):
+                        positions.append(position)
+                        if limit is not None and len(positions) >= limit:
+                            break
+            else:
+                positions = [p for p in candidates if matches(p)]
+                if ordering:
+                    values = self._field(ordering.lstrip("-"))
+                    positions.sort()
+                    positions.sort(
+                        key=values.__getitem__, reverse=ordering.startswith("-")
+                    )
+                else:
+                    positions.sort()
+
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.coins[position] for position in positions]
@@ -1,26 +1,42 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from django.db import transaction
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import get_user_model
 from decimal import Decimal
 
 
+from .fastpath import ValuesSerializer
+from .fields import FixedPointDecimalField
+from .trading import MAX_BATCH_LEGS, quantize
 from .models import (
     CustomUser,
     Asset,
     Wallet,
     Coin,
+    PriceCandle,
     Announcement,
     ContactMessage,
     Transaction,
+    LimitOrder,
 )
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class BaseModelSerializer(serializers.ModelSerializer):
+    """پایه ModelSerializerهای این پروژه."""
+
+    # ستون‌های ممیز ثابت (FIXED_POINT_AMOUNTS) در API همان رشته Decimal هستند،
+    # نه عدد صحیح واحدهای کوچک؛ max_digits و decimal_places از خود فیلد مدل می‌آیند
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        FixedPointDecimalField: serializers.DecimalField,
+    }
+
+
+class UserSerializer(BaseModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
 
     class Meta:
@@ -65,31 +81,30 @@ class LoginSerializer(TokenObtainPairSerializer):
                 {"detail": "نام کاربری و رمز عبور الزامی است."}
             )
 
-        user = authenticate(username=username, password=password)
-
-        if not user:
+        # super().validate() کاربر را authenticate می‌کند، self.user و توکن‌ها را
+        # می‌سازد و last_login را به‌روز می‌کند؛ فقط پیام خطا اینجا عوض می‌شود
+        try:
+            data = super().validate(attrs)
+        except AuthenticationFailed:
             if User.objects.filter(username=username).exists():
                 raise serializers.ValidationError({"detail": "رمز عبور اشتباه است."})
-            else:
-                raise serializers.ValidationError(
-                    {"detail": "کاربری با این نام کاربری یافت نشد."}
-                )
-
-        self.user = user
-
-        data = super().validate(attrs)
+            raise serializers.ValidationError(
+                {"detail": "کاربری با این نام کاربری یافت نشد."}
+            )
 
-        data["role"] = "admin" if user.is_staff else "user"
+        data["role"] = "admin" if self.user.is_staff else "user"
 
         return data
 
 
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(BaseModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
         model = CustomUser
         fields = ["username", "password", "name", "family", "age", "gender"]
+        # تکراری بودن username در validate_username بررسی می‌شود
+        extra_kwargs = {"username": {"validators": []}}
 
     def validate_username(self, value):
         if CustomUser.objects.filter(username=value).exists():
@@ -129,13 +144,13 @@ class ChangePasswordSerializer(serializers.Serializer):
         return value
 
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class AnnouncementSerializer(BaseModelSerializer):
     class Meta:
         model = Announcement
         fields = ["id", "title", "message", "created_at"]
 
 
-class ContactMessageSerializer(serializers.ModelSerializer):
+class ContactMessageSerializer(BaseModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
     name = serializers.CharField(source="user.name", read_only=True)
     family = serializers.CharField(source="user.family", read_only=True)
@@ -154,14 +169,24 @@ class ContactMessageSerializer(serializers.ModelSerializer):
         read_only_fields = ["user", "username", "name", "family"]
 
 
-class CoinSerializer(serializers.ModelSerializer):
+class CoinSerializer(BaseModelSerializer):
     class Meta:
         model = Coin
         fields = "__all__"
 
 
-class WalletSerializer(serializers.ModelSerializer):
+class PriceCandleSerializer(BaseModelSerializer):
+    class Meta:
+        model = PriceCandle
+        fields = ["bucket", "open", "high", "low", "close"]
+
+
+class WalletSerializer(BaseModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
+    # در حالت WALLET_LEDGER موجودی snapshot به علاوه ورودی‌های فشرده‌نشده است
+    balance = serializers.DecimalField(
+        source="get_current_balance", max_digits=20, decimal_places=4, read_only=True
+    )
 
     class Meta:
         model = Wallet
@@ -172,13 +197,13 @@ class WalletSerializer(serializers.ModelSerializer):
 # -----------------------------------------------------------------------
 
 
-class CoinMiniSerializer(serializers.ModelSerializer):
+class CoinMiniSerializer(BaseModelSerializer):
     class Meta:
         model = Coin
         fields = ["symbol", "name", "image", "current_price"]
 
 
-class AssetSerializer(serializers.ModelSerializer):
+class AssetSerializer(BaseModelSerializer):
     coin = CoinMiniSerializer(read_only=True)
     username = serializers.CharField(source="user.username", read_only=True)
 
@@ -189,90 +214,138 @@ class AssetSerializer(serializers.ModelSerializer):
 
 class BuyCoinSerializer(serializers.Serializer):
     coin_id = serializers.IntegerField()
-    amount = serializers.DecimalField(max_digits=20, decimal_places=8)
-
-    def validate(self, data):
-        user = self.context["request"].user
-        coin = Coin.objects.get(id=data["coin_id"])
-        total_price = coin.current_price * data["amount"]
-        if user.wallet.balance < total_price:
-            raise serializers.ValidationError("موجودی کیف پول کافی نیست.")
-        return data
+    amount = serializers.DecimalField(
+        max_digits=20, decimal_places=8, min_value=Decimal("0.00000001")
+    )
 
 
 class SellAssetSerializer(serializers.Serializer):
     coin_symbol = serializers.CharField()
+    # مثل قبل عدد (float) با هر تعداد رقم اعشار پذیرفته و در پاسخ برگردانده
+    # می‌شود؛ برای معامله به Decimal با ۸ رقم اعشار دارایی گرد می‌شود
     amount = serializers.FloatField(min_value=0.0001)
 
-    def validate(self, attrs):
-        request = self.context["request"]
-        user = request.user
-        coin_symbol = attrs["coin_symbol"]
-        amount = attrs["amount"]
-
-        try:
-            coin = Coin.objects.get(symbol__iexact=coin_symbol)
-            asset = Asset.objects.get(user=user, coin=coin)
-        except Coin.DoesNotExist:
-            raise serializers.ValidationError("رمز ارز موردنظر پیدا نشد")
-        except Asset.DoesNotExist:
-            raise serializers.ValidationError("شما این رمز ارز را در دارایی خود ندارید")
-
-        if asset.amount < amount:
-            raise serializers.ValidationError("مقدار رمز ارز کافی نیست")
-
-        attrs["coin"] = coin
-        attrs["asset"] = asset
-        return attrs
-
-    @transaction.atomic
-    def save(self, **kwargs):
-        user = self.context["request"].user
-        wallet = user.wallet
-        coin = self.validated_data["coin"]
-        asset = self.validated_data["asset"]
-
-        coin_price = coin.current_price
-        amount = Decimal(str(self.validated_data["amount"]))
-        total_value = amount * coin_price
-
-        # کسر از دارایی
-        asset.amount -= amount
-        if asset.amount <= 0:
-            asset.delete()
-            asset_amount = Decimal("0")
-        else:
-            asset.save()
-            asset_amount = asset.amount
-
-        # اضافه به کیف پول
-        wallet.balance += total_value
-        wallet.save()
-
-        # 📌 ثبت تراکنش
-        Transaction.objects.create(
-            user=user,
-            transaction_type="sell",
-            coin=coin,
-            total_value=total_value,
-        )
-
-        return {
-            "wallet_balance": wallet.balance,
-            "asset_balance": asset_amount,
-            "coin": coin.symbol,
-            "sold_amount": amount,
-            "total_value": total_value,
-        }
+    def validate_amount(self, value):
+        return quantize(Asset, "amount", Decimal(str(value)))
 
 
 class SwapSerializer(serializers.Serializer):
     from_symbol = serializers.CharField()
     to_symbol = serializers.CharField()
+    amount = serializers.DecimalField(
+        max_digits=20, decimal_places=8, min_value=Decimal("0.00000001")
+    )
+
+
+class PortfolioItemSerializer(serializers.Serializer):
+    coin_symbol = serializers.CharField()
+    coin_name = serializers.CharField()
+    image = serializers.URLField()
+    amount = serializers.DecimalField(max_digits=20, decimal_places=8)
+    current_price = serializers.DecimalField(max_digits=20, decimal_places=4)
+    value = serializers.DecimalField(max_digits=40, decimal_places=4)
+    allocation = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class PortfolioSerializer(serializers.Serializer):
+    total_value = serializers.DecimalField(max_digits=40, decimal_places=4)
+    assets = PortfolioItemSerializer(many=True)
+
+
+class UserStatsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    active = serializers.IntegerField()
+    inactive = serializers.IntegerField()
+    by_gender = serializers.DictField(child=serializers.IntegerField())
+
+
+class TradeVolumeSerializer(serializers.Serializer):
+    day = serializers.DateField()
+    coin_symbol = serializers.CharField()
+    trades = serializers.IntegerField()
+    volume = serializers.DecimalField(max_digits=30, decimal_places=8)
+
+
+class TradeSideSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    value = serializers.DecimalField(max_digits=30, decimal_places=8)
+
+
+class BuySellSerializer(serializers.Serializer):
+    buy = TradeSideSerializer()
+    sell = TradeSideSerializer()
+
+
+class AssetsUnderManagementSerializer(serializers.Serializer):
+    value = serializers.DecimalField(max_digits=40, decimal_places=4)
+    holders = serializers.IntegerField()
+
+
+class ContactStatsSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    average_stars = serializers.FloatField(allow_null=True)
+
+
+class AdminStatsSerializer(serializers.Serializer):
+    users = UserStatsSerializer()
+    trade_volume = TradeVolumeSerializer(many=True)
+    buy_sell = BuySellSerializer()
+    assets_under_management = AssetsUnderManagementSerializer()
+    contact_messages = ContactStatsSerializer()
+    updated_at = serializers.DateTimeField()
+
+
+class OrderLegSerializer(serializers.Serializer):
+    SIDES = ["buy", "sell", "swap"]
+
+    side = serializers.ChoiceField(choices=SIDES)
+    coin_symbol = serializers.CharField()
+    to_symbol = serializers.CharField(required=False)
+    amount = serializers.DecimalField(
+        max_digits=20, decimal_places=8, min_value=Decimal("0.00000001")
+    )
+
+    def validate(self, attrs):
+        if attrs["side"] == "swap" and not attrs.get("to_symbol"):
+            raise serializers.ValidationError(
+                {"to_symbol": "برای سواپ، رمز ارز مقصد الزامی است."}
+            )
+        return attrs
+
+
+class OrderBatchSerializer(serializers.Serializer):
+    legs = OrderLegSerializer(many=True, allow_empty=False)
+
+    def validate_legs(self, value):
+        if len(value) > MAX_BATCH_LEGS:
+            raise serializers.ValidationError(
+                f"حداکثر {MAX_BATCH_LEGS} سفارش در هر درخواست مجاز است."
+            )
+        return value
+
+
+class OrderResultSerializer(serializers.Serializer):
+    leg = serializers.IntegerField()
+    side = serializers.CharField()
+    coin_symbol = serializers.CharField()
     amount = serializers.DecimalField(max_digits=20, decimal_places=8)
+    price = serializers.DecimalField(max_digits=20, decimal_places=4, required=False)
+    total_value = serializers.DecimalField(
+        max_digits=30, decimal_places=8, required=False
+    )
+    to_symbol = serializers.CharField(required=False)
+    received = serializers.DecimalField(max_digits=20, decimal_places=8, required=False)
+
+
+class OrderBatchResultSerializer(serializers.Serializer):
+    results = OrderResultSerializer(many=True)
+    wallet_balance = serializers.DecimalField(max_digits=20, decimal_places=4)
+    assets = serializers.DictField(
+        child=serializers.DecimalField(max_digits=20, decimal_places=8)
+    )
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(BaseModelSerializer):
     coin_symbol = serializers.CharField(source="coin.symbol", read_only=True)
     coin_name = serializers.CharField(source="coin.name", read_only=True)
 
@@ -286,3 +359,39 @@ class TransactionSerializer(serializers.ModelSerializer):
             "coin_symbol",
             "coin_name",
         ]
+
+
+class LimitOrderSerializer(BaseModelSerializer):
+    coin_symbol = serializers.CharField(source="coin.symbol", read_only=True)
+
+    class Meta:
+        model = LimitOrder
+        fields = [
+            "id",
+            "coin_symbol",
+            "side",
+            "price",
+            "amount",
+            "reserved",
+            "status",
+            "fill_price",
+            "created_at",
+            "closed_at",
+        ]
+
+
+class LimitOrderCreateSerializer(serializers.Serializer):
+    coin_symbol = serializers.CharField()
+    side = serializers.ChoiceField(choices=LimitOrder.SIDE_CHOICES)
+    price = serializers.DecimalField(
+        max_digits=20, decimal_places=4, min_value=Decimal("0.0001")
+    )
+    amount = serializers.DecimalField(
+        max_digits=20, decimal_places=8, min_value=Decimal("0.00000001")
+    )
+
+
+# نسخه سریع لیست‌های پرخواندنی روی ردیف‌های .values() (core/fastpath.py)
+coin_rows = ValuesSerializer(CoinSerializer)
+asset_rows = ValuesSerializer(AssetSerializer)
+transaction_rows = ValuesSerializer(TransactionSerializer)
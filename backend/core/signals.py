@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import bump_user_version, user_cache
+from .cache import bump_catalog_version, bump_portfolio_version
+from .models import Asset, Coin, CustomUser
+
+
+@receiver([post_save, post_delete], sender=Coin)
+def invalidate_coin_catalog(sender, instance, **kwargs):
+    bump_catalog_version([instance.pk])
+
+
+# برای تغییر دستی (پنل ادمین، shell). معاملات ردیف دارایی را فقط با update و
+# bulk_create می‌نویسند که سیگنال ندارند و خودشان نسخه پرتفوی را یک بار بالا
+# می‌برند (core/trading.py). فقط post_save؛ گوش دادن به post_delete حذف سریع
+# داراییِ صفرشده در معاملات را به SELECT + DELETE تبدیل می‌کند و حذف دستی از
+# پنل ادمین حداکثر تا PORTFOLIO_CACHE_TTL دیده نمی‌شود.
+@receiver(post_save, sender=Asset)
+def invalidate_portfolio(sender, instance, **kwargs):
+    bump_portfolio_version(instance.user_id)
+
+
+# تغییر is_active، رمز عبور یا نقش باید در درخواست بعدی همین کاربر دیده شود
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+    bump_user_version(instance.pk)
@@ -0,0 +1,616 @@
+"""
+اجرای خرید، فروش و سواپ در یک تراکنش دیتابیس.
+
+همه تغییرات موجودی با عبارت‌های F() و UPDATE شرطی انجام می‌شوند تا درخواست‌های
+همزمان روی هم ننویسند (مقدارها با fixed_value تا با FIXED_POINT_AMOUNTS هم
+درست باشند)، و روی backendهایی که select_for_update دارند ردیف دارایی قبل
+از تصمیم‌گیری قفل می‌شود. با WALLET_LEDGER تغییر موجودی کیف پول
+به جای UPDATE به دفتر اضافه می‌شود (core/ledger.py). تعداد کوئری هر معامله
+ثابت است:
+
+- خرید: ۴ کوئری (اولین خرید یک رمزارز: ۳ کوئری بیشتر برای insert داخل savepoint)
+- فروش: ۶ کوئری
+- سواپ: ۴ کوئری (اولین دریافت یک رمزارز: ۳ کوئری بیشتر، مثل خرید)
+- سفارش گروهی: حداکثر ۸ کوئری، مستقل از تعداد سفارش‌ها
+- ثبت سفارش محدود: ۳ کوئری برای خرید و ۴ برای فروش؛ لغو: ۲ کوئری
+- پر شدن سفارش‌های محدود یک رمزارز: حداکثر ۹ کوئری، مستقل از تعداد سفارش‌ها
+  (برای هر CASE_BATCH_SIZE کاربر)
+
+در حالت دفتر، خرید ۳، فروش ۲ و پر شدن سفارش‌های محدود ۱ کوئری بیشتر دارد.
+معامله‌ای که دارایی‌ها را عوض کند داخل همان تراکنش نسخه پرتفوی را هم بالا
+می‌برد: ۱ کوئری (اولین بار برای یک کاربر ۲ کوئری، ساخت ردیف CacheVersion).
+"""
+
+from collections import defaultdict
+from decimal import ROUND_HALF_EVEN, Decimal
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from . import ledger
+from .cache import bump_portfolio_versions
+from .fields import fixed_value
+from .models import Asset, Coin, LimitOrder, Transaction, Wallet
+
+
+MAX_BATCH_LEGS = 50
+
+# حداکثر شرط WHEN در هر UPDATE گروهی موجودی‌ها
+CASE_BATCH_SIZE = 500
+
+
+class TradeError(Exception):
+    def __init__(self, message, leg=None):
+        super().__init__(message)
+        self.leg = leg
+
+
+def quantize(model, field_name, value):
+    field = model._meta.get_field(field_name)
+    return value.quantize(Decimal(1).scaleb(-field.decimal_places), ROUND_HALF_EVEN)
+
+
+def for_update(queryset):
+    if connections[queryset.db].features.has_select_for_update:
+        return queryset.select_for_update()
+    return queryset
+
+
+def _invalidate_portfolio(user):
+    _invalidate_portfolios([user.pk])
+
+
+def _invalidate_portfolios(user_ids):
+    # داخل تراکنش معامله: نسخه همراه تغییر دارایی‌ها commit یا rollback می‌شود
+    # و get_portfolio تا commit همان داده و نسخه قبلی را می‌بیند
+    bump_portfolio_versions(user_ids)
+
+
+def _coin_queryset():
+    return Coin.objects.only("id", "symbol", "name", "current_price")
+
+
+def _check_amount(amount):
+    # مقدار منفی خرید را به واریز و فروش و سواپ را به برداشت تبدیل می‌کند
+    if amount <= 0:
+        raise TradeError("مقدار باید بیشتر از صفر باشد.")
+
+
+def credit_asset(user, coin, amount):
+    """
+    amount را به دارایی کاربر اضافه می‌کند: یک UPDATE، و اگر ردیفی نبود
+    savepoint، INSERT و RELEASE (۳ کوئری بیشتر).
+
+    ردیف تازه با bulk_create ساخته می‌شود که post_save نمی‌فرستد؛ نسخه پرتفوی
+    را خود معامله یک بار بالا می‌برد (_invalidate_portfolio).
+    """
+    updated = Asset.objects.filter(user=user, coin=coin).update(
+        amount=F("amount") + fixed_value(Asset, "amount", amount)
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            Asset.objects.bulk_create([Asset(user=user, coin=coin, amount=amount)])
+    except IntegrityError:
+        # درخواست همزمان دیگری زودتر ردیف را ساخته است
+        Asset.objects.filter(user=user, coin=coin).update(
+            amount=F("amount") + fixed_value(Asset, "amount", amount)
+        )
+
+
+def debit_asset(user, coin, amount, missing_message, insufficient_message):
+    """
+    ردیف دارایی را قفل و از آن کم می‌کند؛ اگر چیزی باقی نماند ردیف حذف می‌شود.
+    مقدار باقی‌مانده را برمی‌گرداند.
+    """
+    asset = (
+        for_update(Asset.objects.filter(user=user, coin=coin))
+        .only("id", "amount")
+        .first()
+    )
+    if asset is None:
+        raise TradeError(missing_message)
+    if asset.amount < amount:
+        raise TradeError(insufficient_message)
+
+    remaining = asset.amount - amount
+    if remaining <= 0:
+        Asset.objects.filter(pk=asset.pk).delete()
+        return Decimal("0")
+
+    Asset.objects.filter(pk=asset.pk).update(
+        amount=F("amount") - fixed_value(Asset, "amount", amount)
+    )
+    return remaining
+
+
+def buy(user, coin_id, amount):
+    _check_amount(amount)
+    coin = _coin_queryset().filter(pk=coin_id).first()
+    if coin is None:
+        raise TradeError("رمز ارز موردنظر پیدا نشد")
+
+    total_value = coin.current_price * amount
+    debit = quantize(Wallet, "balance", total_value)
+    wallet_id = ledger.wallet_id_for(user) if ledger.ledger_enabled() else None
+
+    with transaction.atomic():
+        if wallet_id is not None:
+            # ورودی منفی با raise پایین rollback می‌شود
+            debited = ledger.debit(wallet_id, debit)
+        else:
+            # کسر شرطی: اگر موجودی کافی نباشد هیچ ردیفی به‌روزرسانی نمی‌شود
+            debited = Wallet.objects.filter(user=user, balance__gte=debit).update(
+                balance=F("balance") - fixed_value(Wallet, "balance", debit)
+            )
+        if not debited:
+            raise TradeError("موجودی کیف پول کافی نیست.")
+
+        credit_asset(user, coin, amount)
+        _invalidate_portfolio(user)
+
+        Transaction.objects.create(
+            user=user,
+            transaction_type="buy",
+            coin=coin,
+            total_value=quantize(Transaction, "total_value", total_value),
+        )
+
+    return {
+        "coin": coin.symbol,
+        "bought_amount": amount,
+        "total_value": total_value,
+    }
+
+
+def sell(user, coin_symbol, amount):
+    _check_amount(amount)
+    coin = _coin_queryset().filter(symbol__iexact=coin_symbol).first()
+    if coin is None:
+        raise TradeError("رمز ارز موردنظر پیدا نشد")
+
+    total_value = amount * coin.current_price
+    credit = quantize(Wallet, "balance", total_value)
+    wallet_id = ledger.wallet_id_for(user) if ledger.ledger_enabled() else None
+
+    with transaction.atomic():
+        asset_amount = debit_asset(
+            user,
+            coin,
+            amount,
+            "شما این رمز ارز را در دارایی خود ندارید",
+            "مقدار رمز ارز کافی نیست",
+        )
+        _invalidate_portfolio(user)
+
+        if wallet_id is not None:
+            ledger.credit(wallet_id, credit)
+            wallet_balance = ledger.current_balance(
+                Wallet.objects.only("balance", "ledger_offset").get(pk=wallet_id)
+            )
+        else:
+            wallet = Wallet.objects.filter(user=user)
+            wallet.update(balance=F("balance") + fixed_value(Wallet, "balance", credit))
+            wallet_balance = wallet.values_list("balance", flat=True).get()
+
+        Transaction.objects.create(
+            user=user,
+            transaction_type="sell",
+            coin=coin,
+            total_value=quantize(Transaction, "total_value", total_value),
+        )
+
+    return {
+        "wallet_balance": wallet_balance,
+        "asset_balance": asset_amount,
+        "coin": coin.symbol,
+        "sold_amount": amount,
+        "total_value": total_value,
+    }
+
+
+def swap(user, from_symbol, to_symbol, amount):
+    _check_amount(amount)
+    if from_symbol == to_symbol:
+        raise TradeError("نمیشه دو ارز مشابه رو سواپ کرد.")
+
+    coins = {
+        coin.symbol: coin
+        for coin in _coin_queryset().filter(symbol__in=[from_symbol, to_symbol])
+    }
+    from_coin = coins.get(from_symbol)
+    to_coin = coins.get(to_symbol)
+    if from_coin is None or to_coin is None or not to_coin.current_price:
+        raise TradeError("رمزارز نامعتبر است.")
+
+    # نرخ تبدیل
+    rate = Decimal(from_coin.current_price) / Decimal(to_coin.current_price)
+    received_amount = quantize(Asset, "amount", amount * rate)
+
+    with transaction.atomic():
+        debit_asset(
+            user,
+            from_coin,
+            amount,
+            f"شما هیچ {from_symbol} ندارید.",
+            "مقدار کافی برای سواپ ندارید.",
+        )
+        credit_asset(user, to_coin, received_amount)
+        _invalidate_portfolio(user)
+
+    return {
+        "swapped": amount,
+        "from_symbol": from_symbol,
+        "received": received_amount,
+        "to_symbol": to_symbol,
+    }
+
+
+def execute_batch(user, legs):
+    """
+    چند سفارش خرید، فروش و سواپ را روی یک snapshot از کیف پول، دارایی‌ها و
+    قیمت‌ها اعتبارسنجی و همه را در یک تراکنش اجرا می‌کند. هر ردیف کیف پول و
+    دارایی فقط یک بار قفل و یک بار نوشته می‌شود؛ اگر یکی از سفارش‌ها معتبر
+    نباشد هیچ‌کدام اجرا نمی‌شوند.
+
+    هر leg یک dict با side و coin_symbol و amount است و سواپ to_symbol هم دارد.
+    """
+    symbols = set()
+    for leg in legs:
+        symbols.add(leg["coin_symbol"].lower())
+        if leg["side"] == "swap":
+            symbols.add(leg["to_symbol"].lower())
+
+    coins = {
+        coin.symbol.lower(): coin
+        for coin in _coin_queryset().filter(symbol__in=symbols)
+    }
+    for index, leg in enumerate(legs, start=1):
+        for key in ("coin_symbol", "to_symbol"):
+            if leg.get(key) and leg[key].lower() not in coins:
+                raise TradeError("رمز ارز موردنظر پیدا نشد", leg=index)
+
+    with transaction.atomic():
+        if ledger.ledger_enabled():
+            wallet = ledger.lock_wallet(ledger.wallet_id_for(user))
+            opening_balance = ledger.current_balance(wallet)
+        else:
+            wallet = for_update(Wallet.objects.filter(user=user)).only("id", "balance").get()
+            opening_balance = wallet.balance
+        assets = {
+            asset.coin_id: asset
+            for asset in for_update(
+                Asset.objects.filter(user=user, coin__in=coins.values())
+            ).only("id", "coin_id", "amount")
+        }
+
+        balance = opening_balance
+        amounts = {coin.pk: Decimal("0") for coin in coins.values()}
+        amounts.update({coin_id: asset.amount for coin_id, asset in assets.items()})
+        results = []
+        transactions = []
+
+        for index, leg in enumerate(legs, start=1):
+            side = leg["side"]
+            amount = leg["amount"]
+            coin = coins[leg["coin_symbol"].lower()]
+            result = {
+                "leg": index,
+                "side": side,
+                "coin_symbol": coin.symbol,
+                "amount": amount,
+            }
+
+            if side == "buy":
+                total_value = coin.current_price * amount
+                debit = quantize(Wallet, "balance", total_value)
+                if balance < debit:
+                    raise TradeError("موجودی کیف پول کافی نیست.", leg=index)
+                balance -= debit
+                amounts[coin.pk] += amount
+                result.update(price=coin.current_price, total_value=total_value)
+            elif side == "sell":
+                if amounts[coin.pk] <= 0:
+                    raise TradeError("شما این رمز ارز را در دارایی خود ندارید", leg=index)
+                if amounts[coin.pk] < amount:
+                    raise TradeError("مقدار رمز ارز کافی نیست", leg=index)
+                total_value = amount * coin.current_price
+                balance += quantize(Wallet, "balance", total_value)
+                amounts[coin.pk] -= amount
+                result.update(price=coin.current_price, total_value=total_value)
+            else:
+                to_coin = coins[leg["to_symbol"].lower()]
+                if to_coin.pk == coin.pk:
+                    raise TradeError("نمیشه دو ارز مشابه رو سواپ کرد.", leg=index)
+                if not to_coin.current_price:
+                    raise TradeError("رمزارز نامعتبر است.", leg=index)
+                if amounts[coin.pk] <= 0:
+                    raise TradeError(f"شما هیچ {coin.symbol} ندارید.", leg=index)
+                if amounts[coin.pk] < amount:
+                    raise TradeError("مقدار کافی برای سواپ ندارید.", leg=index)
+                rate = Decimal(coin.current_price) / Decimal(to_coin.current_price)
+                received = quantize(Asset, "amount", amount * rate)
+                amounts[coin.pk] -= amount
+                amounts[to_coin.pk] += received
+                result.update(to_symbol=to_coin.symbol, received=received)
+
+            if side in ("buy", "sell"):
+                transactions.append(
+                    Transaction(
+                        user=user,
+                        transaction_type=side,
+                        coin=coin,
+                        total_value=quantize(Transaction, "total_value", total_value),
+                    )
+                )
+            results.append(result)
+
+        delta = balance - opening_balance
+        if delta and ledger.ledger_enabled():
+            ledger.append(wallet.pk, delta)
+        elif delta:
+            # تغییر خالص با UPDATE شرطی اعمال می‌شود تا روی backendهای بدون
+            # select_for_update تغییر همزمان گم نشود. مقایسه برابری با موجودی
+            # قبلی روی SQLite قابل اعتماد نیست چون decimal را به صورت REAL ذخیره می‌کند.
+            wallets = Wallet.objects.filter(pk=wallet.pk)
+            if delta < 0:
+                wallets = wallets.filter(balance__gte=-delta)
+            if not wallets.update(
+                balance=F("balance") + fixed_value(Wallet, "balance", delta)
+            ):
+                raise TradeError("موجودی کیف پول کافی نیست.")
+
+        changed, emptied, created = [], [], []
+        for coin_id, amount in amounts.items():
+            asset = assets.get(coin_id)
+            if asset is None:
+                if amount > 0:
+                    created.append(Asset(user=user, coin_id=coin_id, amount=amount))
+            elif amount <= 0:
+                emptied.append(asset.pk)
+            elif amount != asset.amount:
+                asset.amount = amount
+                changed.append(asset)
+
+        if changed or emptied or created:
+            _invalidate_portfolio(user)
+        if changed:
+            Asset.objects.bulk_update(changed, ["amount"])
+        if emptied:
+            Asset.objects.filter(pk__in=emptied).delete()
+        if created:
+            Asset.objects.bulk_create(created)
+        if transactions:
+            Transaction.objects.bulk_create(transactions)
+
+    symbols_by_id = {coin.pk: coin.symbol for coin in coins.values()}
+    return {
+        "results": results,
+        "wallet_balance": balance,
+        "assets": {
+            symbols_by_id[coin_id]: max(amount, Decimal("0"))
+            for coin_id, amount in amounts.items()
+        },
+    }
+
+
+def _add_in_bulk(queryset, key, field_name, amounts):
+    """
+    هر مقدار amounts (مقدار ستون key -> مبلغ) را به field_name ردیف خودش
+    اضافه می‌کند؛ یک UPDATE با CASE برای هر CASE_BATCH_SIZE ردیف.
+    """
+    model = queryset.model
+    items = list(amounts.items())
+    updated = 0
+    for start in range(0, len(items), CASE_BATCH_SIZE):
+        chunk = dict(items[start : start + CASE_BATCH_SIZE])
+        delta = Case(
+            *[
+                When(**{key: value}, then=fixed_value(model, field_name, amount))
+                for value, amount in chunk.items()
+            ],
+            output_field=model._meta.get_field(field_name),
+        )
+        updated += queryset.filter(**{f"{key}__in": chunk}).update(
+            **{field_name: F(field_name) + delta}
+        )
+    return updated
+
+
+def _credit_wallets(credits):
+    """مبلغ هر کاربر (user_id -> مبلغ) را به کیف پولش واریز می‌کند."""
+    credits = {user_id: amount for user_id, amount in credits.items() if amount}
+    if not credits:
+        return
+    if ledger.ledger_enabled():
+        wallets = Wallet.objects.filter(user_id__in=credits).values_list(
+            "user_id", "id"
+        )
+        ledger.append_many(
+            {wallet_id: credits[user_id] for user_id, wallet_id in wallets}
+        )
+    else:
+        _add_in_bulk(Wallet.objects.all(), "user_id", "balance", credits)
+
+
+def _credit_assets(coin_id, credits):
+    """مقدار هر کاربر (user_id -> مقدار) را به دارایی‌اش از coin_id اضافه می‌کند."""
+    if not credits:
+        return
+    holders = set(
+        Asset.objects.filter(coin_id=coin_id, user_id__in=credits).values_list(
+            "user_id", flat=True
+        )
+    )
+    if holders:
+        _add_in_bulk(
+            Asset.objects.filter(coin_id=coin_id),
+            "user_id",
+            "amount",
+            {user_id: credits[user_id] for user_id in holders},
+        )
+    missing = [user_id for user_id in credits if user_id not in holders]
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            Asset.objects.bulk_create(
+                [
+                    Asset(user_id=user_id, coin_id=coin_id, amount=credits[user_id])
+                    for user_id in missing
+                ],
+                batch_size=500,
+            )
+    except IntegrityError:
+        # درخواست همزمان دیگری یکی از ردیف‌ها را زودتر ساخته است
+        for user_id in missing:
+            updated = Asset.objects.filter(user_id=user_id, coin_id=coin_id).update(
+                amount=F("amount") + fixed_value(Asset, "amount", credits[user_id])
+            )
+            if not updated:
+                Asset.objects.bulk_create(
+                    [Asset(user_id=user_id, coin_id=coin_id, amount=credits[user_id])]
+                )
+
+
+def place_limit_order(user, coin_symbol, side, price, amount):
+    """
+    سفارش محدود را ثبت و موجودی لازم آن را رزرو می‌کند: برای خرید
+    price * amount از کیف پول و برای فروش amount از دارایی کسر می‌شود.
+    """
+    coin = _coin_queryset().filter(symbol__iexact=coin_symbol).first()
+    if coin is None:
+        raise TradeError("رمز ارز موردنظر پیدا نشد")
+
+    if side == "buy":
+        reserved = quantize(Wallet, "balance", price * amount)
+        if reserved <= 0:
+            raise TradeError("مبلغ سفارش کمتر از حداقل مجاز است.")
+    else:
+        reserved = amount
+    wallet_id = (
+        ledger.wallet_id_for(user)
+        if side == "buy" and ledger.ledger_enabled()
+        else None
+    )
+
+    with transaction.atomic():
+        if side == "sell":
+            debit_asset(
+                user,
+                coin,
+                amount,
+                "شما این رمز ارز را در دارایی خود ندارید",
+                "مقدار رمز ارز کافی نیست",
+            )
+            _invalidate_portfolio(user)
+        else:
+            if wallet_id is not None:
+                debited = ledger.debit(wallet_id, reserved)
+            else:
+                debited = Wallet.objects.filter(
+                    user=user, balance__gte=reserved
+                ).update(
+                    balance=F("balance") - fixed_value(Wallet, "balance", reserved)
+                )
+            if not debited:
+                raise TradeError("موجودی کیف پول کافی نیست.")
+
+        order = LimitOrder.objects.create(
+            user=user,
+            coin=coin,
+            side=side,
+            price=price,
+            amount=amount,
+            reserved=reserved,
+        )
+    return order
+
+
+def cancel_limit_order(user, order):
+    """سفارش باز را لغو و موجودی رزروشده را به کاربر برمی‌گرداند."""
+    wallet_id = (
+        ledger.wallet_id_for(user)
+        if order.side == "buy" and ledger.ledger_enabled()
+        else None
+    )
+    now = timezone.now()
+
+    with transaction.atomic():
+        # UPDATE شرطی: اگر موتور تطبیق همزمان سفارش را پر کرده باشد چیزی لغو نمی‌شود
+        cancelled = LimitOrder.objects.filter(
+            pk=order.pk, user=user, status="open"
+        ).update(status="cancelled", closed_at=now)
+        if not cancelled:
+            raise TradeError("این سفارش دیگر باز نیست.")
+
+        if order.side == "sell":
+            credit_asset(user, order.coin, order.reserved)
+            _invalidate_portfolio(user)
+        elif wallet_id is not None:
+            ledger.credit(wallet_id, order.reserved)
+        else:
+            Wallet.objects.filter(user=user).update(
+                balance=F("balance") + fixed_value(Wallet, "balance", order.reserved)
+            )
+
+    order.status = "cancelled"
+    order.closed_at = now
+    return order
+
+
+def fill_limit_orders(coin_id, price, order_ids):
+    """
+    سفارش‌های order_ids از یک رمزارز را با قیمت price پر می‌کند و سفارش‌های
+    پرشده را برمی‌گرداند. سفارشی که در این فاصله لغو شده یا price از حد آن
+    نگذشته کنار گذاشته می‌شود.
+
+    خرید با price حساب می‌شود و باقی پول رزروشده به کیف پول برمی‌گردد؛
+    رمزارز فروش از قبل کسر شده و فقط پول آن واریز می‌شود. همه سفارش‌ها در یک
+    تراکنش و با تعداد کوئری ثابت اجرا می‌شوند.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # اولین دستور تراکنش نوشتن است؛ روی PostgreSQL ردیف‌ها قفل می‌شوند و
+        # لغو همزمان بعد از commit دیگر سفارش باز پیدا نمی‌کند
+        filled = (
+            LimitOrder.objects.filter(pk__in=order_ids, coin_id=coin_id, status="open")
+            .filter(Q(side="buy", price__gte=price) | Q(side="sell", price__lte=price))
+            .update(status="filled", fill_price=price, closed_at=now)
+        )
+        if not filled:
+            return []
+        orders = list(
+            LimitOrder.objects.filter(
+                pk__in=order_ids, status="filled", closed_at=now
+            ).only("id", "user_id", "side", "amount", "reserved")
+        )
+
+        wallet_credits = defaultdict(Decimal)
+        asset_credits = defaultdict(Decimal)
+        transactions = []
+        for order in orders:
+            total_value = price * order.amount
+            value = quantize(Wallet, "balance", total_value)
+            if order.side == "buy":
+                wallet_credits[order.user_id] += order.reserved - value
+                asset_credits[order.user_id] += order.amount
+            else:
+                wallet_credits[order.user_id] += value
+            transactions.append(
+                Transaction(
+                    user_id=order.user_id,
+                    transaction_type=order.side,
+                    coin_id=coin_id,
+                    total_value=quantize(Transaction, "total_value", total_value),
+                )
+            )
+
+        _credit_wallets(wallet_credits)
+        _credit_assets(coin_id, asset_credits)
+        Transaction.objects.bulk_create(transactions, batch_size=500)
+        _invalidate_portfolios(asset_credits)
+
+    return orders
@@ -1,6 +1,6 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .views import (
     UserViewSet,
@@ -10,6 +10,7 @@ from .views import (
     CoinViewSet,
     RegisterAPIView,
     LoginAPIView,
+    TokenRefreshAPIView,
     ChangePasswordView,
     AnnouncementViewSet,
     ContactMessageViewSet,
@@ -19,9 +20,16 @@ from .views import (
     AssetViewSet,
     MyAssetView,
     UserTransactions,
+    OrderBatchAPIView,
+    LimitOrderViewSet,
+    PortfolioView,
+    AdminStatsView,
+    TransactionExportView,
+    APIRootView,
 )
 
 router = DefaultRouter()
+router.APIRootView = APIRootView
 
 router.register(r"users", UserViewSet, basename="users")
 router.register(r"wallets", WalletViewSet, basename="wallets")
@@ -31,23 +39,38 @@ router.register(r"coins", CoinViewSet, basename="coins")
 
 router.register(r"announcements", AnnouncementViewSet, basename="announcements")
 router.register(r"contact-messages", ContactMessageViewSet, basename="contact-messages")
+router.register(r"orders/limit", LimitOrderViewSet, basename="limit-orders")
 
 
 urlpatterns = [
     path("", include(router.urls)),
     path("register/", RegisterAPIView.as_view(), name="register"),
     path("login/", LoginAPIView.as_view(), name="login"),
-    path("token/refresh", TokenRefreshView.as_view(), name="token_refresh"),
+    path("token/refresh", TokenRefreshAPIView.as_view(), name="token_refresh"),
     path("change-password/", ChangePasswordView.as_view(), name="change-password"),
     path("user/", CurrentUserView.as_view(), name="user-me"),
     path("wallet/", WalletDetailAPIView.as_view(), name="wallet-me"),
     path("asset/", MyAssetView.as_view(), name="my-assets"),
+    path("portfolio/", PortfolioView.as_view(), name="portfolio"),
+    path("admin/stats/", AdminStatsView.as_view(), name="admin-stats"),
     path(
         "transaction/",
         UserTransactions.as_view(),
         name="user-transactions",
     ),
+    path(
+        "transaction/export/",
+        TransactionExportView.as_view(),
+        name="transaction-export",
+    ),
     path("buy/", BuyCoinAPIView.as_view(), name="buy-coin"),
     path("sell/", SellAssetAPIView.as_view(), name="sell-asset"),
     path("swap/", SwapView.as_view(), name="swap"),
+    path("orders/batch/", OrderBatchAPIView.as_view(), name="orders-batch"),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+
+    # همان نام‌ها و الگوهای router، قبل از آن‌ها تا برای GET اول تطبیق داده شوند
+    urlpatterns = async_views.urlpatterns + urlpatterns
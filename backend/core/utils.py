@@ -0,0 +1,68 @@
+import json
+
+
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(fp, chunk_size=64 * 1024):
+    """
+    Yield the items of a top-level JSON array one by one, reading ``fp`` in
+    chunks instead of loading the whole document into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def next_char():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                raise ValueError("Unexpected end of JSON input")
+            fill()
+
+    if next_char() != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    if next_char() == "]":
+        return
+
+    while True:
+        next_char()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # عدد یا literal ممکن است در مرز chunk نصفه خوانده شده باشد
+            if not eof and buffer[pos] not in '{["':
+                tail = buffer[end:].lstrip(_WHITESPACE)
+                if not tail or tail[0] not in ",]":
+                    fill()
+                    continue
+            break
+        pos = end
+        yield item
+
+        separator = next_char()
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' but found {separator!r}")
@@ -1,12 +1,24 @@
 from rest_framework.views import APIView
-from rest_framework import viewsets, generics, permissions, status
+from rest_framework import viewsets, generics, mixins, permissions, status
+from rest_framework.decorators import action
 from rest_framework.generics import RetrieveUpdateAPIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from decimal import Decimal
-
-from rest_framework_simplejwt.views import TokenObtainPairView
-
+from django.http import StreamingHttpResponse
+
+from rest_framework.routers import APIRootView as DefaultAPIRootView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from . import trading
+from .adminstats import get_admin_stats
+from .cache import coin_catalog, etag_matches, get_catalog_version
+from .fieldsets import SparseFieldsetMixin
+from .exports import EXPORT_FORMATS, export_queryset, iter_export, parse_bound
+from .ledger import ledger_enabled
+from .pagination import AdminPagination, KeysetPagination, LimitOrderPagination
+from .portfolio import get_portfolio
+from .pricehistory import history_queryset, parse_history_query
+from .search import parse_coin_query
 from .permissions import IsActiveUser, IsActiveUser, IsAdminOrSelf
 from .models import (
     CustomUser,
@@ -16,6 +28,7 @@ from .models import (
     Announcement,
     ContactMessage,
     Transaction,
+    LimitOrder,
 )
 from .serializers import (
     UserSerializer,
@@ -23,6 +36,7 @@ from .serializers import (
     RegisterSerializer,
     WalletSerializer,
     CoinSerializer,
+    PriceCandleSerializer,
     ChangePasswordSerializer,
     AnnouncementSerializer,
     ContactMessageSerializer,
@@ -31,13 +45,26 @@ from .serializers import (
     SellAssetSerializer,
     SwapSerializer,
     TransactionSerializer,
+    OrderBatchSerializer,
+    OrderBatchResultSerializer,
+    LimitOrderSerializer,
+    LimitOrderCreateSerializer,
+    PortfolioSerializer,
+    AdminStatsSerializer,
+    asset_rows,
+    coin_rows,
+    transaction_rows,
 )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all().order_by("-id")
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, IsActiveUser]
+    pagination_class = AdminPagination
+    # لیست: کاربر، COUNT صفحه‌بندی و خود صفحه
+    query_budget = {"list": 3, "retrieve": 2, "create": 3}
+    read_replica = {"list"}
 
     def get_permissions(self):
         if self.action in ["list", "destroy", "create"]:
@@ -50,11 +77,12 @@ class UserViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_superuser:
             return CustomUser.objects.all().order_by("-id")
-        return CustomUser.objects.filter(id=user.id)  # فقط خودش
+        return CustomUser.objects.filter(id=user.id).order_by("-id")  # فقط خودش
 
 
 class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"get": 1, "patch": 2, "put": 2}
 
     def get(self, request):
         serializer = UserSerializer(request.user)
@@ -75,24 +103,39 @@ class CurrentUserView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class WalletViewSet(viewsets.ReadOnlyModelViewSet):
+class WalletViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Wallet.objects.all()
     serializer_class = WalletSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AdminPagination
+    sparse_columns = {"balance": ["balance", "ledger_offset"]}
+    query_budget = {"list": 3, "retrieve": 2}
+    read_replica = {"list"}
 
     def get_queryset(self):
+        wallets = Wallet.objects.select_related("user").order_by("id")
+        if ledger_enabled():
+            wallets = wallets.with_current_balance()
         # اگر کاربر ادمین بود، همه کیف پول‌ها رو ببینه
         if self.request.user.is_superuser:
-            return Wallet.objects.all()
+            return wallets.all()
         # در غیر این صورت فقط کیف پول خودش رو ببینه
-        return Wallet.objects.filter(user=self.request.user)
+        return wallets.filter(user=self.request.user)
 
 
 class WalletDetailAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 2
 
     def get(self, request):
-        wallet = request.user.wallet
+        if ledger_enabled():
+            wallet = (
+                Wallet.objects.with_current_balance()
+                .select_related("user")
+                .get(user=request.user)
+            )
+        else:
+            wallet = request.user.wallet
         serializer = WalletSerializer(wallet)
         return Response(serializer.data)
 
@@ -101,26 +144,100 @@ class CoinViewSet(viewsets.ModelViewSet):
     queryset = Coin.objects.filter(is_active=True).order_by("market_cap_rank")
     serializer_class = CoinSerializer
     lookup_field = "symbol"
+    # list و retrieve: خواندن نسخه کاتالوگ (core.cache.VersionStore) و ساخت پاسخ
+    query_budget = {
+        "list": 2,
+        "retrieve": 2,
+        "create": 3,
+        "update": 3,
+        "partial_update": 3,
+        "destroy": 3,
+        "history": 2,
+    }
+    read_replica = {"list", "retrieve", "history"}
 
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    def list(self, request, *args, **kwargs):
+        """
+        ?search=، ?<field>_min=/?<field>_max=، ?ordering= و ?limit= از index
+        حافظه‌ای core.search جواب داده می‌شوند (نگاه کنید به همان ماژول).
+        """
+        query = parse_coin_query(request.query_params)
+        version = get_catalog_version()
+
+        def build():
+            return coin_rows.serialize(coin_rows.values(self.get_queryset()))
+
+        # ETag از محتوای کش همین نسخه است؛ اگر کلاینت همین محتوا را دارد 304
+        etag = coin_catalog.list_etag(version, build, str(query or ""))
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        if query is None:
+            data = coin_catalog.get_list(version, build)
+        else:
+            data = coin_catalog.get_index(version, build).query(**query)
+        return Response(data, headers={"ETag": etag})
+
+    def retrieve(self, request, *args, **kwargs):
+        symbol = kwargs[self.lookup_field]
+        version = get_catalog_version()
+
+        def build():
+            return dict(self.get_serializer(self.get_object()).data)
+
+        etag = coin_catalog.detail_etag(version, symbol, build)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        data = coin_catalog.get_detail(version, symbol, build)
+        return Response(data, headers={"ETag": etag})
+
+    @action(detail=True)
+    def history(self, request, *args, **kwargs):
+        """
+        کندل‌های OHLC: ?interval=1m|1h|1d&from=&to= (تاریخ یا زمان ISO 8601).
+        فقط از سطح همان interval خوانده می‌شود؛ core.pricehistory را ببینید.
+        """
+        interval, start, end = parse_history_query(request.query_params)
+        candles = history_queryset(self.get_object(), interval, start, end)
+        return Response(
+            {
+                "symbol": kwargs[self.lookup_field],
+                "interval": interval,
+                "candles": PriceCandleSerializer(candles, many=True).data,
+            }
+        )
+
 
 class LoginAPIView(TokenObtainPairView):
     serializer_class = LoginSerializer
+    query_budget = 1
+
+
+class TokenRefreshAPIView(TokenRefreshView):
+    # simplejwt کاربر توکن را می‌خواند تا کاربر غیرفعال توکن تازه نگیرد
+    query_budget = 1
+
+
+class APIRootView(DefaultAPIRootView):
+    query_budget = 0
 
 
 class RegisterAPIView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = 3
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            serializer.save()
             data = serializer.data
             return Response(
                 {"message": "ثبت‌نام با موفقیت انجام شد.", "user": data},
@@ -131,6 +248,7 @@ class RegisterAPIView(generics.CreateAPIView):
 
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 2
 
     def post(self, request):
         user = request.user
@@ -157,6 +275,15 @@ class ChangePasswordView(APIView):
 class AnnouncementViewSet(viewsets.ModelViewSet):
     queryset = Announcement.objects.all().order_by("-created_at")
     serializer_class = AnnouncementSerializer
+    query_budget = {
+        "list": 2,
+        "retrieve": 2,
+        "create": 2,
+        "update": 3,
+        "partial_update": 3,
+        "destroy": 3,
+    }
+    read_replica = {"list", "retrieve"}
 
     def get_permissions(self):
         if self.request.method in ["POST", "PUT", "PATCH", "DELETE"]:
@@ -164,14 +291,25 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
 
-class ContactMessageViewSet(viewsets.ModelViewSet):
+class ContactMessageViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ContactMessageSerializer
+    pagination_class = AdminPagination
+    query_budget = {
+        "list": 3,
+        "retrieve": 2,
+        "create": 2,
+        "update": 3,
+        "partial_update": 3,
+        "destroy": 3,
+    }
+    read_replica = {"list"}
 
     def get_queryset(self):
         user = self.request.user
+        messages = ContactMessage.objects.select_related("user")
         if user.is_superuser:
-            return ContactMessage.objects.all().order_by("-created_at")
-        return ContactMessage.objects.filter(user=user).order_by("-created_at")
+            return messages.all().order_by("-created_at")
+        return messages.filter(user=user).order_by("-created_at")
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -183,67 +321,79 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
 # ------------------------------------------------------------------------------------------
 
 
-class AssetViewSet(viewsets.ReadOnlyModelViewSet):
+class AssetViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Asset.objects.all()
     serializer_class = AssetSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AdminPagination
+    query_budget = {"list": 3, "retrieve": 2}
+    read_replica = {"list"}
 
     def get_queryset(self):
         user = self.request.user
         username = self.request.query_params.get("username")
+        assets = Asset.objects.select_related("user", "coin").order_by("id")
 
         # اگر ادمین بود و username فرستاده شده بود
         if user.is_staff and username:
-            return Asset.objects.filter(user__username=username)
+            return assets.filter(user__username=username)
 
         # اگر ادمین بود ولی username نبود → همه دارایی‌ها
         if user.is_staff and not username:
-            return Asset.objects.all()
+            return assets.all()
 
         # اگر کاربر عادی بود → فقط دارایی خودش
-        return Asset.objects.filter(user=user)
+        return assets.filter(user=user)
 
 
 class MyAssetView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 2
 
     def get(self, request):
-        user = request.user
-        assets = Asset.objects.filter(user=user)
-        serializer = AssetSerializer(assets, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        assets = asset_rows.values(Asset.objects.filter(user=request.user))
+        return Response(asset_rows.serialize(assets), status=status.HTTP_200_OK)
+
+
+class PortfolioView(APIView):
+    permission_classes = [IsAuthenticated]
+    # بدون کش: نسخه‌ها قبل و بعد از محاسبه خوانده می‌شوند (core.portfolio)
+    query_budget = 4
+
+    def get(self, request):
+        data = get_portfolio(request.user)
+        return Response(PortfolioSerializer(data).data, status=status.HTTP_200_OK)
+
+
+class AdminStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    # با cache خالی: کاربر + یک کوئری aggregate برای هر عدد
+    query_budget = 6
+
+    def get(self, request):
+        data = get_admin_stats()
+        return Response(AdminStatsSerializer(data).data, status=status.HTTP_200_OK)
 
 
 class BuyCoinAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    # خرید معمولی ۸ کوئری؛ اولین خرید یک رمزارز ۳ کوئری بیشتر (insert داخل
+    # savepoint) و اولین معامله کاربر ۱ کوئری بیشتر (ردیف نسخه پرتفوی)
+    query_budget = 12
 
     def post(self, request):
         serializer = BuyCoinSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
-            user = request.user
-            coin = Coin.objects.get(id=serializer.validated_data["coin_id"])
-            amount = serializer.validated_data["amount"]
-            total_value = coin.current_price * amount
-
-            # کم کردن پول از کیف پول
-            wallet = user.wallet
-            wallet.balance -= total_value
-            wallet.save()
-
-            # اضافه کردن به دارایی‌ها
-            asset, created = Asset.objects.get_or_create(
-                user=user, coin=coin, defaults={"amount": amount}
-            )
-            if not created:
-                asset.amount += amount
-                asset.save()
-
-            Transaction.objects.create(
-                user=user,
-                transaction_type="buy",
-                coin=coin,
-                total_value=total_value,
-            )
+            try:
+                trading.buy(
+                    request.user,
+                    serializer.validated_data["coin_id"],
+                    serializer.validated_data["amount"],
+                )
+            except trading.TradeError as e:
+                return Response(
+                    {"non_field_errors": [str(e)]}, status=status.HTTP_400_BAD_REQUEST
+                )
 
             return Response(
                 {"message": "خرید با موفقیت انجام شد"}, status=status.HTTP_200_OK
@@ -253,13 +403,24 @@ class BuyCoinAPIView(APIView):
 
 class SellAssetAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 10
 
     def post(self, request):
         serializer = SellAssetSerializer(
             data=request.data, context={"request": request}
         )
         if serializer.is_valid():
-            serializer.save()
+            try:
+                trading.sell(
+                    request.user,
+                    serializer.validated_data["coin_symbol"],
+                    serializer.validated_data["amount"],
+                )
+            except trading.TradeError as e:
+                return Response(
+                    {"non_field_errors": [str(e)]}, status=status.HTTP_400_BAD_REQUEST
+                )
+
             return Response(
                 {"message": "فروش با موفقیت انجام شد", "data": serializer.data},
                 status=status.HTTP_200_OK,
@@ -268,68 +429,182 @@ class SellAssetAPIView(APIView):
 
 
 class SwapView(APIView):
+    permission_classes = [IsAuthenticated]
+    # سواپ معمولی ۸ کوئری؛ اولین دریافت یک رمزارز ۳ کوئری بیشتر (insert داخل
+    # savepoint)
+    query_budget = 11
+
     def post(self, request):
         serializer = SwapSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        user = request.user
         data = serializer.validated_data
-        from_symbol = data["from_symbol"]
-        to_symbol = data["to_symbol"]
-        amount = data["amount"]
+        try:
+            result = trading.swap(
+                request.user, data["from_symbol"], data["to_symbol"], data["amount"]
+            )
+        except trading.TradeError as e:
+            return Response({"detail": str(e)}, status=400)
 
-        if from_symbol == to_symbol:
-            return Response({"detail": "نمیشه دو ارز مشابه رو سواپ کرد."}, status=400)
+        return Response(
+            {
+                "swapped": str(result["swapped"]),
+                "from_symbol": result["from_symbol"],
+                "received": str(result["received"]),
+                "to_symbol": result["to_symbol"],
+            },
+            status=200,
+        )
 
-        try:
-            from_coin = Coin.objects.get(symbol=from_symbol)
-            to_coin = Coin.objects.get(symbol=to_symbol)
-        except Coin.DoesNotExist:
-            return Response({"detail": "رمزارز نامعتبر است."}, status=400)
+
+class OrderBatchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 10
+
+    def post(self, request):
+        serializer = OrderBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            from_asset = Asset.objects.get(user=user, coin=from_coin)
-        except Asset.DoesNotExist:
-            return Response({"detail": f"شما هیچ {from_symbol} ندارید."}, status=400)
+            result = trading.execute_batch(
+                request.user, serializer.validated_data["legs"]
+            )
+        except trading.TradeError as e:
+            return Response(
+                {"non_field_errors": [str(e)], "leg": e.leg},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        if from_asset.amount < amount:
-            return Response({"detail": "مقدار کافی برای سواپ ندارید."}, status=400)
+        return Response(
+            OrderBatchResultSerializer(result).data, status=status.HTTP_200_OK
+        )
 
-        # نرخ تبدیل
-        rate = Decimal(from_coin.current_price) / Decimal(to_coin.current_price)
-        received_amount = amount * rate
 
-        # به‌روزرسانی دارایی‌ها
-        from_asset.amount -= amount
-        if from_asset.amount <= 0:
-            from_asset.delete()
-        else:
-            from_asset.save()
+class LimitOrderViewSet(
+    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
+    """
+    سفارش‌های محدود کاربر: ثبت (POST)، لیست با ?status=، جزئیات و
+    POST .../cancel/ برای لغو. پر شدن با موتور تطبیق فید قیمت است
+    (core/matching.py).
+    """
 
-        to_asset, created = Asset.objects.get_or_create(
-            user=user, coin=to_coin, defaults={"amount": received_amount}
-        )
-        if not created:
-            to_asset.amount += received_amount
-            to_asset.save()
+    serializer_class = LimitOrderSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = LimitOrderPagination
+    query_budget = {"list": 2, "retrieve": 2, "create": 8, "cancel": 9}
 
+    def get_queryset(self):
+        orders = LimitOrder.objects.filter(user=self.request.user)
+        order_status = self.request.query_params.get("status")
+        if order_status:
+            orders = orders.filter(status=order_status)
+        return orders.select_related("coin")
+
+    def create(self, request, *args, **kwargs):
+        serializer = LimitOrderCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        try:
+            order = trading.place_limit_order(
+                request.user,
+                data["coin_symbol"],
+                data["side"],
+                data["price"],
+                data["amount"],
+            )
+        except trading.TradeError as e:
+            return Response(
+                {"non_field_errors": [str(e)]}, status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(
-            {
-                "swapped": str(amount),
-                "from_symbol": from_symbol,
-                "received": str(received_amount),
-                "to_symbol": to_symbol,
-            },
-            status=200,
+            LimitOrderSerializer(order).data, status=status.HTTP_201_CREATED
         )
 
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, pk=None):
+        order = self.get_object()
+        try:
+            trading.cancel_limit_order(request.user, order)
+        except trading.TradeError as e:
+            return Response(
+                {"non_field_errors": [str(e)]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(LimitOrderSerializer(order).data, status=status.HTTP_200_OK)
+
+
+class UserTransactions(generics.ListAPIView):
+    serializer_class = TransactionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    query_budget = 2
+    read_replica = True
+
+    def get_queryset(self):
+        transactions = Transaction.objects.filter(user=self.request.user)
+
+        # بدون فیلتر index (user, -timestamp, -id)، با coin index (user, coin, ...) و با
+        # transaction_type index (user, transaction_type, ...)؛ هر کدام صفحه را به ترتیب
+        # cursor برمی‌گرداند و با هر دو فیلتر، دیگری روی ردیف‌های همان index بررسی می‌شود
+        coin = self.request.query_params.get("coin")
+        if coin:
+            transactions = transactions.filter(coin__symbol=coin)
+        transaction_type = self.request.query_params.get("transaction_type")
+        if transaction_type:
+            transactions = transactions.filter(transaction_type=transaction_type)
+
+        return transactions.select_related("coin")
+
+    def list(self, request, *args, **kwargs):
+        # ردیف‌های values() به جای نمونه مدل؛ cursor از timestamp و id همان ردیف است
+        rows = transaction_rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(transaction_rows.serialize(page))
+
+
+class TransactionExportView(APIView):
+    """
+    دانلود کامل تاریخچه تراکنش‌ها به صورت جریانی:
+    ?output=csv|ndjson&start=YYYY-MM-DD&end=YYYY-MM-DD
+    ادمین می‌تواند با ?username= خروجی یک کاربر یا بدون آن خروجی همه را بگیرد.
+    """
 
-class UserTransactions(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 2
 
     def get(self, request):
-        user = request.user
-        transactions = Transaction.objects.filter(user=user).order_by("-timestamp")
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        params = request.query_params
+        output = params.get("output", "csv")
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"output": [f"یکی از {', '.join(EXPORT_FORMATS)} را انتخاب کنید."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        bounds = {}
+        for name in ("start", "end"):
+            if params.get(name):
+                try:
+                    bounds[name] = parse_bound(params[name], end=name == "end")
+                except ValueError:
+                    return Response(
+                        {name: ["تاریخ نامعتبر است."]},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+        if request.user.is_staff:
+            queryset = export_queryset(username=params.get("username"), **bounds)
+        else:
+            queryset = export_queryset(user=request.user, **bounds)
+
+        response = StreamingHttpResponse(
+            iter_export(queryset, output), content_type=EXPORT_FORMATS[output]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="transactions.{output}"'
+        )
+        return response
@@ -68,8 +68,8 @@ class _DashboardState extends State<Dashboard> {
 
   Future<void> _loadTransactions() async {
     try {
-      final result = await AuthApiService().getUserTransactions();
-      setState(() => _transactions = result.take(10).toList());
+      final result = await AuthApiService().getUserTransactions(limit: 10);
+      setState(() => _transactions = result);
     } catch (e) {
       showCustomSnackBar(
         context: context,
@@ -22,8 +22,10 @@ class _SellState extends State<Sell> {
 
   final TextEditingController _amountController = TextEditingController();
 
-  double get enteredAmount =>
-      double.tryParse(_amountController.text.trim()) ?? 0.0;
+  // همان گرد کردن به ۸ رقم اعشار که سرور برای فروش انجام می‌دهد
+  double get enteredAmount => double.parse(
+    (double.tryParse(_amountController.text.trim()) ?? 0.0).toStringAsFixed(8),
+  );
 
   double get selectedCoinPrice {
     final price = selectedCoin?['coin']['current_price'];
@@ -94,12 +94,27 @@ class AuthApiService {
     }
   }
 
+  /// پیام‌ها صفحه به صفحه و فقط با فیلدهایی که صفحه پیام‌ها نشان می‌دهد.
   Future<List<Map<String, dynamic>>> getContactMessages() async {
     try {
-      final response = await _dio.get('contact-messages/');
-      final data = response.data as List;
-
-      return data.map((e) => Map<String, dynamic>.from(e)).toList();
+      final messages = <Map<String, dynamic>>[];
+      String? next = 'contact-messages/';
+      Map<String, dynamic>? query = {
+        'fields': 'id,name,family,stars,message',
+        'page_size': 500,
+      };
+
+      while (next != null) {
+        final response = await _dio.get(next, queryParameters: query);
+        final data = response.data as Map;
+        messages.addAll(
+          (data['results'] as List).map((e) => Map<String, dynamic>.from(e)),
+        );
+        // لینک next خودش fields و page_size را دارد
+        next = data['next'];
+        query = null;
+      }
+      return messages;
     } on DioError catch (e) {
       throw Exception(e.response?.data.toString() ?? e.message);
     }
@@ -162,25 +177,37 @@ class AuthApiService {
     }
   }
 
-  Future<List<Map<String, dynamic>>> getUserTransactions() async {
+  /// تراکنش‌ها صفحه به صفحه (cursor) از سرور می‌آیند؛ با [limit] فقط همان
+  /// تعداد از جدیدترین تراکنش‌ها گرفته می‌شود.
+  Future<List<Map<String, dynamic>>> getUserTransactions({int? limit}) async {
     try {
-      final response = await _dio.get('/transaction/');
+      final transactions = <Map<String, dynamic>>[];
+      String? next = '/transaction/';
+      Map<String, dynamic>? query = {'page_size': limit ?? 200};
+
+      while (next != null) {
+        final response = await _dio.get(next, queryParameters: query);
+        if (response.statusCode != 200) {
+          throw Exception('خطا در دریافت تراکنش‌ها: ${response.statusCode}');
+        }
 
-      if (response.statusCode == 200) {
         final data = response.data;
-
-        if (data is List) {
-          return data
-              .map<Map<String, dynamic>>(
-                (item) => Map<String, dynamic>.from(item),
-              )
-              .toList();
-        } else {
-          throw Exception('داده دریافت‌شده فرمت لیست ندارد: $data');
+        if (data is! Map || data['results'] is! List) {
+          throw Exception('داده دریافت‌شده فرمت صفحه‌بندی ندارد: $data');
         }
-      } else {
-        throw Exception('خطا در دریافت تراکنش‌ها: ${response.statusCode}');
+        transactions.addAll(
+          (data['results'] as List).map<Map<String, dynamic>>(
+            (item) => Map<String, dynamic>.from(item),
+          ),
+        );
+
+        if (limit != null && transactions.length >= limit) break;
+        // لینک next خودش page_size و cursor را دارد
+        next = data['next'] as String?;
+        query = null;
       }
+
+      return limit == null ? transactions : transactions.take(limit).toList();
     } catch (e) {
       throw Exception('خطای دریافت تراکنش‌ها: $e');
     }
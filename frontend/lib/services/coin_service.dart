@@ -1,3 +1,5 @@
+import 'dart:convert';
+
 import 'package:crypton_frontend/services/storage_service.dart';
 import 'package:dio/dio.dart';
 import 'package:flutter_dotenv/flutter_dotenv.dart';
@@ -55,6 +57,32 @@ class CoinService {
     }
   }
 
+  /// جستجو و فیلتر سمت سرور به جای دانلود کل لیست؛ برای autocomplete با
+  /// limit کوچک. filters کلیدهایی مثل current_price_min یا market_cap_rank_max
+  /// دارد و ordering یکی از current_price، market_cap، total_volume و
+  /// market_cap_rank است (با - برای نزولی).
+  Future<List<dynamic>> searchCoins(
+    String query, {
+    int? limit = 10,
+    Map<String, num>? filters,
+    String? ordering,
+  }) async {
+    try {
+      final response = await _dio.get(
+        '/coins/',
+        queryParameters: {
+          if (query.trim().isNotEmpty) 'search': query.trim(),
+          if (limit != null) 'limit': limit,
+          if (ordering != null) 'ordering': ordering,
+          ...?filters,
+        },
+      );
+      return response.data;
+    } catch (e) {
+      throw Exception('خطا در جستجوی رمز ارزها: $e');
+    }
+  }
+
   Future<Map<String, dynamic>> getCoinDetails(String symbol) async {
     try {
       final response = await _dio.get('/coins/$symbol/');
@@ -64,6 +92,30 @@ class CoinService {
     }
   }
 
+  /// کندل‌های OHLC برای نمودار؛ interval یکی از 1m، 1h و 1d است و بدون آن
+  /// سرور بر اساس بازه انتخاب می‌کند. پاسخ: symbol، interval و candles با
+  /// فیلدهای bucket، open، high، low و close.
+  Future<Map<String, dynamic>> getCoinHistory(
+    String symbol, {
+    String? interval,
+    DateTime? from,
+    DateTime? to,
+  }) async {
+    try {
+      final response = await _dio.get(
+        '/coins/$symbol/history/',
+        queryParameters: {
+          if (interval != null) 'interval': interval,
+          if (from != null) 'from': from.toUtc().toIso8601String(),
+          if (to != null) 'to': to.toUtc().toIso8601String(),
+        },
+      );
+      return response.data;
+    } catch (e) {
+      throw Exception('خطا در دریافت تاریخچه قیمت: $e');
+    }
+  }
+
   Future<bool> toggleCoinStatus(String symbol, bool isActive) async {
     try {
       final response = await _dio.patch(
@@ -83,6 +135,59 @@ class CoinService {
     }
   }
 
+  /// تغییر قیمت‌ها از /prices/stream/ (Server-Sent Events)؛ هر رویداد فقط
+  /// symbol و فیلدهای تغییرکرده را دارد و در کش لیست رمز ارزها هم ادغام می‌شود.
+  /// اگر اتصال قطع شود stream تمام می‌شود و می‌شود دوباره گوش داد.
+  Stream<Map<String, dynamic>> priceUpdates({List<String>? symbols}) async* {
+    final response = await _dio.get<ResponseBody>(
+      '/prices/stream/',
+      queryParameters: {
+        if (symbols != null && symbols.isNotEmpty) 'symbols': symbols.join(','),
+      },
+      options: Options(
+        responseType: ResponseType.stream,
+        // اتصال باز می‌ماند؛ سرور هر ۱۵ ثانیه ping می‌فرستد
+        receiveTimeout: Duration.zero,
+      ),
+    );
+
+    String? event;
+    final data = StringBuffer();
+    final lines = response.data!.stream
+        .cast<List<int>>()
+        .transform(utf8.decoder)
+        .transform(const LineSplitter());
+
+    await for (final line in lines) {
+      if (line.startsWith('event:')) {
+        event = line.substring(6).trim();
+      } else if (line.startsWith('data:')) {
+        data.write(line.substring(5).trim());
+      } else if (line.isEmpty) {
+        if (event == 'price' && data.isNotEmpty) {
+          final update = jsonDecode(data.toString()) as Map<String, dynamic>;
+          _applyPriceUpdate(update);
+          yield update;
+        } else if (event == 'dropped') {
+          return;
+        }
+        event = null;
+        data.clear();
+      }
+    }
+  }
+
+  void _applyPriceUpdate(Map<String, dynamic> update) {
+    final coins = _cachedCoins;
+    if (coins == null) return;
+    for (final coin in coins) {
+      if (coin is Map && coin['symbol'] == update['symbol']) {
+        coin.addAll(update);
+        return;
+      }
+    }
+  }
+
   void clearCache() {
     _cachedCoins = null;
     _lastFetchTime = null;
@@ -167,4 +272,57 @@ class CoinService {
       return 'خطا در اتصال به سرور';
     }
   }
+
+  /// ثبت سفارش محدود؛ side یکی از buy و sell است. پول یا رمزارز سفارش همان
+  /// لحظه رزرو می‌شود و وقتی قیمت به price برسد سفارش پر می‌شود.
+  Future<Map<String, dynamic>> placeLimitOrder({
+    required String coinSymbol,
+    required String side,
+    required double price,
+    required double amount,
+  }) async {
+    try {
+      final response = await _dio.post(
+        '/orders/limit/',
+        data: {
+          'coin_symbol': coinSymbol,
+          'side': side,
+          'price': price.toString(),
+          'amount': amount.toString(),
+        },
+      );
+      return {'success': true, 'order': response.data};
+    } on DioException catch (e) {
+      if (e.response != null) {
+        return {'success': false, 'error': e.response!.data};
+      }
+      return {'success': false, 'error': 'خطا در ارتباط با سرور'};
+    }
+  }
+
+  /// سفارش‌های محدود کاربر، جدیدترین اول؛ status یکی از open، filled و
+  /// cancelled است.
+  Future<List<dynamic>> getLimitOrders({String? status}) async {
+    try {
+      final response = await _dio.get(
+        '/orders/limit/',
+        queryParameters: {if (status != null) 'status': status},
+      );
+      return response.data['results'];
+    } catch (e) {
+      throw Exception('خطا در دریافت سفارش‌ها: $e');
+    }
+  }
+
+  Future<Map<String, dynamic>> cancelLimitOrder(int id) async {
+    try {
+      final response = await _dio.post('/orders/limit/$id/cancel/');
+      return {'success': true, 'order': response.data};
+    } on DioException catch (e) {
+      if (e.response != null) {
+        return {'success': false, 'error': e.response!.data};
+      }
+      return {'success': false, 'error': 'خطا در ارتباط با سرور'};
+    }
+  }
 }
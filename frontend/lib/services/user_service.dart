@@ -44,12 +44,27 @@ class UserService {
       return _cachedUsers!;
     }
 
-    final response = await _dio.get('/users/');
-    _cachedUsers = response.data;
+    // لیست کاربران صفحه‌بندی شده است؛ همه صفحه‌ها پشت سر هم گرفته می‌شوند
+    final users = <dynamic>[];
+    String? next = '/users/';
+    Map<String, dynamic>? query = {'page_size': 500};
+    while (next != null) {
+      final response = await _dio.get(next, queryParameters: query);
+      users.addAll(response.data['results']);
+      next = response.data['next'];
+      query = null;
+    }
+    _cachedUsers = users;
     _usersLastFetched = DateTime.now();
     return _cachedUsers!;
   }
 
+  // آمار پنل ادمین که در سرور حساب و کش می‌شود؛ updated_at زمان قدیمی‌ترین عدد است
+  Future<Map<String, dynamic>> getAdminStats() async {
+    final response = await _dio.get('/admin/stats/');
+    return response.data;
+  }
+
   void invalidateUserCache() {
     _cachedUsers = null;
     _usersLastFetched = null;